@@ -1,14 +1,61 @@
 from flask import Flask # type: ignore
 from app.config import Config
+from app import (
+    auth_middleware, cache, cli, compression, db, facets, interest_buffer, json_provider, media, metrics,
+    passwords, query_log, replicas, submissions
+)
 from app.orphan_routes import orphans
 from app.auth_routes import auth
 from app.donations_routes import donations
 from app.homepage_routes import homePage
 from app.admin_routes import admin
+from app.media_routes import media as media_routes
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.config.from_object(Config)
+    # Overrides on top of Config, e.g. {'DB_BACKEND': 'sqlite'} for local runs
+    if config:
+        app.config.update(config)
+
+    # One MySQL connection pool shared by every blueprint
+    db.init_app(app)
+
+    # Optional read replicas for GET requests, checked for replication lag
+    replicas.init_app(app)
+
+    # Per-statement timings, slow-query log and EXPLAIN capture
+    query_log.init_app(app)
+
+    # Read-through cache for the public child endpoints
+    cache.init_app(app)
+
+    # Verified-token cache used by the auth decorators
+    auth_middleware.init_app(app)
+
+    # Bounded pool for password hashing and verification
+    passwords.init_app(app)
+
+    # Fast JSON encoding and negotiated gzip/brotli for large payloads, with
+    # per-endpoint latency metrics (including compression) on /metrics
+    json_provider.init_app(app)
+    metrics.init_app(app)
+    compression.init_app(app)
+
+    # Wakes /submissions/stream listeners when a guest submits interest
+    submissions.init_app(app)
+
+    # Optional 202 write path for /express-interest through a durable local queue
+    interest_buffer.init_app(app)
+
+    # Content-addressed child photos and their background-rendered thumbnails
+    media.init_app(app)
+
+    # Recount the /children/facets counters now and then to correct any drift
+    facets.init_app(app)
+
+    # flask --app app db upgrade|status|check|rebuild-catalogue|reconcile-facets|flush-interests
+    cli.init_app(app)
     
     # Register the Blueprint from routes
     # app.register_blueprint(main)
@@ -17,5 +64,6 @@ def create_app():
     app.register_blueprint(donations)
     app.register_blueprint(homePage)
     app.register_blueprint(admin)
+    app.register_blueprint(media_routes)
 
     return app
\ No newline at end of file
@@ -1,25 +1,19 @@
-from flask import Blueprint, request, jsonify # type: ignore
+from flask import Blueprint, current_app, request, jsonify # type: ignore
 import mysql.connector # type: ignore
-from werkzeug.security import generate_password_hash, check_password_hash
-from app.config import Config
+from app.auth_middleware import admin_required
+from app.cache import get_cache
+from app.children import fields_arg, int_arg
+from app.conditional import conditional
+from app.db import close_db
+from app.repository import ORPHANAGE_REQUEST_FIELDS, VERIFICATION_STATUSES, get_repo
+from app.passwords import PasswordHasherBusy, get_hasher
 import jwt
 from datetime import datetime, timedelta, timezone
 
 
-# Secret key for signing JWT (store it securely, e.g., in environment variables)
-SECRET_KEY = 'your_secret_key'
-
-
 # Create a Blueprint for authentication routes
 admin = Blueprint('admin', __name__)
 
-# Use the config values for the MySQL connection
-db_config = {
-    'user': Config.MYSQL_USER,
-    'password': Config.MYSQL_PASSWORD,
-    'host': Config.MYSQL_HOST,
-    'database': Config.MYSQL_DATABASE
-}
 
 # admin login
 @admin.route('/admin/login', methods=['POST'])
@@ -30,52 +24,47 @@ def admin_login():
         email = data['email']
         password = data['password']
 
-        # Connect to the database to authenticate the user
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
+        repo = get_repo()
 
         # Fetch the user details based on email
-        cursor.execute("SELECT * FROM users WHERE email = %s AND role = 'admin'", (email,))
-        user = cursor.fetchone()
+        user = repo.get_admin_by_email(email)
+
+        # Give the connection back while the hash is checked (see auth.login)
+        close_db()
 
         # Check if the user exists and the password is correct
-        if user and check_password_hash(user['password'], password):
+        password_ok, new_hash = get_hasher().verify(user['password'], password) if user else (False, None)
+
+        # Upgrade hashes stored with an older work factor while we know the password
+        if new_hash:
+            repo = get_repo()
+            repo.update_password(user['id'], new_hash)
+            repo.commit()
+
+        if password_ok:
             # Create JWT token with the admin's role
             token = jwt.encode({
                 'user_id': user['id'],
                 'role': user['role'],  # Ensure 'role' is 'admin'
                 'exp': datetime.now(timezone.utc) + timedelta(hours=48) # Token expiration
-            }, SECRET_KEY)
+            }, current_app.config['SECRET_KEY'])
 
             return jsonify({"token": token}), 200
 
         else:
             return jsonify({"error": "Invalid credentials or not an admin"}), 401
 
+    except PasswordHasherBusy as err:
+        return jsonify({"error": str(err)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 # admin verify
 @admin.route('/orphanage/verify', methods=['POST'])
+@admin_required
 def verify_orphanage():
     try:
-        # Get the token from the Authorization header to check if the user is admin
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Token is missing!"}), 401
-
-        # Decode the token to verify if the user is admin
-        try:
-            decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_role = decoded_token['role']
-            if user_role != 'admin':
-                return jsonify({"error": "Unauthorized"}), 403
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token!"}), 401
-
         # Get the request data
         data = request.json
         orphanage_id = data['orphanage_id']
@@ -90,21 +79,20 @@ def verify_orphanage():
         if status == 'rejected' and not rejection_reason:
             return jsonify({"error": "Rejection reason is required for rejected status."}), 400
 
-        # Connect to the database
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor()
+        repo = get_repo()
 
         # Update the orphanage status and rejection_reason (if rejected)
-        cursor.execute("""
-            UPDATE orphanage_verification 
-            SET status = %s, rejection_reason = %s 
-            WHERE orphanage_id = %s
-        """, (status, rejection_reason, orphanage_id))
+        changed = repo.set_orphanage_status(orphanage_id, status, rejection_reason)
+
+        # Invalidate ETags of the review queue and of the public listing
+        if changed:
+            repo.bump_versions('orphanages', 'children')
 
-        conn.commit()
+        repo.commit()
 
-        cursor.close()
-        conn.close()
+        # Approving or rejecting an orphanage changes which children are public
+        if changed:
+            get_cache().invalidate('children', 'catalogue')
 
         return jsonify({"message": f"Orphanage {status} successfully!"}), 200
 
@@ -114,49 +102,125 @@ def verify_orphanage():
         return jsonify({"error": str(e)}), 500
 
 
+def validate_decision(row):
+    """Return ((orphanage_id, status, rejection_reason), errors) for one batch verify decision."""
+    if not isinstance(row, dict):
+        return None, ["Decision must be an object"]
+
+    errors = []
+    orphanage_id = row.get('orphanage_id')
+    if not isinstance(orphanage_id, int) or isinstance(orphanage_id, bool):
+        errors.append("'orphanage_id' must be an integer")
+    status = row.get('status')
+    if status not in ('approved', 'rejected'):
+        errors.append("'status' must be 'approved' or 'rejected'")
+    rejection_reason = row.get('rejection_reason') or None
+    if status == 'rejected' and not rejection_reason:
+        errors.append("Rejection reason is required for rejected status.")
+
+    if errors:
+        return None, errors
+    return (orphanage_id, status, rejection_reason), []
+
+
+# admin verify many orphanages at once, in one transaction
+@admin.route('/orphanage/verify/batch', methods=['POST'])
+@admin_required
+def verify_orphanages_batch():
+    try:
+        data = request.json
+        decisions = data.get('decisions') if isinstance(data, dict) else None
+        if not isinstance(decisions, list) or not decisions:
+            return jsonify({"error": "Expected a non-empty 'decisions' list"}), 400
+        max_decisions = current_app.config['VERIFY_BATCH_MAX_DECISIONS']
+        if len(decisions) > max_decisions:
+            return jsonify({"error": f"At most {max_decisions} decisions per request"}), 413
+
+        # Validate every decision before touching the database
+        rows = []
+        errors = []
+        seen = set()
+        for index, decision in enumerate(decisions):
+            row, row_errors = validate_decision(decision)
+            if row and row[0] in seen:
+                row_errors = ["Duplicate orphanage_id in this batch"]
+            if row_errors:
+                errors.append({"index": index, "errors": row_errors})
+            else:
+                seen.add(row[0])
+                rows.append(row)
+
+        if errors:
+            return jsonify({"error": "Some decisions are invalid, nothing was changed", "results": errors}), 400
+
+        repo = get_repo()
+
+        # One multi-row UPDATE per batch of decisions, all committed together
+        try:
+            results = repo.set_orphanage_statuses(rows, batch_size=current_app.config['VERIFY_BATCH_UPDATE_SIZE'])
+            updated = sum(1 for result in results.values() if result == 'updated')
+
+            # Invalidate ETags of the review queue and of the public listing
+            if updated:
+                repo.bump_versions('orphanages', 'children')
+
+            repo.commit()
+        except Exception:
+            repo.rollback()
+            raise
+
+        # Approving or rejecting orphanages changes which children are public
+        if updated:
+            get_cache().invalidate('children', 'catalogue')
+
+        return jsonify({
+            "message": f"{updated} orphanage(s) updated",
+            "results": [{"orphanage_id": orphanage_id, "result": results[orphanage_id]} for orphanage_id, _, _ in rows]
+        }), 200
+
+    except mysql.connector.Error as err:
+        return jsonify({"error": str(err)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # get all orphanages requests
 @admin.route('/orphanages-requests', methods=['GET'])
+@admin_required
+@conditional('orphanages')
 def get_all_orphanages():
     try:
-        # Get the token from the Authorization header
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Token is missing!"}), 401
-
-        # Decode the token to verify if the user is an admin
+        # Only read the columns asked for with ?fields=, if any
         try:
-            decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_role = decoded_token['role']
-
-            # Ensure the user is an admin
-            if user_role != 'admin':
-                return jsonify({"error": "Unauthorized: Admins only"}), 403
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token!"}), 401
-
-        # Connect to the database to retrieve all orphanages with their status
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
-
-        # Fetch all orphanages and their statuses from orphanage_verification table
-        # Join with users table to get orphanage name and email
-        cursor.execute("""
-            SELECT o.orphanage_id, u.name, u.email, o.address, 
-                   o.registration_certificate_number, 
-                   o.operating_license_number, o.license_expiration_date, 
-                   o.manager_national_id, o.tax_id, o.bank_account_details, 
-                   o.status, o.rejection_reason
-            FROM orphanage_verification o
-            JOIN users u ON o.orphanage_id = u.id  -- Assuming orphanage_id corresponds to the user ID
-        """)
-        orphanages = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
-
-        return jsonify(orphanages), 200
+            fields = fields_arg(request.args, ORPHANAGE_REQUEST_FIELDS)
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
+
+        # Without paging parameters, keep returning the whole list
+        if not any(name in request.args for name in ('status', 'after', 'limit')):
+            # Fetch all orphanages and their statuses from orphanage_verification table
+            # Join with users table to get orphanage name and email
+            orphanages = get_repo().list_orphanage_requests(fields)
+
+            return jsonify(orphanages), 200
+
+        # Read the status filter, cursor and page size from the query string
+        status = request.args.get('status') or None
+        if status is not None and status not in VERIFICATION_STATUSES:
+            return jsonify({"error": "'status' must be 'pending', 'approved' or 'rejected'"}), 400
+        try:
+            after = int_arg(request.args, 'after', minimum=0)
+            limit = int_arg(request.args, 'limit', minimum=1,
+                            maximum=current_app.config['ORPHANAGE_REQUESTS_MAX_PAGE_SIZE'])
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
+        limit = limit or current_app.config['ORPHANAGE_REQUESTS_PAGE_SIZE']
+
+        # Keyset page in orphanage_id order; the extra row only tells us there is another page
+        orphanages = get_repo().list_orphanage_requests_page(status, after, limit, fields)
+        next_cursor = orphanages[limit - 1]['orphanage_id'] if len(orphanages) > limit else None
+
+        return jsonify({"orphanages": orphanages[:limit], "next_cursor": next_cursor}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -164,45 +228,18 @@ def get_all_orphanages():
 
 # get orphanage by id 
 @admin.route('/orphanages-requests/<int:orphanage_id>', methods=['GET'])
+@admin_required
+@conditional('orphanages')
 def get_orphanage_by_id(orphanage_id):
     try:
-        # Get the token from the Authorization header
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Token is missing!"}), 401
-
-        # Decode the token to verify if the user is an admin
+        # Only read the columns asked for with ?fields=, if any
         try:
-            decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_role = decoded_token['role']
-
-            # Ensure the user is an admin
-            if user_role != 'admin':
-                return jsonify({"error": "Unauthorized: Admins only"}), 403
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token!"}), 401
-
-        # Connect to the database to retrieve details for the specific orphanage
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
+            fields = fields_arg(request.args, ORPHANAGE_REQUEST_FIELDS)
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
 
         # Fetch orphanage details from orphanage_verification and users table by orphanage_id
-        cursor.execute("""
-            SELECT o.orphanage_id, u.name, u.email, o.address, 
-                   o.registration_certificate_number, 
-                   o.operating_license_number, o.license_expiration_date, 
-                   o.manager_national_id, o.tax_id, o.bank_account_details, 
-                   o.status, o.rejection_reason
-            FROM orphanage_verification o
-            JOIN users u ON o.orphanage_id = u.id  -- Assuming orphanage_id links to users table
-            WHERE o.orphanage_id = %s
-        """, (orphanage_id,))
-        orphanage = cursor.fetchone()
-
-        cursor.close()
-        conn.close()
+        orphanage = get_repo().get_orphanage_request(orphanage_id, fields)
 
         if orphanage:
             return jsonify(orphanage), 200
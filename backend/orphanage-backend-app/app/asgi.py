@@ -0,0 +1,395 @@
+"""Async serving mode.
+
+The public homepage routes (/children, /children/<id>, /hobbies and
+/express-interest) are served natively on an aiomysql pool, so a slow query
+only parks a coroutine instead of a worker thread. Every other route of the
+``auth``, ``orphans``, ``donations``, ``homePage`` and ``admin`` blueprints is
+handed to the regular Flask app from ``create_app()`` and runs on a thread
+pool of ``ASYNC_FALLBACK_THREADS``, so those requests run side by side.
+
+GET routes read from the same ``MYSQL_REPLICAS`` as the Flask app, on
+aiomysql pools of their own, and follow its lag checks and read-your-writes
+pinning (see app.replicas).
+
+Run it with an ASGI server, e.g. ``uvicorn asgi:app --workers 4``.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import wraps
+
+import aiomysql  # type: ignore
+from asgiref.sync import sync_to_async  # type: ignore
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance  # type: ignore
+from quart import Blueprint, Quart, current_app, g, jsonify, make_response, request  # type: ignore
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+from app.cache import cache_key
+from app.children import children_page_filters, hobby_names, split_page
+from app.compression import choose_encoding, compress_bytes, is_compressible, mark_encoded
+from app.conditional import is_not_modified, make_etag
+from app.json_provider import OrjsonProvider, orjson
+from app.media import with_image_urls
+from app.replicas import READ_METHODS, replica_address
+from app.repository import (
+    BUMP_VERSIONS_QUERY, HOBBIES_QUERY, INSERT_INTEREST_QUERY, PUBLIC_CHILD_QUERY, build_children_page_query,
+    build_versions_query, versions_from_rows
+)
+from app.submissions import validate_interest
+
+
+logger = logging.getLogger(__name__)
+
+# Create a Blueprint for the async public routes
+publicAsync = Blueprint('publicAsync', __name__)
+
+
+async def _checkout():
+    """(pool, connection): a read replica's for reads when one is healthy, otherwise the primary's."""
+    replicas = current_app.extensions.get('replicas')
+    # One server per request, so the version check and the body it validates read the same data
+    if 'db_replica' not in g:
+        g.db_replica = replicas.replica_for(request.method, request.cookies) if replicas is not None else None
+    replica = g.db_replica
+    if replica is not None:
+        pool = current_app.extensions['aiomysql_replica_pools'][replica.name]
+        try:
+            conn = await asyncio.wait_for(pool.acquire(), current_app.config['REPLICA_POOL_TIMEOUT'])
+        except asyncio.TimeoutError:
+            # Busy, not broken: the rest of this request reads from the primary and the replica stays in rotation
+            g.db_replica = None
+            replicas.count('fallbacks')
+        except Exception as err:
+            g.db_replica = None
+            replicas.evict(replica, f"connection failed: {err}")
+            replicas.count('fallbacks')
+        else:
+            replicas.count('replica_reads')
+            return pool, conn
+
+    if replicas is not None:
+        replicas.count('primary_reads')
+    pool = current_app.extensions['aiomysql_pool']
+    return pool, await asyncio.wait_for(pool.acquire(), current_app.config['MYSQL_POOL_TIMEOUT'])
+
+
+@asynccontextmanager
+async def db_cursor(dictionary=True):
+    """Check a connection out of the aiomysql pools for the duration of the block."""
+    pool, conn = await _checkout()
+    try:
+        async with conn.cursor(aiomysql.DictCursor if dictionary else aiomysql.Cursor) as cursor:
+            yield conn, cursor
+    finally:
+        pool.release(conn)
+
+
+def conditional(*scope_templates):
+    """Async counterpart of ``app.conditional.conditional``."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapped(*args, **kwargs):
+            scopes = [template.format(**kwargs) for template in scope_templates]
+
+            try:
+                async with db_cursor(dictionary=False) as (conn, cursor):
+                    await cursor.execute(*build_versions_query(scopes))
+                    versions, last_modified = versions_from_rows(scopes, await cursor.fetchall())
+            except Exception:
+                # Without version counters just serve the full response
+                logger.exception("Could not read data versions for %s", scopes)
+                return await view(*args, **kwargs)
+
+            # Cached bodies are looked up at these versions (see app.cache)
+            g.data_versions = versions
+            etag = make_etag(request.full_path, versions)
+
+            # Nothing changed since the client's copy: skip the query and the body
+            if is_not_modified(request, etag, last_modified):
+                response = await make_response('', 304)
+            else:
+                response = await make_response(await view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            # Weak on 200 and 304 alike, as in app.conditional
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapped
+    return decorator
+
+
+@publicAsync.route('/children', methods=['GET'])
+@conditional('children')
+async def get_all_children():
+    try:
+        # Read the cursor, page size and filters from the query string
+        try:
+            filters = children_page_filters(request.args, current_app.config)
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
+
+        async def load_page():
+            async with db_cursor() as (conn, cursor):
+                # Fetch one page of the public catalogue (approved orphanages only), ordered by id
+                await cursor.execute(*build_children_page_query(**filters))
+                children, next_cursor = split_page(list(await cursor.fetchall()), filters['limit'])
+
+            # Hobby names are stored with each catalogue row
+            for child in children:
+                child['hobbies'] = hobby_names(child['hobbies'])
+
+            # Uploaded photos are linked at their thumbnail size; Flask's current_app is not set here
+            return {"children": with_image_urls(children, 'list', app=current_app._get_current_object()),
+                    "next_cursor": next_cursor}
+
+        cache = current_app.extensions['cache']
+        page = await cache.get_or_set_async(cache_key('children', request.args), load_page, tags=['children'],
+                                            versions=g.get('data_versions'))
+
+        return jsonify(page), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@publicAsync.route('/children/<int:child_id>', methods=['GET'])
+@conditional('children')
+async def get_child_by_id(child_id):
+    try:
+        async def load_child():
+            async with db_cursor() as (conn, cursor):
+                # Fetch the child and their hobby names from the public catalogue
+                await cursor.execute(PUBLIC_CHILD_QUERY, (child_id,))
+                child = await cursor.fetchone()
+
+            # Missing children are not cached
+            if not child:
+                return None
+
+            child['hobbies'] = hobby_names(child['hobbies'])
+
+            # Uploaded photos are linked at their large size
+            return with_image_urls([child], 'detail', app=current_app._get_current_object())[0]
+
+        cache = current_app.extensions['cache']
+        child = await cache.get_or_set_async(f'children/{child_id}', load_child,
+                                             tags=[f'child:{child_id}', 'catalogue'], versions=g.get('data_versions'))
+
+        # If no child is found, return a 404 error
+        if not child:
+            return jsonify({"error": "Child not found"}), 404
+
+        return jsonify(child), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@publicAsync.route('/hobbies', methods=['GET'])
+@conditional('hobbies')
+async def get_hobbies():
+    try:
+        async def load_hobbies():
+            async with db_cursor() as (conn, cursor):
+                # Fetch all hobbies from the hobbies table
+                await cursor.execute(HOBBIES_QUERY)
+                return list(await cursor.fetchall())
+
+        cache = current_app.extensions['cache']
+        hobbies = await cache.get_or_set_async('hobbies', load_hobbies, tags=['hobbies'],
+                                               versions=g.get('data_versions'))
+
+        return jsonify(hobbies), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Guest Insert the their interest into the adoption_sponsorship_requests table
+@publicAsync.route('/express-interest', methods=['POST'])
+async def express_interest():
+    try:
+        # Get the request data
+        data = await request.get_json()
+
+        # Buffered mode: validate, queue durably (a local fsync, so off the event loop) and answer
+        if current_app.config['INTEREST_BUFFER_ENABLED']:
+            row, errors = validate_interest(data)
+            if errors:
+                return jsonify({"error": "Invalid submission", "errors": errors}), 400
+            submission_id = await asyncio.to_thread(current_app.extensions['interest_writer'].submit, row)
+            return jsonify({"message": "Interest request received!", "submission_id": submission_id}), 202
+
+        orphanage_id = data['orphanage_id']  # Mandatory field
+        guest_name = data['guest_name']
+        guest_email = data['guest_email']
+        interest_type = data['interest_type']  # 'adoption' or 'sponsorship'
+        message = data.get('message', '')  # Optional message
+        child_id = data.get('child_id', None)  # Optional child_id, default is None
+
+        async with db_cursor(dictionary=False) as (conn, cursor):
+            # Connections autocommit; the insert and the version bump commit together
+            await conn.begin()
+            try:
+                # Insert the guest's interest into the adoption_sponsorship_requests table
+                await cursor.execute(INSERT_INTEREST_QUERY,
+                                     (child_id, orphanage_id, guest_name, guest_email, interest_type, message))
+                await cursor.execute(BUMP_VERSIONS_QUERY, (f'submissions:{orphanage_id}',))
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+
+        # Push the submission to the orphanage's open dashboards
+        current_app.extensions['submission_notifier'].publish(orphanage_id)
+
+        return jsonify({"message": "Interest request submitted successfully!"}), 201
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# The plain function behind asgiref's sync_to_async-wrapped method
+_run_wsgi_app = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+
+
+class _ThreadedWsgiInstance(WsgiToAsgiInstance):
+    def __init__(self, wsgi_application, executor, duplicate_header_limit=100):
+        super().__init__(wsgi_application, duplicate_header_limit)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        # asgiref's own runs every request on one shared thread, one request at a time
+        def run():
+            return _run_wsgi_app(self, body)
+        return await sync_to_async(run, thread_sensitive=False, executor=self.executor)()
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi that runs each request on a thread of ``executor``."""
+
+    def __init__(self, wsgi_application, executor, duplicate_header_limit=100):
+        super().__init__(wsgi_application, duplicate_header_limit)
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        instance = _ThreadedWsgiInstance(self.wsgi_application, self.executor, self.duplicate_header_limit)
+        await instance(scope, receive, send)
+
+
+class AsgiDispatcher:
+    """Send requests for native async routes to Quart and everything else to Flask."""
+
+    def __init__(self, async_app, wsgi_app, threads=32):
+        self.async_app = async_app
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+        self._fallback = ThreadedWsgiToAsgi(wsgi_app, self.executor)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and not self._is_async_route(scope):
+            return await self._fallback(scope, receive, send)
+        # Lifespan and websocket events, and the async routes themselves
+        return await self.async_app(scope, receive, send)
+
+    def _is_async_route(self, scope):
+        adapter = self.async_app.url_map.bind('localhost')
+        try:
+            adapter.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return False
+        return True
+
+
+def create_asgi_app():
+    flask_app = create_app()
+
+    app = Quart(__name__)
+    app.config.from_mapping(flask_app.config)
+
+    # Share the cache with the Flask app so its writes invalidate our entries
+    app.extensions['cache'] = flask_app.extensions['cache']
+    app.extensions['submission_notifier'] = flask_app.extensions['submission_notifier']
+    app.extensions['media'] = flask_app.extensions['media']
+    if 'interest_writer' in flask_app.extensions:
+        app.extensions['interest_writer'] = flask_app.extensions['interest_writer']
+    # Same rotation and lag checks as the Flask app
+    replicas = flask_app.extensions.get('replicas')
+    if replicas is not None:
+        app.extensions['replicas'] = replicas
+
+    if app.config['JSON_PROVIDER'] == 'orjson' and orjson is not None:
+        app.json = OrjsonProvider(app)
+
+    app.register_blueprint(publicAsync)
+
+    @app.before_serving
+    async def _start_interest_writer():
+        # Replays what a previous process left in the queue
+        if 'interest_writer' in app.extensions:
+            app.extensions['interest_writer'].start()
+
+    def create_pool(host, port, size):
+        return aiomysql.create_pool(
+            host=host,
+            port=port,
+            user=app.config['MYSQL_USER'],
+            password=app.config['MYSQL_PASSWORD'],
+            db=app.config['MYSQL_DATABASE'],
+            minsize=0,
+            maxsize=size,
+            pool_recycle=app.config['MYSQL_POOL_RECYCLE'],
+            # Reads then leave no transaction open, which would make release() close the connection
+            autocommit=True,
+        )
+
+    @app.before_serving
+    async def _open_pool():
+        app.extensions['aiomysql_pool'] = await create_pool(app.config['MYSQL_HOST'], 3306,
+                                                            app.config['ASYNC_MYSQL_POOL_SIZE'])
+        if replicas is not None:
+            app.extensions['aiomysql_replica_pools'] = {
+                replica.name: await create_pool(*replica_address(replica.name), app.config['REPLICA_POOL_SIZE'])
+                for replica in replicas.replicas
+            }
+            replicas.start()
+
+    @app.after_serving
+    async def _close_pool():
+        pools = list(app.extensions.pop('aiomysql_replica_pools', {}).values())
+        pools.append(app.extensions.pop('aiomysql_pool', None))
+        for pool in pools:
+            if pool is not None:
+                pool.close()
+                await pool.wait_closed()
+
+    @app.after_request
+    async def _pin_writer(response):
+        # Same read-your-writes window as the Flask app's writes
+        if (replicas is not None and request.method not in READ_METHODS and response.status_code < 400
+                and replicas.pin_seconds):
+            replicas.pin(response)
+        return response
+
+    @app.after_request
+    async def _compress(response):
+        if not is_compressible(response, app.config):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = choose_encoding(request, app.config)
+        if encoding is None:
+            return response
+        data = await response.get_data()
+        if len(data) >= app.config['COMPRESS_MIN_SIZE']:
+            response.set_data(compress_bytes(data, encoding, app.config))
+            mark_encoded(response, encoding)
+        return response
+
+    return AsgiDispatcher(app, flask_app, threads=app.config['ASYNC_FALLBACK_THREADS'])
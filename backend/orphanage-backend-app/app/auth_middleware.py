@@ -0,0 +1,127 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import jwt
+from flask import current_app, g, jsonify, request  # type: ignore
+
+from app.metrics import timed
+
+
+class TokenCache:
+    """Bounded LRU of verified token payloads, keyed by a hash of the token.
+
+    Entries are dropped once the token's ``exp`` has passed, so a cached
+    token is never accepted for longer than jwt.decode would accept it.
+    """
+
+    def __init__(self, max_entries=4096, max_age=300):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, payload = item
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, token, payload):
+        # Never keep a token past its own expiry, nor longer than max_age
+        expires_at = time.time() + self.max_age
+        if 'exp' in payload:
+            expires_at = min(expires_at, payload['exp'])
+
+        with self._lock:
+            self._entries[self._key(token)] = (expires_at, payload)
+            self._entries.move_to_end(self._key(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def decode_token(token):
+    """Verify a JWT, skipping the HMAC check for tokens verified recently."""
+    cache = current_app.extensions['token_cache']
+    with timed('auth'):
+        payload = cache.get(token)
+        if payload is None:
+            payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+            cache.set(token, payload)
+    return payload
+
+
+def current_principal():
+    """Resolve the caller from the Authorization header once per request.
+
+    Returns ``(payload, None)`` or ``(None, (error_message, status))``.
+    """
+    if '_principal' not in g:
+        token = request.headers.get('Authorization') or g.get('_query_token')
+        if not token:
+            g._principal = (None, ("Token is missing!", 401))
+        else:
+            try:
+                g._principal = (decode_token(token), None)
+            except jwt.ExpiredSignatureError:
+                g._principal = (None, ("Token has expired!", 401))
+            except jwt.InvalidTokenError:
+                g._principal = (None, ("Invalid token!", 401))
+    return g._principal
+
+
+def query_token_allowed(view):
+    """Also accept the token as ``?access_token=``, for EventSource clients that cannot send headers."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        g._query_token = request.args.get('access_token')
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def orphanage_required(view):
+    """Only let orphanage tokens through; the view reads ``g.orphanage_id``."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        payload, error = current_principal()
+        if error:
+            return jsonify({"error": error[0]}), error[1]
+        if 'orphanage_id' not in payload:
+            return jsonify({"error": "Unauthorized: Orphanages only"}), 403
+
+        g.orphanage_id = payload['orphanage_id']
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def admin_required(view):
+    """Only let admin tokens through; the view reads ``g.user_id``."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        payload, error = current_principal()
+        if error:
+            return jsonify({"error": error[0]}), error[1]
+        if payload.get('role') != 'admin':
+            return jsonify({"error": "Unauthorized: Admins only"}), 403
+
+        g.user_id = payload['user_id']
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def init_app(app):
+    app.extensions['token_cache'] = TokenCache(max_entries=app.config['TOKEN_CACHE_SIZE'],
+                                               max_age=app.config['TOKEN_CACHE_MAX_AGE'])
@@ -1,25 +1,17 @@
-from flask import Blueprint, request, jsonify # type: ignore
+from flask import Blueprint, current_app, g, request, jsonify # type: ignore
 import mysql.connector # type: ignore
-from werkzeug.security import generate_password_hash, check_password_hash
-from app.config import Config
+from app.auth_middleware import orphanage_required
+from app.conditional import conditional
+from app.db import close_db, get_pool
+from app.repository import get_repo
+from app.passwords import PasswordHasherBusy, get_hasher
 import jwt
 from datetime import datetime, timedelta, timezone
 
 
-# Secret key for signing JWT (store it securely, e.g., in environment variables)
-SECRET_KEY = 'your_secret_key'
-
-
 # Create a Blueprint for authentication routes
 auth = Blueprint('auth', __name__)
 
-# Use the config values for the MySQL connection
-db_config = {
-    'user': Config.MYSQL_USER,
-    'password': Config.MYSQL_PASSWORD,
-    'host': Config.MYSQL_HOST,
-    'database': Config.MYSQL_DATABASE
-}
 
 # Registration Route
 @auth.route('/register', methods=['POST'])
@@ -31,21 +23,23 @@ def register():
         password = data['password']
         role = data.get('role', 'orphanage')
 
-        # Hash the password using pbkdf2:sha256
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256', salt_length=16)
+        # Hash the password on the dedicated hashing pool with the configured work factor
+        hashed_password = get_hasher().hash(password)
 
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor()
+        repo = get_repo()
 
-        # Insert user into the database
-        cursor.execute("INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, %s)", 
-                        (name, email, hashed_password, role))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        # Insert user into the database; the unique index on email rejects a second account
+        try:
+            repo.add_user(name, email, hashed_password, role)
+        except get_pool().integrity_error_class:
+            repo.rollback()
+            return jsonify({"error": "An account with this email already exists"}), 409
+        repo.commit()
 
         return jsonify({"message": "User registered successfully!"}), 201
 
+    except PasswordHasherBusy as err:
+        return jsonify({"error": str(err)}), 503
     except mysql.connector.Error as err:
         return jsonify({"error": str(err)}), 500
     except Exception as e:
@@ -60,52 +54,50 @@ def login():
         email = data['email']
         password = data['password']
 
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
+        repo = get_repo()
 
         # Check if the user exists in the database
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
+        user = repo.get_user_by_email(email)
 
         if user is None:
             return jsonify({"error": "User not found"}), 404
 
+        # Give the connection back while the hash is checked, so logins queued on the
+        # hashing pool do not hold every pooled connection
+        close_db()
+
         # Check if the password is correct
-        if check_password_hash(user['password'], password):
+        password_ok, new_hash = get_hasher().verify(user['password'], password)
+
+        # Upgrade hashes stored with an older work factor while we know the password
+        if new_hash:
+            repo = get_repo()
+            repo.update_password(user['id'], new_hash)
+            repo.commit()
+
+        if password_ok:
             # Generate JWT token with orphanage_id
             token = jwt.encode({
                 'orphanage_id': user['id'],  # Include orphanage ID in the token
                 'exp': datetime.now(timezone.utc) + timedelta(hours=48)  # Token expiration time (1 hour)
-            }, SECRET_KEY, algorithm="HS256")
+            }, current_app.config['SECRET_KEY'], algorithm="HS256")
 
             return jsonify({"message": "Login successful!", "token": token}), 200
         else:
             return jsonify({"error": "Incorrect password"}), 401
 
+    except PasswordHasherBusy as err:
+        return jsonify({"error": str(err)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 
 # Route to orphanage to setup account
 @auth.route('/setup-account', methods=['POST'])
+@orphanage_required
 def setup_orphanage_account():
     try:
-        # Get the token from the Authorization header
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Token is missing!"}), 401
-
-        # Decode the token to get the orphanage_id
-        try:
-            decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            orphanage_id = decoded_token['orphanage_id']
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token!"}), 401
+        orphanage_id = g.orphanage_id
 
         # Get the request data
         data = request.json
@@ -129,23 +121,16 @@ def setup_orphanage_account():
         except ValueError:
             return jsonify({"error": "Invalid date format for license_expiration_date. Expected format: YYYY-MM-DD"}), 400
 
-        # Connect to the database
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor()
+        repo = get_repo()
 
         # Insert the verification data into the orphanage_verification table
-        cursor.execute("""
-            INSERT INTO orphanage_verification (orphanage_id, governorate, address, registration_certificate_number, 
-                                                operating_license_number, license_expiration_date, manager_national_id, 
-                                                tax_id, bank_account_details)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (orphanage_id, governorate, address, registration_certificate_number, operating_license_number,
-              license_expiration_date, manager_national_id, tax_id, bank_account_details))
+        repo.add_verification(orphanage_id, governorate, address, registration_certificate_number,
+                              operating_license_number, license_expiration_date, manager_national_id,
+                              tax_id, bank_account_details)
 
-        conn.commit()
+        repo.bump_versions('orphanages')
 
-        cursor.close()
-        conn.close()
+        repo.commit()
 
         return jsonify({"message": "Orphanage verification data submitted successfully!"}), 201
 
@@ -155,38 +140,14 @@ def setup_orphanage_account():
         return jsonify({"error": str(e)}), 500
 
 @auth.route('/orphanage-account', methods=['GET'])
+@orphanage_required
+@conditional('orphanages')
 def get_orphanage_account():
     try:
-        # Get the token from the Authorization header
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Token is missing!"}), 401
-
-        # Decode the token to get orphanage_id
-        try:
-            decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            orphanage_id = decoded_token['orphanage_id']  # Assuming orphanage_id is stored in the token
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token!"}), 401
-
-        # Connect to the database to retrieve orphanage account data
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
+        orphanage_id = g.orphanage_id
 
         # Fetch orphanage account setup data from the orphanage_verification table
-        cursor.execute("""
-            SELECT address, registration_certificate_number, operating_license_number, 
-                   license_expiration_date, manager_national_id, tax_id, bank_account_details,
-                   status, rejection_reason, governorate
-            FROM orphanage_verification
-            WHERE orphanage_id = %s
-        """, (orphanage_id,))
-        orphanage_account = cursor.fetchone()
-
-        cursor.close()
-        conn.close()
+        orphanage_account = get_repo().get_orphanage_account(orphanage_id)
 
         if orphanage_account:
             return jsonify(orphanage_account), 200
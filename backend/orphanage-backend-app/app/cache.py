@@ -0,0 +1,287 @@
+import asyncio
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from flask import current_app, request  # type: ignore
+
+
+# Sentinel for "not in the cache" so that falsy values can still be cached
+MISSING = object()
+
+
+class BaseCache:
+    """Read-through cache with tag-based invalidation and single-flight misses.
+
+    Every entry remembers the version of each of its tags at the time it was
+    computed. ``invalidate(tag)`` bumps the tag's version, which makes every
+    entry carrying that tag stale without having to find and delete it.
+
+    ``invalidate`` only reaches this process (or one Redis). Views behind
+    ``conditional`` also pass the ``data_versions`` counters their request
+    read as ``versions``; they become part of the key, so a bump from
+    anywhere (another worker, ``flask db rebuild-catalogue``, the facet
+    reconciler) is seen on the next request, and a body is only ever served
+    under the ETag of the versions it was read at.
+    """
+
+    def __init__(self, default_ttl=60):
+        self.default_ttl = default_ttl
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        self._flights_lock = threading.Lock()
+        self._flights = {}
+        self._async_flights = {}
+
+    def get_or_set(self, key, compute, ttl=None, tags=(), versions=None):
+        """Return the cached value for ``key``, computing and storing it on a miss.
+
+        Concurrent misses for the same key wait for the first caller instead of
+        all hitting the database. ``None`` results are returned but not cached.
+        """
+        key = versioned_key(key, versions)
+        value = self._lookup(key)
+        if value is not MISSING:
+            self._count('hits')
+            return value
+
+        with self._flight(key):
+            # Another caller may have filled the entry while we were waiting
+            value = self._lookup(key)
+            if value is not MISSING:
+                self._count('hits')
+                return value
+
+            self._count('misses')
+
+            # Snapshot tag versions before computing, so an invalidation that
+            # races with the query leaves the stored entry already stale
+            versions = self._get_versions(tags)
+            value = compute()
+            if value is not None:
+                self._set(key, (value, versions), ttl or self.default_ttl)
+            return value
+
+    async def get_or_set_async(self, key, compute, ttl=None, tags=(), versions=None):
+        """``get_or_set`` for the async serving mode, where ``compute`` is a coroutine function.
+
+        Concurrent misses are coalesced per event loop.
+        """
+        key = versioned_key(key, versions)
+        value = self._lookup(key)
+        if value is not MISSING:
+            self._count('hits')
+            return value
+
+        lock, waiters = self._async_flights.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._async_flights[key] = (lock, waiters + 1)
+        try:
+            async with lock:
+                value = self._lookup(key)
+                if value is not MISSING:
+                    self._count('hits')
+                    return value
+
+                self._count('misses')
+                versions = self._get_versions(tags)
+                value = await compute()
+                if value is not None:
+                    self._set(key, (value, versions), ttl or self.default_ttl)
+                return value
+        finally:
+            lock, waiters = self._async_flights[key]
+            if waiters == 1:
+                del self._async_flights[key]
+            else:
+                self._async_flights[key] = (lock, waiters - 1)
+
+    def invalidate(self, *tags):
+        self._bump_versions(tags)
+        self._count('invalidations', len(tags))
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _lookup(self, key):
+        entry = self._get(key)
+        if entry is None:
+            return MISSING
+        value, versions = entry
+        if versions and self._get_versions(versions) != versions:
+            return MISSING
+        return value
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    @contextmanager
+    def _flight(self, key):
+        # One lock per key being computed, dropped once nobody is waiting on it
+        with self._flights_lock:
+            lock, waiters = self._flights.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._flights[key] = (lock, waiters + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._flights_lock:
+                lock, waiters = self._flights[key]
+                if waiters == 1:
+                    del self._flights[key]
+                else:
+                    self._flights[key] = (lock, waiters - 1)
+
+    # Backend interface
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, entry, ttl):
+        raise NotImplementedError
+
+    def _get_versions(self, tags):
+        raise NotImplementedError
+
+    def _bump_versions(self, tags):
+        raise NotImplementedError
+
+
+class MemoryCache(BaseCache):
+    """In-process LRU cache with per-entry TTL."""
+
+    def __init__(self, max_entries=1024, default_ttl=60):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._stats['evictions'] = 0
+
+    def stats(self):
+        stats = super().stats()
+        stats['entries'] = len(self._entries)
+        return stats
+
+    def _get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _set(self, key, entry, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._count('evictions')
+
+    def _get_versions(self, tags):
+        with self._lock:
+            return {tag: self._versions.get(tag, 0) for tag in tags}
+
+    def _bump_versions(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class RedisCache(BaseCache):
+    """Cache stored in a local Redis-compatible server, shared by all workers."""
+
+    def __init__(self, url, default_ttl=60, prefix='orphanage:cache:', lock_timeout=10):
+        try:
+            import redis  # type: ignore
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND 'redis' requires the 'redis' package to be installed")
+
+        super().__init__(default_ttl)
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self._client = redis.Redis.from_url(url)
+
+    @contextmanager
+    def _flight(self, key):
+        # Coalesce misses inside this process first, then across processes
+        with super()._flight(key):
+            lock_key = self.prefix + 'lock:' + key
+            deadline = time.monotonic() + self.lock_timeout
+            acquired = False
+            while True:
+                if self._client.set(lock_key, b'1', nx=True, px=int(self.lock_timeout * 1000)):
+                    acquired = True
+                    break
+                # Stop waiting once the holder has stored the value (or took too long)
+                if self._client.exists(self.prefix + key) or time.monotonic() >= deadline:
+                    break
+                time.sleep(0.05)
+            try:
+                yield
+            finally:
+                if acquired:
+                    self._client.delete(lock_key)
+
+    def _get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def _set(self, key, entry, ttl):
+        self._client.set(self.prefix + key, pickle.dumps(entry), ex=int(ttl))
+
+    def _get_versions(self, tags):
+        tags = list(tags)
+        if not tags:
+            return {}
+        values = self._client.mget([self.prefix + 'tag:' + tag for tag in tags])
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    def _bump_versions(self, tags):
+        pipe = self._client.pipeline()
+        for tag in tags:
+            pipe.incr(self.prefix + 'tag:' + tag)
+        pipe.execute()
+
+
+def get_cache(app=None):
+    app = app or current_app
+    return app.extensions['cache']
+
+
+def versioned_key(key, versions):
+    """``key`` for a value read at ``versions``, the {scope: version} data_versions counters."""
+    if not versions:
+        return key
+    return key + '@' + ','.join(f"{scope}={version}" for scope, version in sorted(versions.items()))
+
+
+def cache_key(prefix, args=None):
+    """Key for the current request: ``prefix`` plus its query string in a stable order."""
+    args = sorted((request.args if args is None else args).items(multi=True))
+    return f"{prefix}?{urlencode(args)}" if args else prefix
+
+
+def init_app(app):
+    backend = app.config['CACHE_BACKEND']
+    if backend == 'memory':
+        cache = MemoryCache(max_entries=app.config['CACHE_MAX_ENTRIES'],
+                            default_ttl=app.config['CACHE_DEFAULT_TTL'])
+    elif backend == 'redis':
+        cache = RedisCache(app.config['CACHE_REDIS_URL'], default_ttl=app.config['CACHE_DEFAULT_TTL'])
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND: {backend!r}")
+
+    app.extensions['cache'] = cache
@@ -0,0 +1,243 @@
+import csv
+import io
+import json
+import re
+from collections import Counter
+
+from app.media import is_image_key
+
+
+# Age ranges counted by /children/facets: (label, oldest age in the range); the last one is open-ended
+AGE_BUCKETS = (('0-2', 2), ('3-5', 5), ('6-9', 9), ('10-12', 12), ('13-17', 17), ('18+', None))
+
+
+def hobby_names(aggregated):
+    """Turn a JSON_ARRAYAGG of hobby names into a list, dropping the NULL a LEFT JOIN yields for no hobbies."""
+    if not aggregated:
+        return []
+    if isinstance(aggregated, (bytes, bytearray)):
+        aggregated = aggregated.decode('utf-8')
+    return [name for name in json.loads(aggregated) if name is not None]
+
+
+def int_arg(args, name, minimum=None, maximum=None):
+    """Read an optional integer query parameter, raising ValueError if it is malformed."""
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"'{name}' must be at least {minimum}")
+    if maximum is not None and value > maximum:
+        raise ValueError(f"'{name}' must be at most {maximum}")
+    return value
+
+
+def children_page_filters(args, config):
+    """Cursor, page size and filters for /children, validated from the query string."""
+    return {
+        'after': int_arg(args, 'after', minimum=0),
+        'limit': int_arg(args, 'limit', minimum=1, maximum=config['CHILDREN_MAX_PAGE_SIZE'])
+                 or config['CHILDREN_PAGE_SIZE'],
+        'orphanage_id': int_arg(args, 'orphanage_id'),
+        'governorate': args.get('governorate'),
+        'min_age': int_arg(args, 'min_age', minimum=0),
+        'max_age': int_arg(args, 'max_age', minimum=0),
+    }
+
+
+def int_list_arg(args, name, max_items):
+    """Read optional integers given as '1,2,3' and/or by repeating the parameter."""
+    values = [value.strip() for raw in args.getlist(name) for value in raw.split(',') if value.strip()]
+    if len(values) > max_items:
+        raise ValueError(f"At most {max_items} values for '{name}'")
+    try:
+        return list(dict.fromkeys(int(value) for value in values))
+    except ValueError:
+        raise ValueError(f"'{name}' must be a list of integers")
+
+
+def fields_arg(args, allowed):
+    """Field names asked for with ?fields=a,b, checked against ``allowed``; None when the parameter is absent."""
+    names = [name.strip() for raw in args.getlist('fields') for name in raw.split(',') if name.strip()]
+    if not names:
+        return None
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}; choose from {sorted(allowed)}")
+    return list(dict.fromkeys(names))
+
+
+def children_search_filters(args, config):
+    """Text, filters and page for /children/search, validated from the query string."""
+    text = args.get('q', '')
+    if len(text) > config['CHILDREN_SEARCH_MAX_TEXT']:
+        raise ValueError(f"'q' must be at most {config['CHILDREN_SEARCH_MAX_TEXT']} characters")
+    min_age = int_arg(args, 'min_age', minimum=0)
+    max_age = int_arg(args, 'max_age', minimum=0)
+    if min_age is not None and max_age is not None and min_age > max_age:
+        raise ValueError("'min_age' must not be greater than 'max_age'")
+    return {
+        # Only words are searched for, so full-text operators in the input mean nothing
+        'text': ' '.join(re.findall(r'\w+', text)) or None,
+        'hobby_ids': int_list_arg(args, 'hobbies', config['CHILDREN_SEARCH_MAX_HOBBIES']),
+        'governorate': args.get('governorate') or None,
+        'min_age': min_age,
+        'max_age': max_age,
+        'offset': int_arg(args, 'offset', minimum=0, maximum=config['CHILDREN_SEARCH_MAX_OFFSET']) or 0,
+        'limit': int_arg(args, 'limit', minimum=1, maximum=config['CHILDREN_MAX_PAGE_SIZE'])
+                 or config['CHILDREN_PAGE_SIZE'],
+    }
+
+
+def split_page(rows, limit):
+    """Drop the look-ahead row; returns (rows, next_cursor) where the cursor is the last id or None."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]['id']
+    return rows, None
+
+
+def age_bucket(age):
+    for label, oldest in AGE_BUCKETS:
+        if oldest is None or age <= oldest:
+            return label
+
+
+def facet_counts(rows):
+    """Count (facet, value) pairs over catalogue rows of (child_id, governorate, age, hobby_id).
+
+    A child appears once per hobby, so governorate and age are counted once per child.
+    """
+    counts = Counter()
+    seen = set()
+    for row in rows:
+        if row['child_id'] not in seen:
+            seen.add(row['child_id'])
+            if row['governorate']:
+                counts[('governorate', row['governorate'])] += 1
+            counts[('age', age_bucket(row['age']))] += 1
+        if row['hobby_id'] is not None:
+            counts[('hobby', str(row['hobby_id']))] += 1
+    return counts
+
+
+def facet_deltas(before, after):
+    """Sorted (facet, value, change) rows turning the ``before`` counts into ``after``, zero changes left out."""
+    changes = ((key, after.get(key, 0) - before.get(key, 0)) for key in set(before) | set(after))
+    return sorted((facet, value, change) for (facet, value), change in changes if change)
+
+
+def group_facets(rows):
+    """Shape catalogue_facets rows for /children/facets: largest first, age buckets in age order."""
+    facets = {'governorate': [], 'hobby': [], 'age': []}
+    for row in rows:
+        if row['facet'] == 'hobby':
+            facets['hobby'].append({'id': int(row['value']), 'name': row['hobby_name'], 'count': row['children']})
+        elif row['facet'] in facets:
+            facets[row['facet']].append({'value': row['value'], 'count': row['children']})
+    facets['governorate'].sort(key=lambda item: (-item['count'], item['value']))
+    facets['hobby'].sort(key=lambda item: (-item['count'], item['id']))
+    order = [label for label, _ in AGE_BUCKETS]
+    facets['age'].sort(key=lambda item: order.index(item['value']) if item['value'] in order else len(order))
+    return facets
+
+
+def merge_hobbies(children, rows):
+    """Give every child a 'hobbies' list filled from (child_id, name) rows."""
+    by_id = {child['id']: child for child in children}
+    for child in children:
+        child['hobbies'] = []
+    for row in rows:
+        by_id[row['child_id']]['hobbies'].append(row['name'])
+    return children
+
+
+def read_bulk_rows(req):
+    """Read child rows from a JSON array body or an uploaded CSV/NDJSON file.
+
+    CSV files need a header row; their 'hobbies' column holds hobby IDs separated by ';'.
+    """
+    upload = req.files.get('file')
+    if upload is None:
+        data = req.get_json()
+        if isinstance(data, dict):
+            data = data.get('children')
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON array of children or an uploaded 'file'")
+        return data
+
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig')
+    filename = (upload.filename or '').lower()
+
+    if filename.endswith(('.ndjson', '.jsonl')) or upload.mimetype == 'application/x-ndjson':
+        rows = []
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                raise ValueError(f"Line {line_number} is not valid JSON")
+        return rows
+
+    if filename.endswith('.csv') or upload.mimetype == 'text/csv':
+        rows = []
+        for row in csv.DictReader(stream):
+            hobbies = (row.get('hobbies') or '').strip()
+            row['hobbies'] = [hobby.strip() for hobby in hobbies.split(';') if hobby.strip()]
+            rows.append(row)
+        return rows
+
+    raise ValueError("Unsupported file type, upload a .csv or .ndjson file")
+
+
+def validate_child(row, known_hobby_ids):
+    """Return (child, errors) for one bulk row; child holds normalised values."""
+    if not isinstance(row, dict):
+        return None, ["Row must be an object"]
+
+    errors = []
+    name = row.get('name')
+    if not isinstance(name, str) or not name.strip():
+        errors.append("'name' is required")
+
+    try:
+        age = int(row.get('age'))
+        if age < 0:
+            errors.append("'age' must not be negative")
+    except (TypeError, ValueError):
+        age = None
+        errors.append("'age' must be an integer")
+
+    hobby_ids = row.get('hobbies') or []
+    if not isinstance(hobby_ids, list):
+        errors.append("'hobbies' must be a list of hobby IDs")
+        hobby_ids = []
+    try:
+        hobby_ids = list(dict.fromkeys(int(hobby_id) for hobby_id in hobby_ids))
+    except (TypeError, ValueError):
+        errors.append("'hobbies' must only contain hobby IDs")
+        hobby_ids = []
+    unknown = [hobby_id for hobby_id in hobby_ids if hobby_id not in known_hobby_ids]
+    if unknown:
+        errors.append(f"Unknown hobby IDs: {unknown}")
+
+    image_key = row.get('image_key') or None
+    if image_key is not None and not is_image_key(image_key):
+        errors.append("'image_key' must be the key returned by /images")
+
+    if errors:
+        return None, errors
+
+    return {
+        'name': name.strip(),
+        'age': age,
+        'image_url': row.get('image_url') or '',
+        'image_key': image_key,
+        'about': row.get('about') or '',
+        'hobbies': hobby_ids,
+    }, []
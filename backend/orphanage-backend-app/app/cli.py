@@ -0,0 +1,104 @@
+"""Database commands, run as ``flask --app app db <command>``.
+
+``upgrade`` applies pending migrations from ``app/migrations``, ``status``
+lists which are applied, and ``check`` EXPLAINs the hot queries and exits
+with status 1 when any of them reads a whole table, so a missing index
+fails CI instead of showing up as a slow endpoint. ``rebuild-catalogue``
+recomputes the public_children table should it ever drift from the source
+tables, ``reconcile-facets`` recounts the /children/facets counters and
+``flush-interests`` writes out the buffered /express-interest queue.
+"""
+import sys
+
+import click  # type: ignore
+from flask import current_app  # type: ignore
+from flask.cli import AppGroup  # type: ignore
+
+from app import schema
+from app.db import get_db
+from app.interest_buffer import make_writer
+from app.repository import get_repo, hot_queries
+
+
+db_cli = AppGroup('db', help="Schema migrations and index checks.")
+
+
+def _dialect():
+    return current_app.config['DB_BACKEND']
+
+
+@db_cli.command('upgrade')
+@click.option('--to', 'target', help="Stop after this migration version.")
+def upgrade_command(target):
+    """Apply pending migrations."""
+    done = schema.upgrade(get_db(), _dialect(), target=target, echo=click.echo)
+    click.echo(f"Applied {len(done)} migration(s)" if done else "Schema is up to date")
+
+
+@db_cli.command('status')
+def status_command():
+    """List migrations and whether they are applied."""
+    done = schema.applied(get_db())
+    for migration in schema.available(_dialect()):
+        state = 'applied' if migration.version in done else 'pending'
+        click.echo(f"{migration.version}_{migration.name}: {state}")
+
+
+@db_cli.command('check')
+def check_command():
+    """EXPLAIN the hot queries and fail if any of them scans a whole table."""
+    repo = get_repo()
+    failures = 0
+    for name, query, params in hot_queries(_dialect()):
+        scans = repo.full_scans(repo.explain(query, params))
+        if scans:
+            failures += 1
+            click.echo(f"FULL SCAN  {name}: {', '.join(scans)}")
+        else:
+            click.echo(f"ok         {name}")
+    repo.rollback()
+    if failures:
+        click.echo(f"{failures} hot query(ies) read a whole table; add an index or a migration")
+        sys.exit(1)
+
+
+@db_cli.command('rebuild-catalogue')
+def rebuild_catalogue_command():
+    """Recompute the public catalogue from children and orphanage_verification."""
+    repo = get_repo()
+    try:
+        rows = repo.rebuild_catalogue()
+        # Clients holding an ETag for /children must refetch
+        repo.bump_versions('children')
+        repo.commit()
+    except Exception:
+        repo.rollback()
+        raise
+    click.echo(f"Public catalogue rebuilt with {rows} children")
+
+
+@db_cli.command('reconcile-facets')
+def reconcile_facets_command():
+    """Recount the /children/facets counters from the public catalogue."""
+    repo = get_repo()
+    try:
+        drifted = repo.reconcile_facets()
+        repo.bump_versions('children')
+        repo.commit()
+    except Exception:
+        repo.rollback()
+        raise
+    click.echo(f"Facet counters recounted, {drifted} had drifted")
+
+
+@db_cli.command('flush-interests')
+def flush_interests_command():
+    """Write every submission waiting in the /express-interest queue file."""
+    writer = current_app.extensions.get('interest_writer') or make_writer(current_app)
+    flushed = writer.drain()
+    stats = writer.stats()
+    click.echo(f"Flushed {flushed} submission(s), {stats['dead_letters']} in the dead-letter table")
+
+
+def init_app(app):
+    app.cli.add_command(db_cli)
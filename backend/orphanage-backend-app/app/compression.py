@@ -0,0 +1,114 @@
+import zlib
+
+from flask import request  # type: ignore
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # optional dependency, only gzip is offered without it
+    brotli = None
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        # Emit everything buffered so far so streamed chunks reach the client promptly
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _compressor(encoding, config):
+    if encoding == 'br':
+        return _Brotli(config['COMPRESS_BR_QUALITY'])
+    return _Gzip(config['COMPRESS_LEVEL'])
+
+
+def _stream(chunks, compressor):
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def is_compressible(response, config):
+    return not (response.status_code < 200 or response.status_code in (204, 304)
+                or getattr(response, 'direct_passthrough', False)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in config['COMPRESS_MIMETYPES']
+                or 'no-transform' in response.headers.get('Cache-Control', ''))
+
+
+def choose_encoding(req, config):
+    """Best encoding both we and the client support, or None."""
+    offered = [encoding for encoding in config['COMPRESS_ALGORITHMS']
+               if encoding == 'gzip' or (encoding == 'br' and brotli is not None)]
+    return req.accept_encodings.best_match(offered)
+
+
+def compress_bytes(data, encoding, config):
+    compressor = _compressor(encoding, config)
+    return compressor.compress(data) + compressor.finish()
+
+
+def mark_encoded(response, encoding):
+    response.headers['Content-Encoding'] = encoding
+
+    # The compressed bytes differ from the identity ones, so the validator becomes weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response, config):
+    """Compress ``response`` with the best encoding the client accepts, if worthwhile."""
+    if not is_compressible(response, config):
+        return response
+
+    # Whether or not this client gets it compressed, the body depends on Accept-Encoding
+    response.vary.add('Accept-Encoding')
+
+    encoding = choose_encoding(request, config)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        # Compress chunk by chunk as the body is produced
+        response.response = _stream(response.response, _compressor(encoding, config))
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(compress_bytes(data, encoding, config))
+
+    mark_encoded(response, encoding)
+    return response
+
+
+def init_app(app):
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, app.config)
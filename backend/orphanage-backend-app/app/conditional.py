@@ -0,0 +1,67 @@
+import hashlib
+import logging
+from functools import wraps
+
+from flask import g, make_response, request  # type: ignore
+
+from app.repository import get_repo
+
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(full_path, versions):
+    fingerprint = repr((full_path, sorted(versions.items())))
+    return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+
+def is_not_modified(req, etag, last_modified):
+    """Whether the client's cached copy (If-None-Match / If-Modified-Since) is still current."""
+    if req.if_none_match:
+        return req.if_none_match.contains_weak(etag)
+    return (last_modified is not None and req.if_modified_since is not None
+            and last_modified.replace(microsecond=0) <= req.if_modified_since)
+
+
+def conditional(*scope_templates):
+    """Answer If-None-Match / If-Modified-Since with 304 before running the view.
+
+    The ETag is derived from the version counters of ``scope_templates``
+    (formatted with the view's URL arguments and ``g.orphanage_id``) plus the
+    request path and query string, so it changes whenever a write bumps one
+    of those scopes. It names the data, not the bytes, so it is sent weak on
+    200 and 304 alike, whether or not app.compression encodes the body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            fields = {'orphanage_id': g.get('orphanage_id'), **kwargs}
+            scopes = [template.format(**fields) for template in scope_templates]
+
+            try:
+                versions, last_modified = get_repo().get_versions(scopes)
+            except Exception:
+                # Without version counters just serve the full response
+                logger.exception("Could not read data versions for %s", scopes)
+                return view(*args, **kwargs)
+
+            # Cached bodies are looked up at these versions (see app.cache)
+            g.data_versions = versions
+            etag = make_etag(request.full_path, versions)
+
+            # Nothing changed since the client's copy: skip the query and the body
+            if is_not_modified(request, etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Let clients keep the body but revalidate it on every use
+            response.cache_control.no_cache = True
+            return response
+        return wrapped
+    return decorator
@@ -1,5 +1,146 @@
 class Config:
+    # Secret key for signing JWT (store it securely, e.g., in environment variables)
+    SECRET_KEY = 'your_secret_key'
+
+    # Database backend: 'mysql', or 'sqlite' for local runs and benchmarks without a MySQL server
+    DB_BACKEND = 'mysql'
+    SQLITE_PATH = 'orphanage.sqlite3'  # created with its schema on first use
+
     MYSQL_USER = 'fatma'
     MYSQL_PASSWORD = ''
     MYSQL_HOST = 'localhost'
     MYSQL_DATABASE = 'orphanage_db'
+
+    # Production server (serve.py): gunicorn workers forked from one preloaded app
+    SERVER_BIND = '0.0.0.0:8000'
+    SERVER_WORKERS = 0  # 0 means 2 x CPUs + 1; each worker opens up to MYSQL_POOL_SIZE connections
+    SERVER_THREADS = 8  # per worker; open /submissions/stream connections each hold one
+    SERVER_MAX_REQUESTS = 10000  # a worker is replaced after this many requests (0 never)
+    SERVER_MAX_REQUESTS_JITTER = 1000  # so workers are not all replaced at once
+    SERVER_GRACEFUL_TIMEOUT = 30  # seconds in-flight requests get to finish on reload or shutdown
+    SERVER_TIMEOUT = 60  # seconds before a silent worker is killed and replaced
+    SERVER_KEEPALIVE = 5
+    SERVER_RSS_LOG_INTERVAL = 300  # seconds between per-worker memory reports (0 turns them off)
+
+    # Connection pool shared by all blueprints
+    MYSQL_POOL_SIZE = 10
+    MYSQL_POOL_TIMEOUT = 5  # seconds to wait for a free connection
+    MYSQL_POOL_RECYCLE = 3600  # seconds before a connection is reopened
+    MYSQL_POOL_PRE_PING = True  # check idle connections before handing them out
+
+    # Read replicas for GET requests ('host' or 'host:port'; same user, password and database
+    # as the primary). Empty means every query goes to MYSQL_HOST
+    MYSQL_REPLICAS = []
+    REPLICA_POOL_SIZE = 10  # per replica
+    REPLICA_POOL_TIMEOUT = 1  # seconds to wait for a replica connection before reading from the primary
+    REPLICA_MAX_LAG = 5  # seconds; replicas further behind leave the rotation until they catch up
+    REPLICA_LAG_CHECK_INTERVAL = 5  # seconds between lag checks in every process (0 turns them off)
+    REPLICA_REJOIN_SECONDS = 30  # with lag checks off, seconds before a replica that failed to connect is retried
+    READ_YOUR_WRITES_SECONDS = 5  # a client's reads go to the primary this long after its own write
+    READ_YOUR_WRITES_COOKIE = 'read_primary_until'
+
+    # Server-side prepared statements kept open per pooled connection
+    MYSQL_STATEMENT_CACHE_SIZE = 128
+
+    # aiomysql pool used by the async serving mode (asgi.py)
+    ASYNC_MYSQL_POOL_SIZE = 50
+    # Threads running the routes it hands to the Flask app; each open /submissions/stream holds one
+    ASYNC_FALLBACK_THREADS = 32
+
+    # Public /children listing
+    CHILDREN_PAGE_SIZE = 20
+    CHILDREN_MAX_PAGE_SIZE = 100
+
+    # /children/search: ranked results are paged by offset, so deep pages are capped
+    CHILDREN_SEARCH_MAX_OFFSET = 1000
+    CHILDREN_SEARCH_MAX_HOBBIES = 20
+    CHILDREN_SEARCH_MAX_TEXT = 200  # characters
+
+    # /children/facets counters are recounted this often in every process (seconds; 0 turns it off)
+    FACETS_RECONCILE_INTERVAL = 3600
+
+    # Orphanage dashboards: /submissions?since=<cursor> pages and the /submissions/stream event stream
+    SUBMISSIONS_PAGE_SIZE = 100
+    SUBMISSIONS_MAX_PAGE_SIZE = 500
+    SUBMISSIONS_OVERLAP_SECONDS = 10  # reads look this far back for submissions that committed late
+    SSE_ENABLED = True
+    SSE_POLL_INTERVAL = 5  # seconds between checks for submissions taken by other processes
+    SSE_MAX_SECONDS = 300  # streams end after this long and the browser reconnects with its last event id
+    SSE_RETRY_MS = 3000
+
+    # Buffered /express-interest: acknowledge with 202 once the submission is in a local
+    # queue file and insert the queue in batches, one commit per batch
+    INTEREST_BUFFER_ENABLED = False
+    INTEREST_QUEUE_PATH = 'interest_queue.sqlite3'
+    INTEREST_QUEUE_SYNCHRONOUS = 'FULL'  # SQLite fsync level; 'NORMAL' survives process but not power loss
+    INTEREST_BATCH_SIZE = 500
+    INTEREST_FLUSH_INTERVAL = 0.5  # seconds a submission may wait for its batch
+    INTEREST_RETRY_DELAY = 5  # seconds between attempts while the database is unreachable
+
+    # Child photos uploaded to /images: stored by content hash under MEDIA_ROOT, or in the blob
+    # store class named by MEDIA_BACKEND ('package.module:Class'), and resized in the background
+    # (needs Pillow; without it every URL serves the original)
+    MEDIA_BACKEND = 'local'
+    MEDIA_ROOT = 'media'
+    MEDIA_URL_PREFIX = '/media'  # point at a CDN in front of /media to serve photos from there
+    MEDIA_MAX_BYTES = 10 * 1024 * 1024
+    MEDIA_MAX_PIXELS = 40_000_000  # larger images are stored but not resized
+    MEDIA_RENDITIONS = {'thumb': 240, 'medium': 640, 'large': 1280}  # name -> longest edge in pixels
+    MEDIA_LIST_RENDITION = 'thumb'
+    MEDIA_DETAIL_RENDITION = 'large'
+    MEDIA_JPEG_QUALITY = 85
+    MEDIA_RENDER_WORKERS = 2
+    MEDIA_CACHE_MAX_AGE = 365 * 24 * 3600  # seconds; media URLs never change content
+
+    # Response cache for public child endpoints: 'memory' (per process) or 'redis' (needs the redis package)
+    CACHE_BACKEND = 'memory'
+    CACHE_REDIS_URL = 'redis://localhost:6379/0'
+    CACHE_DEFAULT_TTL = 60  # seconds
+    CACHE_MAX_ENTRIES = 1024
+
+    # Admin review queue (/orphanages-requests?status=&after=&limit=) and /orphanage/verify/batch
+    ORPHANAGE_REQUESTS_PAGE_SIZE = 50
+    ORPHANAGE_REQUESTS_MAX_PAGE_SIZE = 500
+    VERIFY_BATCH_MAX_DECISIONS = 10000
+    VERIFY_BATCH_UPDATE_SIZE = 1000  # decisions per multi-row UPDATE
+
+    # Bulk child ingestion (/children/bulk)
+    BULK_MAX_ROWS = 50000
+    BULK_INSERT_BATCH_SIZE = 1000  # rows per multi-row INSERT
+    MAX_CONTENT_LENGTH = 64 * 1024 * 1024  # largest accepted request body, in bytes
+
+    # Recently verified JWTs, so repeat requests skip signature checks
+    TOKEN_CACHE_SIZE = 4096
+    TOKEN_CACHE_MAX_AGE = 300  # seconds; never longer than the token's own exp
+
+    # Password hashing runs on its own bounded pool; changing the method or
+    # iteration count rehashes each user's password at their next login
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_QUEUE_DEPTH = 32  # waiting jobs before logins get a 503
+    PASSWORD_HASH_TIMEOUT = 10  # seconds
+
+    # JSON encoding: 'orjson' (fast) or 'default' (Flask's encoder)
+    JSON_PROVIDER = 'orjson'
+    # Dates as 'http' (RFC 822, 'Tue, 15 Oct 2024 10:00:00 GMT', what Flask's encoder and existing clients use)
+    # or 'iso' (ISO 8601, orjson only)
+    JSON_DATE_FORMAT = 'http'
+
+    # Response compression negotiated from Accept-Encoding ('br' needs the brotli package)
+    COMPRESS_ALGORITHMS = ['br', 'gzip']
+    COMPRESS_MIMETYPES = ['application/json', 'application/x-ndjson', 'text/event-stream', 'text/plain', 'text/csv']
+    COMPRESS_MIN_SIZE = 1024  # bytes; smaller bodies are sent as-is
+    COMPRESS_LEVEL = 6  # gzip level
+    COMPRESS_BR_QUALITY = 4  # brotli quality
+
+    # Per-endpoint request counts and latency histograms in Prometheus format on /metrics
+    METRICS_ENABLED = True
+
+    # Statement timings; statements slower than the threshold go to a rotating
+    # JSON-lines log, with their EXPLAIN plan the first time
+    SLOW_QUERY_LOG_ENABLED = True
+    SLOW_QUERY_THRESHOLD = 0.1  # seconds
+    SLOW_QUERY_LOG_PATH = None  # default: slow_queries.log in the app's instance folder
+    SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS = 5
+    SLOW_QUERY_TOP_N = 20  # statements listed by /admin/slow-queries
@@ -0,0 +1,254 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+import mysql.connector  # type: ignore
+from mysql.connector import errors  # type: ignore
+from flask import current_app, g  # type: ignore
+
+from app import schema
+from app.metrics import timed
+
+
+logger = logging.getLogger(__name__)
+
+# Called with each pooled connection before the pool closes it for good
+_discard_callbacks = []
+
+
+def on_discard(callback):
+    """Register ``callback(conn)`` to release anything kept per connection; usable as a decorator."""
+    _discard_callbacks.append(callback)
+    return callback
+
+
+class ConnectionPool:
+    """A bounded pool of MySQL connections shared by every blueprint.
+
+    Connections are opened lazily, handed out for the duration of a request
+    and returned by ``close_db`` when the app context is torn down.
+    """
+
+    # Driver errors that mean a connection is no longer usable
+    error_class = errors.Error
+    # Errors caused by the data of a statement rather than by the server or the connection
+    data_error_classes = (errors.IntegrityError, errors.DataError)
+    # A unique or foreign key constraint rejected the statement
+    integrity_error_class = errors.IntegrityError
+
+    def __init__(self, db_config, size=10, timeout=5, recycle=3600, pre_ping=True):
+        self.db_config = db_config
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        # Idle connections paired with the time they were opened (most recently used first)
+        self._idle = queue.LifoQueue()
+        # One slot per connection that may be open at the same time
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._created_at = {}
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'exhausted': 0,
+            'created': 0,
+            'recycled': 0,
+            'stale': 0,
+            'in_use': 0,
+        }
+
+    def acquire(self):
+        start = time.monotonic()
+
+        # Wait for a free slot, giving up after the checkout timeout
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['waits'] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._stats['exhausted'] += 1
+                logger.warning("MySQL pool exhausted: all %s connections busy for %ss", self.size, self.timeout)
+                raise errors.PoolError(
+                    "No database connection available within %s seconds" % self.timeout)
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+            self._stats['wait_seconds'] += time.monotonic() - start
+        return conn
+
+    def release(self, conn):
+        try:
+            # Never hand a half-finished transaction to the next request
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+        except self.error_class:
+            self._discard(conn)
+        finally:
+            with self._lock:
+                self._stats['in_use'] -= 1
+            self._slots.release()
+
+    def open_connection(self):
+        """A new connection outside the pool, e.g. for a monitor; close it with ``close_connection``."""
+        return self._open()
+
+    def close_connection(self, conn):
+        try:
+            conn.close()
+        except self.error_class:
+            pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['size'] = self.size
+        stats['idle'] = self._idle.qsize()
+        return stats
+
+    def _checkout(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            # Reopen connections that are older than the recycle interval
+            age = time.monotonic() - self._created_at.get(id(conn), 0)
+            if self.recycle and age > self.recycle:
+                self._discard(conn)
+                with self._lock:
+                    self._stats['recycled'] += 1
+                continue
+
+            # Make sure the server has not dropped the connection while idle
+            if self.pre_ping:
+                try:
+                    conn.ping(reconnect=False)
+                except self.error_class:
+                    self._discard(conn)
+                    with self._lock:
+                        self._stats['stale'] += 1
+                    continue
+
+            return conn
+
+    def _connect(self):
+        conn = self._open()
+        self._created_at[id(conn)] = time.monotonic()
+        with self._lock:
+            self._stats['created'] += 1
+        return conn
+
+    def _open(self):
+        return mysql.connector.connect(**self.db_config)
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        for callback in _discard_callbacks:
+            callback(conn)
+        self.close_connection(conn)
+
+
+class SQLiteConnectionPool(ConnectionPool):
+    """The same pool over a local SQLite file, used when ``DB_BACKEND`` is 'sqlite'.
+
+    Pending migrations are applied when the first connection is opened.
+    """
+
+    error_class = sqlite3.Error
+    data_error_classes = (sqlite3.IntegrityError, sqlite3.DataError)
+    integrity_error_class = sqlite3.IntegrityError
+
+    def __init__(self, path, size=10, timeout=5):
+        super().__init__({'database': path}, size=size, timeout=timeout, recycle=0, pre_ping=False)
+        self._schema_ready = False
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_config['database'], timeout=self.timeout, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+        # Readers do not block the writer (and vice versa) under the benchmark's mixed traffic
+        conn.execute("PRAGMA journal_mode = WAL")
+
+        with self._lock:
+            if not self._schema_ready:
+                schema.upgrade(conn, 'sqlite')
+                self._schema_ready = True
+        return conn
+
+
+def get_pool(app=None):
+    app = app or current_app
+    return app.extensions['db_pool']
+
+
+def get_db():
+    """Return this request's pooled connection, checking one out on first use.
+
+    With read replicas configured, reads may be served by one of them (see app.replicas).
+    """
+    if 'db' not in g:
+        pool = get_pool()
+        replicas = current_app.extensions.get('replicas')
+        with timed('db_acquire'):
+            if replicas is not None:
+                pool, conn = replicas.acquire(pool)
+            else:
+                conn = pool.acquire()
+        g.db_pool = pool
+        g.db = conn
+    return g.db
+
+
+def close_db(exc=None):
+    g.pop('repo', None)
+    pool = g.pop('db_pool', None)
+    conn = g.pop('db', None)
+    if conn is not None:
+        (pool or get_pool()).release(conn)
+
+
+def create_pool(app):
+    """A new, empty pool for the configured backend; connections are opened on first use."""
+    if app.config['DB_BACKEND'] == 'sqlite':
+        return SQLiteConnectionPool(
+            app.config['SQLITE_PATH'],
+            size=app.config['MYSQL_POOL_SIZE'],
+            timeout=app.config['MYSQL_POOL_TIMEOUT'],
+        )
+
+    # Use the config values for the MySQL connection; the repository reads every
+    # result to the end, so cursors need no client-side buffering
+    db_config = {
+        'user': app.config['MYSQL_USER'],
+        'password': app.config['MYSQL_PASSWORD'],
+        'host': app.config['MYSQL_HOST'],
+        'database': app.config['MYSQL_DATABASE'],
+    }
+
+    return ConnectionPool(
+        db_config,
+        size=app.config['MYSQL_POOL_SIZE'],
+        timeout=app.config['MYSQL_POOL_TIMEOUT'],
+        recycle=app.config['MYSQL_POOL_RECYCLE'],
+        pre_ping=app.config['MYSQL_POOL_PRE_PING'],
+    )
+
+
+def init_app(app):
+    app.extensions['db_pool'] = create_pool(app)
+
+    # Return the request's connection to the pool whatever happened in the view
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,73 @@
+"""Periodic reconciliation of the /children/facets counters.
+
+The counters in catalogue_facets are adjusted by every write that changes
+the public catalogue. Anything that edits the tables behind the
+application's back (a manual fix, a crashed migration) would leave them
+off for good, so each process recounts them every
+``FACETS_RECONCILE_INTERVAL`` seconds and logs how many had drifted.
+"""
+import logging
+import threading
+
+from app.cache import get_cache
+from app.repository import get_repo
+
+
+logger = logging.getLogger(__name__)
+
+
+class FacetReconciler:
+    """Background thread recounting the facets on an interval, started by the first request."""
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        # Started lazily so that a process forked after create_app() runs its own thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='facet-reconciler', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def reconcile(self):
+        """Recount the facets once; returns how many counters had drifted."""
+        with self.app.app_context():
+            repo = get_repo()
+            try:
+                drifted = repo.reconcile_facets()
+                if drifted:
+                    repo.bump_versions('children')
+                repo.commit()
+            except Exception:
+                repo.rollback()
+                raise
+        if drifted:
+            get_cache(self.app).invalidate('children')
+            logger.warning("Corrected %d drifted facet counter(s)", drifted)
+        return drifted
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reconcile()
+            except Exception:
+                logger.exception("Facet reconciliation failed")
+
+
+def init_app(app):
+    interval = app.config['FACETS_RECONCILE_INTERVAL']
+    if not interval:
+        return
+
+    reconciler = app.extensions['facet_reconciler'] = FacetReconciler(app, interval)
+
+    @app.before_request
+    def _start_reconciler():
+        reconciler.start()
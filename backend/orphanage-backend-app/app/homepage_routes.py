@@ -1,83 +1,114 @@
-from flask import Blueprint, request, jsonify  # type: ignore
+from flask import Blueprint, current_app, g, request, jsonify  # type: ignore
 import mysql.connector  # type: ignore
-from app.config import Config
-import jwt
-
-# Secret key for decoding JWT
-SECRET_KEY = 'your_secret_key'
+from app.cache import cache_key, get_cache
+from app.children import children_page_filters, children_search_filters, group_facets, split_page
+from app.conditional import conditional
+from app.media import with_image_urls
+from app.repository import get_repo
+from app.interest_buffer import get_interest_writer
+from app.submissions import get_notifier, validate_interest
 
 # Create a Blueprint for orphan routes
 homePage = Blueprint('homePage', __name__)
 
-# Use the config values for the MySQL connection
-db_config = {
-    'user': Config.MYSQL_USER,
-    'password': Config.MYSQL_PASSWORD,
-    'host': Config.MYSQL_HOST,
-    'database': Config.MYSQL_DATABASE
-}
 
 @homePage.route('/children', methods=['GET'])
+@conditional('children')
 def get_all_children():
     try:
-        # Connect to the database
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
+        # Read the cursor, page size and filters from the query string
+        try:
+            filters = children_page_filters(request.args, current_app.config)
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
+
+        def load_page():
+            # Fetch one page of the public catalogue (approved orphanages only), ordered by id;
+            # hobby names are stored with each row, so this is the only query
+            children = get_repo().list_public_children(**filters)
+
+            # The extra row only tells us there is another page
+            children, next_cursor = split_page(children, filters['limit'])
+
+            # Uploaded photos are linked at their thumbnail size
+            return {"children": with_image_urls(children, 'list'), "next_cursor": next_cursor}
+
+        # Pages are dropped from the cache whenever a child is added or an orphanage verified
+        page = get_cache().get_or_set(cache_key('children'), load_page, tags=['children'],
+                                      versions=g.get('data_versions'))
+
+        return jsonify(page), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@homePage.route('/children/search', methods=['GET'])
+@conditional('children')
+def search_children():
+    try:
+        # Read the text, filters and page from the query string
+        try:
+            filters = children_search_filters(request.args, current_app.config)
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
+
+        def load_results():
+            # Best matches first when there is text to rank by, otherwise in id order
+            children = get_repo().search_children(**filters)
+
+            # The extra row only tells us there is another page; ranked results are paged by offset
+            next_offset = filters['offset'] + filters['limit']
+            has_more = len(children) > filters['limit'] and next_offset <= current_app.config['CHILDREN_SEARCH_MAX_OFFSET']
+            return {"children": with_image_urls(children[:filters['limit']], 'list'),
+                    "next_offset": next_offset if has_more else None}
 
-        # Query to fetch all children from approved orphanages only
-        cursor.execute("""
-            SELECT c.id, c.name, c.age, c.image_url, c.about, c.orphanage_id, o.name as orphanage_name
-            FROM children c
-            JOIN users o ON c.orphanage_id = o.id
-            JOIN orphanage_verification ov ON c.orphanage_id = ov.orphanage_id
-            WHERE ov.status = 'approved'
-        """)
+        results = get_cache().get_or_set(cache_key('children/search'), load_results, tags=['children'],
+                                         versions=g.get('data_versions'))
 
-        children = cursor.fetchall()
+        return jsonify(results), 200
 
-        cursor.close()
-        conn.close()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        return jsonify(children), 200
+
+@homePage.route('/children/facets', methods=['GET'])
+@conditional('children')
+def get_children_facets():
+    try:
+        def load_facets():
+            # Read the maintained counters: one row per governorate, hobby and age bucket,
+            # however many children there are
+            return group_facets(get_repo().get_facets())
+
+        facets = get_cache().get_or_set('children/facets', load_facets, tags=['children'],
+                                        versions=g.get('data_versions'))
+
+        return jsonify(facets), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
 @homePage.route('/children/<int:child_id>', methods=['GET'])
+@conditional('children')
 def get_child_by_id(child_id):
     try:
-        # Connect to the database
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
+        def load_child():
+            # Fetch the child and their hobby names from the public catalogue; children of
+            # orphanages that are not approved come back as None and are not cached
+            child = get_repo().get_public_child(child_id)
 
-        # Query to fetch child details by child_id, joining with orphanage (if needed)
-        cursor.execute("""
-            SELECT c.id, c.name, c.age, c.image_url, c.about, c.orphanage_id, o.name as orphanage_name
-            FROM children c
-            JOIN users o ON c.orphanage_id = o.id
-            WHERE c.id = %s
-        """, (child_id,))
+            # Uploaded photos are linked at their large size
+            return with_image_urls([child], 'detail')[0] if child else None
 
-        child = cursor.fetchone()
+        # 'catalogue' is invalidated when an orphanage's children enter or leave the catalogue
+        child = get_cache().get_or_set(f'children/{child_id}', load_child, tags=[f'child:{child_id}', 'catalogue'],
+                                       versions=g.get('data_versions'))
 
         # If no child is found, return a 404 error
         if not child:
             return jsonify({"error": "Child not found"}), 404
 
-        # Fetch the hobbies associated with the child (if needed)
-        cursor.execute("""
-            SELECT h.name FROM hobbies h
-            JOIN child_hobbies ch ON h.id = ch.hobby_id
-            WHERE ch.child_id = %s
-        """, (child_id,))
-        hobbies = cursor.fetchall()
-
-        # Add hobbies to the child data
-        child['hobbies'] = [hobby['name'] for hobby in hobbies]
-
-        cursor.close()
-        conn.close()
-
         return jsonify(child), 200
 
     except Exception as e:
@@ -90,6 +121,15 @@ def express_interest():
     try:
         # Get the request data
         data = request.json
+
+        # Buffered mode: validate, queue durably and answer before the database sees it
+        if current_app.config['INTEREST_BUFFER_ENABLED']:
+            row, errors = validate_interest(data)
+            if errors:
+                return jsonify({"error": "Invalid submission", "errors": errors}), 400
+            submission_id = get_interest_writer().submit(row)
+            return jsonify({"message": "Interest request received!", "submission_id": submission_id}), 202
+
         orphanage_id = data['orphanage_id']  # Mandatory field
         guest_name = data['guest_name']
         guest_email = data['guest_email']
@@ -97,20 +137,17 @@ def express_interest():
         message = data.get('message', '')  # Optional message
         child_id = data.get('child_id', None)  # Optional child_id, default is None
 
-        # Connect to the database
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor()
+        repo = get_repo()
 
         # Insert the guest's interest into the adoption_sponsorship_requests table
-        cursor.execute("""
-            INSERT INTO adoption_sponsorship_requests (child_id, orphanage_id, guest_name, guest_email, interest_type, message)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (child_id, orphanage_id, guest_name, guest_email, interest_type, message))
+        repo.add_interest(child_id, orphanage_id, guest_name, guest_email, interest_type, message)
+
+        repo.bump_versions(f'submissions:{orphanage_id}')
 
-        conn.commit()
+        repo.commit()
 
-        cursor.close()
-        conn.close()
+        # Push the submission to the orphanage's open dashboards
+        get_notifier().publish(orphanage_id)
 
         return jsonify({"message": "Interest request submitted successfully!"}), 201
 
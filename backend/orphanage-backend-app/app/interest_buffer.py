@@ -0,0 +1,274 @@
+"""Buffered write path for the public /express-interest endpoint.
+
+With ``INTEREST_BUFFER_ENABLED`` a submission is validated, appended to a
+durable queue in a local SQLite file and acknowledged with 202 and its
+submission ID. A writer thread per process moves the queue into
+adoption_sponsorship_requests in batches of up to ``INTEREST_BATCH_SIZE``
+rows, one multi-row INSERT and one commit each, at most
+``INTEREST_FLUSH_INTERVAL`` seconds after a submission arrives (while the
+database is reachable).
+
+Entries leave the queue only once their batch is committed, so whatever is
+left after a crash or restart is flushed by the next writer. Each row
+carries its submission ID in a unique column, so an entry committed just
+before a crash, but not yet removed from the queue, is not inserted twice.
+Several processes may share one queue file for the same reason. Rows the
+database rejects (an unknown orphanage or child) are moved to a
+dead-letter table in the queue file instead of blocking the rest.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app  # type: ignore
+
+from app.db import get_pool
+from app.repository import get_repo
+from app.submissions import get_notifier
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pending (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        uid TEXT NOT NULL UNIQUE,
+        payload TEXT NOT NULL,
+        enqueued_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS dead (
+        seq INTEGER PRIMARY KEY,
+        uid TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        error TEXT NOT NULL,
+        failed_at REAL NOT NULL
+    );
+"""
+
+# Stay well below SQLite's limit on bound parameters per statement
+_DELETE_CHUNK = 500
+
+
+class InterestQueue:
+    """Durable FIFO of submissions in a local SQLite file, one connection per thread."""
+
+    def __init__(self, path, synchronous='FULL', timeout=5):
+        self.path = path
+        self.synchronous = synchronous
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit: every append is durable once it returns
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+            conn.executescript(QUEUE_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def append(self, uid, row):
+        self._conn().execute("INSERT INTO pending (uid, payload, enqueued_at) VALUES (?, ?, ?)",
+                             (uid, json.dumps(row), time.time()))
+
+    def peek(self, limit):
+        """The oldest ``limit`` entries as (seq, uid, row, enqueued_at)."""
+        rows = self._conn().execute(
+            "SELECT seq, uid, payload, enqueued_at FROM pending ORDER BY seq LIMIT ?", (limit,)).fetchall()
+        return [(seq, uid, json.loads(payload), enqueued_at) for seq, uid, payload, enqueued_at in rows]
+
+    def remove(self, seqs):
+        conn = self._conn()
+        for start in range(0, len(seqs), _DELETE_CHUNK):
+            chunk = seqs[start:start + _DELETE_CHUNK]
+            conn.execute(f"DELETE FROM pending WHERE seq IN ({', '.join('?' * len(chunk))})", chunk)
+
+    def dead_letter(self, entry, error):
+        seq, uid, row, _ = entry
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR REPLACE INTO dead (seq, uid, payload, error, failed_at) VALUES (?, ?, ?, ?, ?)",
+                         (seq, uid, json.dumps(row), str(error), time.time()))
+            conn.execute("DELETE FROM pending WHERE seq = ?", (seq,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def depth(self):
+        """(pending entries, age in seconds of the oldest one, dead letters)."""
+        conn = self._conn()
+        count, oldest = conn.execute("SELECT COUNT(*), MIN(enqueued_at) FROM pending").fetchone()
+        dead = conn.execute("SELECT COUNT(*) FROM dead").fetchone()[0]
+        return count, (time.time() - oldest if oldest else 0.0), dead
+
+
+class InterestWriter:
+    """Background thread flushing the queue into the database, started by the first submission."""
+
+    def __init__(self, app, queue, batch_size=500, flush_interval=0.5, retry_delay=5):
+        self.app = app
+        self.queue = queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._unflushed = 0
+        self._stats = {
+            'submitted': 0,
+            'flushed': 0,
+            'batches': 0,
+            'failed_flushes': 0,
+            'dead_letters_added': 0,
+            'flush_seconds_total': 0.0,
+            'flush_seconds_max': 0.0,
+            'last_flush_seconds': 0.0,
+        }
+
+    def start(self):
+        # Started lazily so that a process forked after create_app() runs its own thread;
+        # a new thread begins by flushing whatever an earlier process left behind
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='interest-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def submit(self, row):
+        """Queue a validated (child_id, orphanage_id, guest_name, guest_email, interest_type, message) row.
+
+        Returns the submission ID once the entry is safely on disk.
+        """
+        uid = uuid.uuid4().hex
+        self.queue.append(uid, row)
+        self.start()
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._unflushed += 1
+            full = self._unflushed >= self.batch_size
+        # A full batch does not wait for the interval
+        if full:
+            self._wake.set()
+        return uid
+
+    def flush(self):
+        """Write one batch from the queue; returns how many entries it took off the queue."""
+        entries = self.queue.peek(self.batch_size)
+        if not entries:
+            return 0
+
+        start = time.perf_counter()
+        with self.app.app_context():
+            repo = get_repo()
+            try:
+                repo.add_interests_once([(*row, uid) for _, uid, row, _ in entries])
+                repo.bump_versions(*sorted({f'submissions:{row[1]}' for _, _, row, _ in entries}))
+                repo.commit()
+                written = entries
+            except get_pool(self.app).data_error_classes:
+                # Some row is invalid; find out which by writing them one at a time
+                repo.rollback()
+                written = self._flush_one_by_one(repo, entries)
+
+        self.queue.remove([seq for seq, _, _, _ in written])
+        elapsed = time.perf_counter() - start
+
+        notifier = get_notifier(self.app)
+        for orphanage_id in {row[1] for _, _, row, _ in written}:
+            notifier.publish(orphanage_id)
+
+        with self._lock:
+            self._unflushed = max(self._unflushed - len(entries), 0)
+            self._stats['flushed'] += len(written)
+            self._stats['batches'] += 1
+            self._stats['flush_seconds_total'] += elapsed
+            self._stats['flush_seconds_max'] = max(self._stats['flush_seconds_max'], elapsed)
+            self._stats['last_flush_seconds'] = elapsed
+        return len(entries)
+
+    def drain(self):
+        """Flush until the queue is empty; returns the number of entries taken off it."""
+        total = 0
+        while True:
+            count = self.flush()
+            total += count
+            if count < self.batch_size:
+                return total
+
+    def stats(self):
+        depth, oldest, dead = self.queue.depth()
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(depth=depth, oldest_pending_seconds=round(oldest, 3), dead_letters=dead)
+        return stats
+
+    def _flush_one_by_one(self, repo, entries):
+        written = []
+        for entry in entries:
+            _, uid, row, _ = entry
+            try:
+                repo.add_interests_once([(*row, uid)])
+                repo.bump_versions(f'submissions:{row[1]}')
+                repo.commit()
+                written.append(entry)
+            except get_pool(self.app).data_error_classes as err:
+                repo.rollback()
+                logger.error("Submission %s rejected by the database, moved to the dead-letter table: %s", uid, err)
+                self.queue.dead_letter(entry, err)
+                with self._lock:
+                    self._stats['dead_letters_added'] += 1
+        return written
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # Keep going while full batches are waiting
+                while self.flush() == self.batch_size:
+                    pass
+            except Exception:
+                with self._lock:
+                    self._stats['failed_flushes'] += 1
+                logger.exception("Could not flush the interest queue, retrying in %ss", self.retry_delay)
+                self._stop.wait(self.retry_delay)
+                continue
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+
+def get_interest_writer(app=None):
+    app = app or current_app
+    return app.extensions['interest_writer']
+
+
+def make_writer(app):
+    return InterestWriter(
+        app,
+        InterestQueue(app.config['INTEREST_QUEUE_PATH'], synchronous=app.config['INTEREST_QUEUE_SYNCHRONOUS']),
+        batch_size=app.config['INTEREST_BATCH_SIZE'],
+        flush_interval=app.config['INTEREST_FLUSH_INTERVAL'],
+        retry_delay=app.config['INTEREST_RETRY_DELAY'],
+    )
+
+
+def init_app(app):
+    if not app.config['INTEREST_BUFFER_ENABLED']:
+        return
+
+    writer = app.extensions['interest_writer'] = make_writer(app)
+
+    @app.before_request
+    def _start_writer():
+        # Replays what a previous process left in the queue without waiting for a new submission
+        writer.start()
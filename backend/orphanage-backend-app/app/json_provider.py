@@ -0,0 +1,61 @@
+import datetime
+import decimal
+
+from flask.json.provider import DefaultJSONProvider  # type: ignore
+from werkzeug.http import http_date
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # optional dependency, falls back to the stdlib encoder
+    orjson = None
+
+
+def _default(value):
+    # Types orjson does not know about, and dates and times it is told to pass through
+    if isinstance(value, datetime.date):
+        return http_date(value)
+    if isinstance(value, datetime.time):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8')
+    if isinstance(value, set):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson.
+
+    Dates and datetimes are written in the same RFC 822 format as Flask's
+    encoder, or as ISO 8601 with ``JSON_DATE_FORMAT = 'iso'``; decimals are
+    written as strings. Responses are built straight from the encoded bytes
+    without an intermediate str.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.option = orjson.OPT_NON_STR_KEYS
+        if app.config.get('JSON_DATE_FORMAT', 'http') != 'iso':
+            # Hand them to _default instead of orjson's own ISO 8601 encoding
+            self.option |= orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        body = orjson.dumps(obj, default=_default, option=option | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_app(app):
+    if app.config['JSON_PROVIDER'] == 'orjson' and orjson is not None:
+        app.json = OrjsonProvider(app)
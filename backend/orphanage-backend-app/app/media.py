@@ -0,0 +1,297 @@
+"""Child photos: content-addressed originals and pre-generated renditions.
+
+An upload is stored under the SHA-256 of its bytes, so the same photo
+uploaded twice is stored once, and a URL, once handed out, always names
+the same bytes and can be cached forever. A small thread pool resizes each
+new original into the ``MEDIA_RENDITIONS`` sizes (JPEG) in the background;
+list endpoints link ``MEDIA_LIST_RENDITION`` and detail endpoints
+``MEDIA_DETAIL_RENDITION``.
+
+Resizing needs Pillow, which is in requirements.txt. Without it uploads
+still work, every URL points at the original, and a warning is logged at
+startup.
+
+Blobs live on local disk under ``MEDIA_ROOT`` by default. ``MEDIA_BACKEND``
+may instead name a class ('package.module:Class') that is built with the
+app and offers the same ``exists``/``put``/``open`` methods, for example
+one backed by an object store.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from flask import current_app  # type: ignore
+from werkzeug.utils import import_string
+
+try:
+    from PIL import Image, ImageOps  # type: ignore
+except ImportError:  # resizing is optional
+    Image = None
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_KEY = re.compile(r'^[0-9a-f]{64}$')
+
+# Leading bytes of the image formats we accept
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+
+def sniff_image_type(data):
+    """Mimetype of ``data`` from its leading bytes, or None if it is not an accepted image."""
+    for signature, mimetype in _SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def is_image_key(value):
+    return isinstance(value, str) and IMAGE_KEY.match(value) is not None
+
+
+class LocalBlobStore:
+    """Blobs as files under ``root``, fanned out by the first two characters of the key."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first, so readers never see half a blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def open(self, key):
+        """A binary file object for ``key``, or None if it is not stored."""
+        try:
+            return open(self._path(key), 'rb')
+        except FileNotFoundError:
+            return None
+
+
+class ImagePipeline:
+    """Stores uploads and renders their renditions on a dedicated thread pool."""
+
+    def __init__(self, store, renditions, url_prefix='/media', workers=2, jpeg_quality=85, max_pixels=40_000_000):
+        self.store = store
+        # Name -> longest edge in pixels, smallest first
+        self.renditions = dict(sorted(renditions.items(), key=lambda item: item[1]))
+        self.url_prefix = url_prefix.rstrip('/')
+        self.jpeg_quality = jpeg_quality
+        self.max_pixels = max_pixels
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+        self._lock = threading.Lock()
+        self._pending = set()
+        # Image key -> rendition names whose render failed; never retried by this process
+        self._failed = {}
+        self._stats = {
+            'uploads': 0,
+            'duplicate_uploads': 0,
+            'renditions_rendered': 0,
+            'render_failures': 0,
+        }
+
+    @property
+    def can_render(self):
+        return Image is not None and bool(self.renditions)
+
+    @staticmethod
+    def original_key(image_key):
+        return f"originals/{image_key[:2]}/{image_key}"
+
+    def rendition_name(self, rendition):
+        # The size is part of the name, so changing MEDIA_RENDITIONS never changes what a URL serves
+        return f"{rendition}_{self.renditions[rendition]}.jpg"
+
+    def rendition_key(self, image_key, name):
+        return f"renditions/{image_key[:2]}/{image_key}/{name}"
+
+    def url(self, image_key, rendition=None):
+        """Public URL of ``image_key`` at ``rendition`` (a MEDIA_RENDITIONS name), or of the original."""
+        if rendition and self.can_render and rendition in self.renditions:
+            return f"{self.url_prefix}/{image_key}/{self.rendition_name(rendition)}"
+        return f"{self.url_prefix}/{image_key}/original"
+
+    def urls(self, image_key):
+        urls = {rendition: self.url(image_key, rendition) for rendition in self.renditions}
+        urls['original'] = self.url(image_key)
+        return urls
+
+    def exists(self, image_key):
+        return is_image_key(image_key) and self.store.exists(self.original_key(image_key))
+
+    def add(self, data):
+        """Store an uploaded image and queue its renditions; returns its key."""
+        image_key = hashlib.sha256(data).hexdigest()
+        duplicate = self.store.exists(self.original_key(image_key))
+        if not duplicate:
+            self.store.put(self.original_key(image_key), data)
+        with self._lock:
+            self._stats['duplicate_uploads' if duplicate else 'uploads'] += 1
+        self.schedule(image_key)
+        return image_key
+
+    def schedule(self, image_key):
+        """Render any missing renditions of ``image_key`` in the background."""
+        if not self.can_render:
+            return
+        with self._lock:
+            if image_key in self._pending:
+                return
+            self._pending.add(image_key)
+        self._executor.submit(self._render, image_key)
+
+    def open(self, image_key, name):
+        """(file, mimetype, final) for a URL's file name; final is False while a rendition is not ready yet.
+
+        Until then the original is served in its place, without the long-lived cache headers. The
+        same goes for a rendition that could not be rendered, which is not queued again.
+        """
+        if name == 'original':
+            blob = self.store.open(self.original_key(image_key))
+            return blob, self._blob_type(blob), True
+
+        if name not in {self.rendition_name(rendition) for rendition in self.renditions}:
+            return None, None, True
+        blob = self.store.open(self.rendition_key(image_key, name))
+        if blob is not None:
+            return blob, 'image/jpeg', True
+
+        with self._lock:
+            failed = name in self._failed.get(image_key, ())
+        blob = self.store.open(self.original_key(image_key))
+        if blob is not None and not failed:
+            # Renders whatever an earlier process did not, e.g. after a new size was configured
+            self.schedule(image_key)
+        return blob, self._blob_type(blob), False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_renders'] = len(self._pending)
+            stats['failed_renditions'] = sum(len(names) for names in self._failed.values())
+        return stats
+
+    @staticmethod
+    def _blob_type(blob):
+        if blob is None:
+            return None
+        head = blob.read(16)
+        blob.seek(0)
+        return sniff_image_type(head) or 'application/octet-stream'
+
+    def _render(self, image_key):
+        missing, rendered = [], set()
+        try:
+            missing = [rendition for rendition in self.renditions
+                       if not self.store.exists(self.rendition_key(image_key, self.rendition_name(rendition)))]
+            if not missing:
+                return
+
+            blob = self.store.open(self.original_key(image_key))
+            if blob is None:
+                return
+            with blob:
+                data = blob.read()
+
+            for rendition, jpeg in self.render(data, missing):
+                self.store.put(self.rendition_key(image_key, self.rendition_name(rendition)), jpeg)
+                rendered.add(rendition)
+                with self._lock:
+                    self._stats['renditions_rendered'] += 1
+        except Exception:
+            with self._lock:
+                self._stats['render_failures'] += 1
+                self._failed.setdefault(image_key, set()).update(
+                    self.rendition_name(rendition) for rendition in missing if rendition not in rendered)
+            logger.exception("Could not render the renditions of image %s", image_key)
+        finally:
+            with self._lock:
+                self._pending.discard(image_key)
+
+    def render(self, data, renditions):
+        """Yield (rendition, JPEG bytes) for ``renditions``, decoding the original once."""
+        with Image.open(BytesIO(data)) as image:
+            if image.width * image.height > self.max_pixels:
+                raise ValueError(f"Image is {image.width}x{image.height}, larger than MEDIA_MAX_PIXELS")
+            largest = max(self.renditions[rendition] for rendition in renditions)
+            # Lets the JPEG decoder scale down while decoding instead of after
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+
+            # Largest first, each one resized from the previous
+            for rendition in sorted(renditions, key=self.renditions.get, reverse=True):
+                size = self.renditions[rendition]
+                image.thumbnail((size, size), Image.LANCZOS)
+                output = BytesIO()
+                image.save(output, 'JPEG', quality=self.jpeg_quality, optimize=True, progressive=True)
+                yield rendition, output.getvalue()
+
+
+def get_media(app=None):
+    app = app or current_app
+    return app.extensions['media']
+
+
+def with_image_urls(children, rendition, app=None):
+    """Point each child's image_url at ``rendition`` ('list' or 'detail') of their uploaded photo, if any.
+
+    Children without an uploaded photo keep the image_url they were added with. The async
+    mode passes its Quart app, since Flask's ``current_app`` is not set in its requests.
+    """
+    app = app or current_app
+    media = get_media(app)
+    rendition = app.config['MEDIA_LIST_RENDITION' if rendition == 'list' else 'MEDIA_DETAIL_RENDITION']
+    for child in children:
+        image_key = child.pop('image_key', None)
+        if image_key:
+            child['image_url'] = media.url(image_key, rendition)
+    return children
+
+
+def init_app(app):
+    backend = app.config['MEDIA_BACKEND']
+    if backend == 'local':
+        store = LocalBlobStore(app.config['MEDIA_ROOT'])
+    else:
+        store = import_string(backend)(app)
+
+    if Image is None and app.config['MEDIA_RENDITIONS']:
+        logger.warning("Pillow is not installed: MEDIA_RENDITIONS are not rendered and every photo URL "
+                       "serves the original (pip install Pillow)")
+
+    app.extensions['media'] = ImagePipeline(
+        store,
+        app.config['MEDIA_RENDITIONS'],
+        url_prefix=app.config['MEDIA_URL_PREFIX'],
+        workers=app.config['MEDIA_RENDER_WORKERS'],
+        jpeg_quality=app.config['MEDIA_JPEG_QUALITY'],
+        max_pixels=app.config['MEDIA_MAX_PIXELS'],
+    )
@@ -0,0 +1,61 @@
+from flask import Blueprint, current_app, request, jsonify, send_file  # type: ignore
+from app.auth_middleware import orphanage_required
+from app.media import get_media, sniff_image_type
+
+# Create a Blueprint for child photos
+media = Blueprint('media', __name__)
+
+
+# Route for orphanages to upload a child's photo; the returned image_key goes into add-child
+@media.route('/images', methods=['POST'])
+@orphanage_required
+def upload_image():
+    try:
+        limit = current_app.config['MEDIA_MAX_BYTES']
+
+        # Accept a multipart 'file' field or the raw image as the request body
+        upload = request.files.get('file')
+        data = upload.read(limit + 1) if upload is not None else request.get_data()
+
+        if not data:
+            return jsonify({"error": "Expected an image in a 'file' field or as the request body"}), 400
+        if len(data) > limit:
+            return jsonify({"error": f"Images may be at most {limit} bytes"}), 413
+        if sniff_image_type(data) is None:
+            return jsonify({"error": "Unsupported image type, upload a JPEG, PNG, GIF or WebP"}), 415
+
+        # Stored under the hash of its bytes; the renditions are made in the background
+        pipeline = get_media()
+        image_key = pipeline.add(data)
+
+        return jsonify({"image_key": image_key, "urls": pipeline.urls(image_key)}), 201
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Public route serving originals and renditions; their URLs never change content
+@media.route('/media/<string:image_key>/<string:name>', methods=['GET'])
+def get_image(image_key, name):
+    try:
+        pipeline = get_media()
+        if not pipeline.exists(image_key):
+            return jsonify({"error": "Image not found"}), 404
+
+        blob, mimetype, final = pipeline.open(image_key, name)
+        if blob is None:
+            return jsonify({"error": "Image not found"}), 404
+
+        # The key is the content hash, so it is also a strong ETag
+        etag = f'{image_key}-{name}' if final else f'{image_key}-original'
+        if final:
+            response = send_file(blob, mimetype=mimetype, etag=etag, conditional=True,
+                                 max_age=current_app.config['MEDIA_CACHE_MAX_AGE'])
+            response.cache_control.immutable = True
+        else:
+            # The original stands in until the rendition is ready; let clients come back for it soon
+            response = send_file(blob, mimetype=mimetype, etag=etag, conditional=True, max_age=60)
+        return response
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,185 @@
+"""Per-endpoint request metrics, exposed in Prometheus text format on /metrics.
+
+Every request is counted by endpoint, method and status and its latency goes
+into a histogram. Time spent in a few phases (token decoding, waiting for a
+pooled connection, running queries, password hashing and JSON
+serialisation) is measured with ``timed(phase)`` and kept in a second
+histogram, so a slow endpoint can be told apart from a slow database. The
+numbers are per process; under the preforking server every sample carries a
+``worker`` label (the worker's pid), so scrapes of different workers can be
+told apart and summed.
+"""
+import threading
+import time
+from contextlib import ContextDecorator
+
+from flask import Response, g, has_app_context, request  # type: ignore
+
+
+# Upper bounds of the latency buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PHASES = ('auth', 'db_acquire', 'query', 'password', 'serialize')
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.sum += value
+
+    def samples(self):
+        """(le, cumulative count) pairs, ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield ('+Inf' if bound == float('inf') else repr(bound)), total
+
+
+class Metrics:
+    """Thread-safe store of request counters and histograms."""
+
+    def __init__(self, labels=None):
+        self._lock = threading.Lock()
+        # Added to every sample, e.g. {'worker': pid}
+        self.labels = dict(labels or {})
+        self.requests = {}
+        self.errors = {}
+        self.latency = {}
+        self.phases = {}
+
+    def observe_request(self, endpoint, method, status, seconds, phases):
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if status >= 500:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            self.latency.setdefault(endpoint, Histogram()).observe(seconds)
+            for phase, spent in phases.items():
+                self.phases.setdefault((endpoint, phase), Histogram()).observe(spent)
+
+    def render(self, gauges=()):
+        """Prometheus text exposition of everything recorded, plus (name, help, value) ``gauges``."""
+        lines = []
+        base = self.labels
+        with self._lock:
+            _header(lines, 'orphanage_http_requests_total', 'counter', 'Requests handled, by endpoint, method and status.')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                labels = _labels(**base, endpoint=endpoint, method=method, status=status)
+                lines.append(f'orphanage_http_requests_total{labels} {count}')
+
+            _header(lines, 'orphanage_http_request_errors_total', 'counter', 'Requests answered with a 5xx status.')
+            for endpoint, count in sorted(self.errors.items()):
+                lines.append(f'orphanage_http_request_errors_total{_labels(**base, endpoint=endpoint)} {count}')
+
+            _header(lines, 'orphanage_http_request_duration_seconds', 'histogram', 'Time from request start to response.')
+            for endpoint, histogram in sorted(self.latency.items()):
+                _histogram(lines, 'orphanage_http_request_duration_seconds', histogram, **base, endpoint=endpoint)
+
+            _header(lines, 'orphanage_http_request_phase_seconds', 'histogram',
+                    'Time per request spent in one phase: ' + ', '.join(PHASES) + '.')
+            for (endpoint, phase), histogram in sorted(self.phases.items()):
+                _histogram(lines, 'orphanage_http_request_phase_seconds', histogram, **base, endpoint=endpoint,
+                           phase=phase)
+
+        for name, help_text, value in gauges:
+            _header(lines, name, 'gauge', help_text)
+            lines.append(f'{name}{_labels(**base) if base else ""} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _header(lines, name, kind, help_text):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def _histogram(lines, name, histogram, **labels):
+    for le, count in histogram.samples():
+        lines.append(f'{name}_bucket{_labels(**labels, le=le)} {count}')
+    lines.append(f'{name}_sum{_labels(**labels)} {histogram.sum}')
+    lines.append(f'{name}_count{_labels(**labels)} {sum(histogram.counts)}')
+
+
+class timed(ContextDecorator):
+    """Add the time spent in the block (or decorated function) to the current request's ``phase``.
+
+    Outside a request it does nothing, so instrumented code can also run
+    from scripts and the CLI.
+    """
+
+    def __init__(self, phase):
+        self.phase = phase
+        self._starts = threading.local()
+
+    def __enter__(self):
+        stack = getattr(self._starts, 'stack', None)
+        if stack is None:
+            stack = self._starts.stack = []
+        stack.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._starts.stack.pop()
+        phases = g.get('_metric_phases') if has_app_context() else None
+        if phases is not None:
+            phases[self.phase] = phases.get(self.phase, 0.0) + elapsed
+        return False
+
+
+def _stats_gauges(app):
+    """Own counters of the connection pool, read replicas, response cache, interest queue and image pipeline."""
+    gauges = []
+    for prefix, title, extension in (('orphanage_db_pool', 'Connection pool', 'db_pool'),
+                                     ('orphanage_db_replicas', 'Read replicas', 'replicas'),
+                                     ('orphanage_cache', 'Response cache', 'cache'),
+                                     ('orphanage_interest_queue', 'Buffered interest queue', 'interest_writer'),
+                                     ('orphanage_media', 'Image pipeline', 'media')):
+        source = app.extensions.get(extension)
+        if source is not None:
+            gauges.extend((f'{prefix}_{name}', f'{title} {name}.', value) for name, value in source.stats().items())
+    return gauges
+
+
+def init_app(app):
+    """Instrument every request; call after the JSON provider is set up."""
+    metrics = app.extensions['metrics'] = Metrics()
+
+    # JSON serialisation happens inside jsonify(), so time the provider itself
+    app.json.response = timed('serialize')(app.json.response)
+
+    @app.before_request
+    def _start_timer():
+        g._metric_start = time.perf_counter()
+        g._metric_phases = {}
+
+    @app.after_request
+    def _record(response):
+        start = g.pop('_metric_start', None)
+        if start is not None:
+            metrics.observe_request(request.endpoint or 'unmatched', request.method, response.status_code,
+                                    time.perf_counter() - start, g.pop('_metric_phases', {}))
+        return response
+
+    def metrics_view():
+        return Response(metrics.render(_stats_gauges(app)), mimetype='text/plain; version=0.0.4')
+
+    if app.config['METRICS_ENABLED']:
+        app.add_url_rule('/metrics', 'metrics', metrics_view, methods=['GET'])
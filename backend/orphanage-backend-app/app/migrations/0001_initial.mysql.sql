@@ -0,0 +1,76 @@
+-- Tables used by the blueprints. IF NOT EXISTS lets this run against
+-- databases created by hand before migrations existed.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    role VARCHAR(20) NOT NULL DEFAULT 'orphanage'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS orphanage_verification (
+    orphanage_id INT NOT NULL PRIMARY KEY,
+    governorate VARCHAR(100),
+    address VARCHAR(255),
+    registration_certificate_number VARCHAR(100),
+    operating_license_number VARCHAR(100),
+    license_expiration_date DATE,
+    manager_national_id VARCHAR(100),
+    tax_id VARCHAR(100),
+    bank_account_details TEXT,
+    status ENUM('pending', 'approved', 'rejected') NOT NULL DEFAULT 'pending',
+    rejection_reason TEXT,
+    CONSTRAINT fk_verification_user FOREIGN KEY (orphanage_id) REFERENCES users (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS children (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    orphanage_id INT NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    age INT NOT NULL,
+    image_url VARCHAR(1024),
+    about TEXT,
+    CONSTRAINT fk_children_orphanage FOREIGN KEY (orphanage_id) REFERENCES users (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS hobbies (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS child_hobbies (
+    child_id INT NOT NULL,
+    hobby_id INT NOT NULL,
+    PRIMARY KEY (child_id, hobby_id),
+    CONSTRAINT fk_child_hobbies_child FOREIGN KEY (child_id) REFERENCES children (id) ON DELETE CASCADE,
+    CONSTRAINT fk_child_hobbies_hobby FOREIGN KEY (hobby_id) REFERENCES hobbies (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS adoption_sponsorship_requests (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    child_id INT NULL,
+    orphanage_id INT NOT NULL,
+    guest_name VARCHAR(255) NOT NULL,
+    guest_email VARCHAR(255) NOT NULL,
+    interest_type ENUM('adoption', 'sponsorship') NOT NULL,
+    message TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_requests_child FOREIGN KEY (child_id) REFERENCES children (id) ON DELETE SET NULL,
+    CONSTRAINT fk_requests_orphanage FOREIGN KEY (orphanage_id) REFERENCES users (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS donations (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    orphanage_id INT NOT NULL,
+    donation_method VARCHAR(100) NOT NULL,
+    donation_details TEXT,
+    CONSTRAINT fk_donations_orphanage FOREIGN KEY (orphanage_id) REFERENCES users (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Version counters behind ETag / Last-Modified (app/conditional.py)
+CREATE TABLE IF NOT EXISTS data_versions (
+    scope VARCHAR(191) NOT NULL PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
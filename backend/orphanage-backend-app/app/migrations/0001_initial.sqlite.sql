@@ -0,0 +1,67 @@
+-- Tables used by the blueprints, for local runs with DB_BACKEND = 'sqlite'
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    role VARCHAR(20) NOT NULL DEFAULT 'orphanage'
+);
+
+CREATE TABLE IF NOT EXISTS orphanage_verification (
+    orphanage_id INTEGER NOT NULL PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+    governorate VARCHAR(100),
+    address VARCHAR(255),
+    registration_certificate_number VARCHAR(100),
+    operating_license_number VARCHAR(100),
+    license_expiration_date DATE,
+    manager_national_id VARCHAR(100),
+    tax_id VARCHAR(100),
+    bank_account_details TEXT,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
+    rejection_reason TEXT
+);
+
+CREATE TABLE IF NOT EXISTS children (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    orphanage_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    age INTEGER NOT NULL,
+    image_url VARCHAR(1024),
+    about TEXT
+);
+
+CREATE TABLE IF NOT EXISTS hobbies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS child_hobbies (
+    child_id INTEGER NOT NULL REFERENCES children (id) ON DELETE CASCADE,
+    hobby_id INTEGER NOT NULL REFERENCES hobbies (id) ON DELETE CASCADE,
+    PRIMARY KEY (child_id, hobby_id)
+);
+
+CREATE TABLE IF NOT EXISTS adoption_sponsorship_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    child_id INTEGER REFERENCES children (id) ON DELETE SET NULL,
+    orphanage_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    guest_name VARCHAR(255) NOT NULL,
+    guest_email VARCHAR(255) NOT NULL,
+    interest_type VARCHAR(20) NOT NULL CHECK (interest_type IN ('adoption', 'sponsorship')),
+    message TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS donations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    orphanage_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    donation_method VARCHAR(100) NOT NULL,
+    donation_details TEXT
+);
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    scope VARCHAR(191) NOT NULL PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
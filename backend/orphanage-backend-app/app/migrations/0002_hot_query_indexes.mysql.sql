@@ -0,0 +1,20 @@
+-- Indexes for the lookups the routes make on every request.
+-- Indexes that already exist under the same name are skipped.
+
+-- Login and registration look users up by e-mail; one account per address
+CREATE UNIQUE INDEX uq_users_email ON users (email);
+
+-- /get-children, and the approved-children join, by orphanage in id order
+CREATE INDEX idx_children_orphanage ON children (orphanage_id, id);
+
+-- The public listing and the admin queue filter on status (and governorate)
+CREATE INDEX idx_verification_status ON orphanage_verification (status, orphanage_id);
+CREATE INDEX idx_verification_governorate ON orphanage_verification (governorate, status);
+
+-- Children having a given hobby
+CREATE INDEX idx_child_hobbies_hobby ON child_hobbies (hobby_id, child_id);
+
+-- /submissions, newest activity per orphanage
+CREATE INDEX idx_requests_orphanage ON adoption_sponsorship_requests (orphanage_id, created_at, id);
+
+CREATE INDEX idx_donations_orphanage ON donations (orphanage_id);
@@ -0,0 +1,31 @@
+-- Public catalogue: one row per child of an approved orphanage, holding
+-- everything /children shows, so public reads need no joins. The
+-- repository keeps it in step with children, child_hobbies and
+-- orphanage_verification; `flask --app app db rebuild-catalogue` recomputes it.
+
+CREATE TABLE IF NOT EXISTS public_children (
+    child_id INT NOT NULL PRIMARY KEY,
+    orphanage_id INT NOT NULL,
+    orphanage_name VARCHAR(255) NOT NULL,
+    governorate VARCHAR(100),
+    name VARCHAR(255) NOT NULL,
+    age INT NOT NULL,
+    image_url VARCHAR(1024),
+    about TEXT,
+    hobbies JSON,
+    KEY idx_public_children_orphanage (orphanage_id, child_id),
+    KEY idx_public_children_governorate (governorate, child_id),
+    CONSTRAINT fk_public_children_child FOREIGN KEY (child_id) REFERENCES children (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Initial contents, the same rows as Repository.rebuild_catalogue()
+DELETE FROM public_children;
+
+INSERT INTO public_children (child_id, orphanage_id, orphanage_name, governorate, name, age, image_url, about, hobbies)
+SELECT c.id, c.orphanage_id, o.name, ov.governorate, c.name, c.age, c.image_url, c.about,
+       (SELECT JSON_ARRAYAGG(h.name) FROM child_hobbies ch JOIN hobbies h ON h.id = ch.hobby_id
+        WHERE ch.child_id = c.id)
+FROM children c
+JOIN users o ON c.orphanage_id = o.id
+JOIN orphanage_verification ov ON c.orphanage_id = ov.orphanage_id
+WHERE ov.status = 'approved';
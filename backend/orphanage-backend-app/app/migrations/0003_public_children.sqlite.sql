@@ -0,0 +1,28 @@
+-- Public catalogue: one row per child of an approved orphanage.
+-- (SQLite copy of 0003_public_children.mysql.sql)
+
+CREATE TABLE IF NOT EXISTS public_children (
+    child_id INTEGER NOT NULL PRIMARY KEY REFERENCES children (id) ON DELETE CASCADE,
+    orphanage_id INTEGER NOT NULL,
+    orphanage_name VARCHAR(255) NOT NULL,
+    governorate VARCHAR(100),
+    name VARCHAR(255) NOT NULL,
+    age INTEGER NOT NULL,
+    image_url VARCHAR(1024),
+    about TEXT,
+    hobbies TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_public_children_orphanage ON public_children (orphanage_id, child_id);
+CREATE INDEX IF NOT EXISTS idx_public_children_governorate ON public_children (governorate, child_id);
+
+DELETE FROM public_children;
+
+INSERT INTO public_children (child_id, orphanage_id, orphanage_name, governorate, name, age, image_url, about, hobbies)
+SELECT c.id, c.orphanage_id, o.name, ov.governorate, c.name, c.age, c.image_url, c.about,
+       (SELECT json_group_array(h.name) FROM child_hobbies ch JOIN hobbies h ON h.id = ch.hobby_id
+        WHERE ch.child_id = c.id)
+FROM children c
+JOIN users o ON c.orphanage_id = o.id
+JOIN orphanage_verification ov ON c.orphanage_id = ov.orphanage_id
+WHERE ov.status = 'approved';
@@ -0,0 +1,7 @@
+-- Full-text search over the public catalogue for /children/search.
+-- InnoDB keeps the index up to date on every write to public_children.
+
+CREATE FULLTEXT INDEX ft_public_children_text ON public_children (name, about);
+
+-- Age range filters without a governorate or orphanage
+CREATE INDEX idx_public_children_age ON public_children (age, child_id);
@@ -0,0 +1,26 @@
+-- Full-text search over the public catalogue for /children/search.
+-- (SQLite counterpart of 0004_children_search.mysql.sql: an FTS5 index
+-- kept in step with public_children by triggers)
+
+CREATE VIRTUAL TABLE IF NOT EXISTS public_children_fts USING fts5(
+    name, about, content='public_children', content_rowid='child_id'
+);
+
+CREATE TRIGGER IF NOT EXISTS public_children_fts_insert AFTER INSERT ON public_children BEGIN
+    INSERT INTO public_children_fts (rowid, name, about) VALUES (new.child_id, new.name, new.about);
+END;
+
+CREATE TRIGGER IF NOT EXISTS public_children_fts_delete AFTER DELETE ON public_children BEGIN
+    INSERT INTO public_children_fts (public_children_fts, rowid, name, about)
+    VALUES ('delete', old.child_id, old.name, old.about);
+END;
+
+CREATE TRIGGER IF NOT EXISTS public_children_fts_update AFTER UPDATE ON public_children BEGIN
+    INSERT INTO public_children_fts (public_children_fts, rowid, name, about)
+    VALUES ('delete', old.child_id, old.name, old.about);
+    INSERT INTO public_children_fts (rowid, name, about) VALUES (new.child_id, new.name, new.about);
+END;
+
+INSERT INTO public_children_fts (public_children_fts) VALUES ('rebuild');
+
+CREATE INDEX IF NOT EXISTS idx_public_children_age ON public_children (age, child_id);
@@ -0,0 +1,30 @@
+-- Children in the public catalogue per governorate, hobby and age bucket,
+-- for /children/facets. The repository adjusts the counters in the same
+-- transaction as each catalogue change; a periodic reconciliation (and
+-- `flask --app app db reconcile-facets`) recomputes them from public_children.
+
+CREATE TABLE IF NOT EXISTS catalogue_facets (
+    facet VARCHAR(20) NOT NULL,
+    value VARCHAR(100) NOT NULL,
+    children INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (facet, value)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Initial counts, the same rows as Repository.reconcile_facets()
+DELETE FROM catalogue_facets;
+
+INSERT INTO catalogue_facets (facet, value, children)
+SELECT 'governorate', governorate, COUNT(*) FROM public_children
+WHERE governorate IS NOT NULL GROUP BY governorate;
+
+INSERT INTO catalogue_facets (facet, value, children)
+SELECT 'age', bucket, COUNT(*) FROM (
+    SELECT CASE WHEN age <= 2 THEN '0-2' WHEN age <= 5 THEN '3-5' WHEN age <= 9 THEN '6-9'
+                WHEN age <= 12 THEN '10-12' WHEN age <= 17 THEN '13-17' ELSE '18+' END AS bucket
+    FROM public_children
+) AS ages GROUP BY bucket;
+
+INSERT INTO catalogue_facets (facet, value, children)
+SELECT 'hobby', ch.hobby_id, COUNT(*) FROM public_children p
+JOIN child_hobbies ch ON ch.child_id = p.child_id
+GROUP BY ch.hobby_id;
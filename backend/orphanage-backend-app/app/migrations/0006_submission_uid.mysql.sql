@@ -0,0 +1,7 @@
+-- Submissions taken by the buffered /express-interest carry the ID handed
+-- back to the guest; the unique key makes replaying the local queue after
+-- a crash insert each of them once. Directly inserted rows leave it NULL.
+
+ALTER TABLE adoption_sponsorship_requests ADD COLUMN submission_uid CHAR(32) NULL;
+
+CREATE UNIQUE INDEX uq_requests_submission_uid ON adoption_sponsorship_requests (submission_uid);
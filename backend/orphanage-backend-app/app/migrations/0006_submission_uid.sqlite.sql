@@ -0,0 +1,6 @@
+-- ID of submissions taken by the buffered /express-interest.
+-- (SQLite copy of 0006_submission_uid.mysql.sql)
+
+ALTER TABLE adoption_sponsorship_requests ADD COLUMN submission_uid CHAR(32);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_requests_submission_uid ON adoption_sponsorship_requests (submission_uid);
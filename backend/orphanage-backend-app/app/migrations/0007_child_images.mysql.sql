@@ -0,0 +1,7 @@
+-- Uploaded child photos (POST /images) are referenced by the SHA-256 of
+-- their bytes. The catalogue carries the key too, so public endpoints can
+-- link the right rendition; image_url stays for photos hosted elsewhere.
+
+ALTER TABLE children ADD COLUMN image_key CHAR(64) NULL;
+
+ALTER TABLE public_children ADD COLUMN image_key CHAR(64) NULL;
@@ -0,0 +1,6 @@
+-- Uploaded child photos, referenced by content hash.
+-- (SQLite copy of 0007_child_images.mysql.sql)
+
+ALTER TABLE children ADD COLUMN image_key CHAR(64);
+
+ALTER TABLE public_children ADD COLUMN image_key CHAR(64);
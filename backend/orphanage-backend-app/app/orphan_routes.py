@@ -1,54 +1,27 @@
-from flask import Blueprint, request, jsonify  # type: ignore
+from flask import Blueprint, Response, current_app, g, request, jsonify  # type: ignore
 import mysql.connector  # type: ignore
-from app.config import Config
-import jwt
+from app.auth_middleware import orphanage_required, query_token_allowed
+from app.cache import cache_key, get_cache
+from app.children import fields_arg, int_arg, read_bulk_rows, validate_child
+from app.conditional import conditional
+from app.media import get_media, with_image_urls
+from app.repository import CHILD_FIELDS, get_repo
+from app.submissions import advance, decode_cursor, encode_cursor, event_stream, read_submissions
 
 
-# Secret key for decoding JWT
-SECRET_KEY = 'your_secret_key'
-
 # Create a Blueprint for orphan routes
 orphans = Blueprint('orphans', __name__)
 
-# Use the config values for the MySQL connection
-db_config = {
-    'user': Config.MYSQL_USER,
-    'password': Config.MYSQL_PASSWORD,
-    'host': Config.MYSQL_HOST,
-    'database': Config.MYSQL_DATABASE
-}
 
 @orphans.route('/orphanage-status', methods=['GET'])
+@orphanage_required
+@conditional('orphanages')
 def get_orphanage_status():
     try:
-        # Get the token from the Authorization header
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Token is missing!"}), 401
-
-        # Decode the token to get orphanage_id
-        try:
-            decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            orphanage_id = decoded_token['orphanage_id']  # Corrected key name
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token!"}), 401
-
-        # Connect to the database to check the orphanage's verification status
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
+        orphanage_id = g.orphanage_id
 
         # Fetch orphanage status from orphanage_verification table
-        cursor.execute("""
-            SELECT status, rejection_reason
-            FROM orphanage_verification
-            WHERE orphanage_id = %s
-        """, (orphanage_id,))
-        result = cursor.fetchone()
-
-        cursor.close()
-        conn.close()
+        result = get_repo().get_orphanage_status(orphanage_id)
 
         if result:
             return jsonify(result), 200
@@ -62,52 +35,34 @@ def get_orphanage_status():
 
 # Route to add children for a specific orphanage
 @orphans.route('/add-child', methods=['POST'])
+@orphanage_required
 def add_child():
     try:
-        # Get the token from the Authorization header
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Token is missing!"}), 401
-
-        # Decode the token to get the orphanage_id
-        try:
-            decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            orphanage_id = decoded_token['orphanage_id']
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token!"}), 401
+        orphanage_id = g.orphanage_id
 
         # Get the child data from the POST request
         data = request.json
         name = data['name']
         age = data['age']
         image_url = data.get('image_url', '')  # Optional field
+        image_key = data.get('image_key')  # Optional photo uploaded through /images
         about = data.get('about', '')  # Optional about field
         hobby_ids = data.get('hobbies', [])  # List of hobby IDs
 
-        # Connect to the database
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor()
+        if image_key is not None and not get_media().exists(image_key):
+            return jsonify({"error": "Unknown image_key, upload the photo to /images first"}), 400
 
-        # Insert the child into the children table, linking them to the orphanage
-        cursor.execute("""
-            INSERT INTO children (orphanage_id, name, age, image_url, about)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (orphanage_id, name, age, image_url, about))
+        repo = get_repo()
 
-        # Get the last inserted child ID
-        child_id = cursor.lastrowid
+        # Insert the child linked to the orphanage, then their hobbies in one statement
+        repo.add_child(orphanage_id, name, age, image_url, about, hobby_ids, image_key=image_key)
 
-        # Insert the hobbies for the child into the child_hobbies table
-        if hobby_ids:
-            for hobby_id in hobby_ids:
-                cursor.execute("INSERT INTO child_hobbies (child_id, hobby_id) VALUES (%s, %s)", (child_id, hobby_id))
+        repo.bump_versions('children', f'children:{orphanage_id}')
 
-        conn.commit()
+        repo.commit()
 
-        cursor.close()
-        conn.close()
+        # The new child may appear on cached /children pages
+        get_cache().invalidate('children')
 
         return jsonify({"message": "Child added successfully with hobbies!"}), 201
 
@@ -117,36 +72,126 @@ def add_child():
         return jsonify({"error": str(e)}), 500
 
 
+# Route to attach a photo uploaded through /images to one of the orphanage's children
+@orphans.route('/children/<int:child_id>/image', methods=['PUT'])
+@orphanage_required
+def set_child_image(child_id):
+    try:
+        orphanage_id = g.orphanage_id
+
+        image_key = (request.json or {}).get('image_key')
+        if not get_media().exists(image_key):
+            return jsonify({"error": "Unknown image_key, upload the photo to /images first"}), 400
+
+        repo = get_repo()
+
+        if not repo.set_child_image(orphanage_id, child_id, image_key):
+            return jsonify({"error": "Child not found"}), 404
+
+        repo.bump_versions('children', f'children:{orphanage_id}')
+
+        repo.commit()
+
+        # The child's cached detail and the /children pages showing them now link the new photo
+        get_cache().invalidate('children', f'child:{child_id}')
+
+        return jsonify({"message": "Child photo updated!", "urls": get_media().urls(image_key)}), 200
+
+    except mysql.connector.Error as err:
+        return jsonify({"error": str(err)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Route to add many children at once from a JSON array or an uploaded CSV/NDJSON file
+@orphans.route('/children/bulk', methods=['POST'])
+@orphanage_required
+def add_children_bulk():
+    try:
+        orphanage_id = g.orphanage_id
+
+        # Read every row before touching the database
+        try:
+            rows = read_bulk_rows(request)
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
+
+        if not rows:
+            return jsonify({"error": "No children to add"}), 400
+        if len(rows) > current_app.config['BULK_MAX_ROWS']:
+            return jsonify({"error": f"At most {current_app.config['BULK_MAX_ROWS']} children per request"}), 413
+
+        repo = get_repo()
+
+        # Validate all rows up front against the known hobbies
+        known_hobby_ids = repo.hobby_ids()
+
+        media = get_media()
+
+        children = []
+        results = []
+        for row_number, row in enumerate(rows):
+            child, errors = validate_child(row, known_hobby_ids)
+            if child and child['image_key'] and not media.exists(child['image_key']):
+                child, errors = None, ["Unknown 'image_key', upload the photo to /images first"]
+            children.append(child)
+            results.append({"row": row_number, "status": "invalid", "errors": errors} if errors
+                           else {"row": row_number, "status": "valid"})
+
+        if any(result['status'] == 'invalid' for result in results):
+            return jsonify({"error": "Some rows are invalid, nothing was added", "results": results}), 400
+
+        # Insert children and their hobby links in batches, all in one transaction
+        batch_size = current_app.config['BULK_INSERT_BATCH_SIZE']
+        try:
+            for start in range(0, len(children), batch_size):
+                # One multi-row INSERT per batch where MySQL assigns its IDs consecutively, otherwise
+                # one per child (see MySQLRepository); the hobby links are always a single INSERT
+                child_ids = repo.add_children(orphanage_id, children[start:start + batch_size])
+                for offset, child_id in enumerate(child_ids):
+                    results[start + offset] = {"row": start + offset, "status": "created", "id": child_id}
+
+            repo.bump_versions('children', f'children:{orphanage_id}')
+
+            repo.commit()
+        except Exception:
+            repo.rollback()
+            raise
+
+        # The new children may appear on cached /children pages
+        get_cache().invalidate('children')
+
+        return jsonify({
+            "message": f"{len(children)} children added successfully!",
+            "results": results
+        }), 201
+
+    except mysql.connector.Error as err:
+        return jsonify({"error": str(err)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # Route to get all children for a specific orphanage
 @orphans.route('/get-children', methods=['GET'])
+@orphanage_required
+@conditional('children:{orphanage_id}')
 def get_children():
     try:
-        # Get the token from the Authorization header
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Token is missing!"}), 401
+        orphanage_id = g.orphanage_id
 
-        # Decode the token to get the orphanage_id
+        # Only read the columns asked for with ?fields=, if any
         try:
-            decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            orphanage_id = decoded_token['orphanage_id']
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token!"}), 401
-
-        # Connect to the database
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
+            fields = fields_arg(request.args, CHILD_FIELDS)
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
 
-        # Fetch all children connected to this orphanage
-        cursor.execute("SELECT * FROM children WHERE orphanage_id = %s", (orphanage_id,))
-        children = cursor.fetchall()
+        # Fetch all children connected to this orphanage, with the hobbies
+        # of all of them in one query instead of one per child
+        children = get_repo().list_orphanage_children(orphanage_id, fields)
 
-        cursor.close()
-        conn.close()
-
-        return jsonify(children), 200
+        # Uploaded photos are linked at their list size
+        return jsonify(with_image_urls(children, 'list')), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -154,34 +199,29 @@ def get_children():
 
 # Route to get child for a specific orphanage by id
 @orphans.route('/child/<int:child_id>', methods=['GET'])
+@conditional('children')
 def get_child_by_id(child_id):
     try:
-        # Connect to the database
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
+        # Only read the columns asked for with ?fields=, if any
+        try:
+            fields = fields_arg(request.args, CHILD_FIELDS)
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
 
-        # Fetch the child details by ID
-        cursor.execute("SELECT * FROM children WHERE id = %s", (child_id,))
-        child = cursor.fetchone()
+        def load_child():
+            # Fetch the child details and hobby names by ID in one round trip;
+            # missing children come back as None and are not cached
+            child = get_repo().get_child(child_id, fields)
+            return with_image_urls([child], 'detail')[0] if child else None
+
+        # Each set of fields is cached on its own
+        child = get_cache().get_or_set(cache_key(f'child/{child_id}'), load_child, tags=[f'child:{child_id}'],
+                                       versions=g.get('data_versions'))
 
         # If the child does not exist, return a 404 error
         if not child:
             return jsonify({"error": "Child not found"}), 404
 
-        # Fetch the hobbies linked to this child
-        cursor.execute("""
-            SELECT h.name FROM hobbies h
-            JOIN child_hobbies ch ON h.id = ch.hobby_id
-            WHERE ch.child_id = %s
-        """, (child_id,))
-        hobbies = cursor.fetchall()
-
-        # Add the hobbies to the child's data
-        child['hobbies'] = [hobby['name'] for hobby in hobbies]
-
-        cursor.close()
-        conn.close()
-
         return jsonify(child), 200
 
     except Exception as e:
@@ -191,17 +231,15 @@ def get_child_by_id(child_id):
 
 # Route to get all hobbies
 @orphans.route('/hobbies', methods=['GET'])
+@conditional('hobbies')
 def get_hobbies():
     try:
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
+        def load_hobbies():
+            # Fetch all hobbies from the hobbies table
+            return get_repo().list_hobbies()
 
-        # Fetch all hobbies from the hobbies table
-        cursor.execute("SELECT * FROM hobbies")
-        hobbies = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
+        hobbies = get_cache().get_or_set('hobbies', load_hobbies, tags=['hobbies'],
+                                         versions=g.get('data_versions'))
 
         return jsonify(hobbies), 200
 
@@ -211,40 +249,54 @@ def get_hobbies():
 
 # Route to get all guest express-interest submissions related to this orphanage
 @orphans.route('/submissions', methods=['GET'])
+@orphanage_required
+@conditional('submissions:{orphanage_id}', 'children:{orphanage_id}')
 def get_orphanage_submissions():
     try:
-        # Get the token from the Authorization header
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Token is missing!"}), 401
+        orphanage_id = g.orphanage_id
 
-        # Decode the token to get the orphanage_id
-        try:
-            decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            orphanage_id = decoded_token['orphanage_id']
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token!"}), 401
+        # Without 'since', fetch all express-interest submissions related to this orphanage
+        if 'since' not in request.args:
+            submissions = get_repo().list_submissions(orphanage_id)
+            return jsonify(submissions), 200
 
-        # Connect to the database
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
-
-        # Fetch all express-interest submissions related to this orphanage
-        cursor.execute("""
-            SELECT r.id, r.child_id, c.name AS child_name, r.guest_name, r.guest_email, r.interest_type, r.message, r.created_at
-            FROM adoption_sponsorship_requests r
-            LEFT JOIN children c ON r.child_id = c.id
-            WHERE r.orphanage_id = %s
-        """, (orphanage_id,))
+        # With it, only the ones the cursor has not had yet ('' for the oldest first), a page at a time.
+        # Each read also looks SUBMISSIONS_OVERLAP_SECONDS back for submissions that committed late
+        try:
+            since = decode_cursor(request.args['since'])
+            limit = (int_arg(request.args, 'limit', minimum=1, maximum=current_app.config['SUBMISSIONS_MAX_PAGE_SIZE'])
+                     or current_app.config['SUBMISSIONS_PAGE_SIZE'])
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
 
-        submissions = cursor.fetchall()
+        overlap = current_app.config['SUBMISSIONS_OVERLAP_SECONDS']
+        submissions, has_more = read_submissions(get_repo(), orphanage_id, since, limit, overlap)
 
-        cursor.close()
-        conn.close()
+        # Poll again with next_cursor either way
+        for submission in submissions:
+            since = advance(since, submission, overlap)
+        next_cursor = encode_cursor(since)
 
-        return jsonify(submissions), 200
+        return jsonify({"submissions": submissions, "next_cursor": next_cursor, "has_more": has_more}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+# Server-sent events with each new submission for this orphanage, as they arrive
+@orphans.route('/submissions/stream', methods=['GET'])
+@query_token_allowed
+@orphanage_required
+def stream_orphanage_submissions():
+    if not current_app.config['SSE_ENABLED']:
+        return jsonify({"error": "Submission streams are disabled"}), 404
+
+    # Resume after the browser's last event, or after a cursor from /submissions?since=
+    try:
+        since = decode_cursor(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+
+    stream = event_stream(current_app._get_current_object(), g.orphanage_id, since)
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
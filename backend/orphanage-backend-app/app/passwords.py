@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import current_app  # type: ignore
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+from app.metrics import timed
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already queued or running."""
+
+
+def full_hash_method(method):
+    """``method`` with Werkzeug's defaults filled in, as it is stored in front of each hash.
+
+    'scrypt' becomes 'scrypt:32768:8:1' and 'pbkdf2:sha256' 'pbkdf2:sha256:<default iterations>';
+    anything Werkzeug would not accept raises ValueError.
+    """
+    name, *args = method.split(':')
+    try:
+        if name == 'scrypt' and not args:
+            return 'scrypt:32768:8:1'
+        if name == 'scrypt' and len(args) == 3:
+            return 'scrypt:' + ':'.join(str(int(arg)) for arg in args)
+        if name == 'pbkdf2' and len(args) <= 2:
+            hash_name = args[0] if args else 'sha256'
+            iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+            return f'pbkdf2:{hash_name}:{iterations}'
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid PASSWORD_HASH_METHOD {method!r}, expected e.g. 'scrypt' or 'pbkdf2:sha256:600000'")
+
+
+class PasswordHasher:
+    """Runs password hashing and verification on a small dedicated thread pool.
+
+    Key derivation is deliberately slow, so it is capped at ``workers``
+    concurrent jobs plus ``queue_depth`` waiting ones; anything beyond that is
+    rejected straight away instead of tying up request threads.
+    """
+
+    def __init__(self, method='pbkdf2:sha256:600000', workers=2, queue_depth=32, timeout=10):
+        # Compared with the prefix of stored hashes, so spelled out the way Werkzeug stores it
+        self.method = full_hash_method(method)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, method=self.method, salt_length=16)
+
+    def verify(self, stored_hash, password):
+        """Check ``password``; returns ``(ok, new_hash)``.
+
+        ``new_hash`` is set when the password matched but was stored with a
+        different method or work factor than the configured one.
+        """
+        return self._run(self._verify_and_rehash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        # Werkzeug hashes look like 'pbkdf2:sha256:600000$salt$hash'
+        return stored_hash.split('$', 1)[0] != self.method
+
+    def _verify_and_rehash(self, stored_hash, password):
+        if not check_password_hash(stored_hash, password):
+            return False, None
+        if self.needs_rehash(stored_hash):
+            return True, generate_password_hash(password, method=self.method, salt_length=16)
+        return True, None
+
+    def _run(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Too many login attempts in progress, please retry shortly")
+
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            with timed('password'):
+                return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHasherBusy("Password check timed out, please retry shortly")
+
+
+def get_hasher(app=None):
+    app = app or current_app
+    return app.extensions['password_hasher']
+
+
+def init_app(app):
+    app.extensions['password_hasher'] = PasswordHasher(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        queue_depth=app.config['PASSWORD_HASH_QUEUE_DEPTH'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+    )
@@ -0,0 +1,167 @@
+"""Statement statistics and a slow-query log with EXPLAIN plans.
+
+The repository reports every statement it runs: its SQL, the shape of its
+parameters (types only, never values), duration and row count. Totals are
+kept per distinct statement for the top-N summary on /admin/slow-queries.
+Statements slower than ``SLOW_QUERY_THRESHOLD`` are appended to a rotating
+JSON-lines log, and the first time a statement is slow its EXPLAIN plan is
+captured there too.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+
+from flask import current_app, jsonify, request  # type: ignore
+
+from app.auth_middleware import admin_required
+
+
+logger = logging.getLogger(__name__)
+
+# Statements EXPLAIN can say something useful about
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE')
+
+# IN lists of any length count as one statement
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(query):
+    return _IN_LIST.sub('(%s, ...)', _SPACES.sub(' ', query).strip())
+
+
+def param_shape(params, many=False):
+    """Types of the bound parameters, e.g. '(int, str)' or '250 x (int, int)' for executemany."""
+    if many:
+        rows = list(params)
+        return f"{len(rows)} x {param_shape(rows[0])}" if rows else '0 x ()'
+    return '(' + ', '.join(type(value).__name__ for value in params or ()) + ')'
+
+
+class StatementStats:
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.params = None
+
+    def as_dict(self, sql):
+        return {
+            'sql': sql,
+            'calls': self.calls,
+            'total_seconds': round(self.total, 6),
+            'mean_ms': round(self.total / self.calls * 1000, 3) if self.calls else 0.0,
+            'max_ms': round(self.max * 1000, 3),
+            'rows': self.rows,
+            'slow_calls': self.slow,
+            'params': self.params,
+        }
+
+
+class QueryLog:
+    def __init__(self, path, threshold=0.1, max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._explained = set()
+        self.path = path
+        self._handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                             delay=True, encoding='utf-8')
+
+    def share_file(self):
+        """Append to the log from several processes: stop rotating it here and leave that to logrotate.
+
+        Each process reopens the file once it has been moved away.
+        """
+        old, self._handler = self._handler, logging.handlers.WatchedFileHandler(self.path, delay=True,
+                                                                                encoding='utf-8')
+        old.close()
+
+    def record(self, query, params, seconds, rowcount, many=False, explain=None):
+        """Account for one statement; ``explain(query, params)`` returns its plan rows when called."""
+        sql = normalize(query)
+        shape = param_shape(params, many)
+        slow = seconds >= self.threshold
+
+        with self._lock:
+            stats = self._stats.get(sql)
+            if stats is None:
+                stats = self._stats[sql] = StatementStats()
+            stats.calls += 1
+            stats.total += seconds
+            stats.max = max(stats.max, seconds)
+            stats.rows += max(rowcount or 0, 0)
+            stats.params = shape
+            if slow:
+                stats.slow += 1
+            capture_plan = (slow and explain is not None and not many and sql not in self._explained
+                            and sql.split(' ', 1)[0].upper() in EXPLAINABLE)
+            if capture_plan:
+                self._explained.add(sql)
+
+        if not slow:
+            return
+
+        entry = {'event': 'slow_query', 'sql': sql, 'params': shape, 'ms': round(seconds * 1000, 3),
+                 'rows': rowcount}
+        if capture_plan:
+            try:
+                entry['plan'] = explain(query, params)
+            except Exception as err:
+                entry['plan_error'] = str(err)
+        self._write(entry)
+
+    def top(self, n=20):
+        """The ``n`` statements with the most total time."""
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1].total, reverse=True)[:n]
+            return [stats.as_dict(sql) for sql, stats in items]
+
+    def _write(self, entry):
+        entry['time'] = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        try:
+            line = json.dumps(entry, default=str)
+            self._handler.handle(logging.makeLogRecord({'msg': line, 'levelno': logging.WARNING,
+                                                        'levelname': 'WARNING'}))
+        except Exception:
+            logger.exception("Could not write to the slow-query log")
+
+
+def get_query_log(app=None):
+    app = app or current_app
+    return app.extensions.get('query_log')
+
+
+@admin_required
+def slow_queries_view():
+    try:
+        limit = int(request.args.get('limit', current_app.config['SLOW_QUERY_TOP_N']))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    query_log = get_query_log()
+    return jsonify({"threshold_ms": query_log.threshold * 1000, "statements": query_log.top(limit)}), 200
+
+
+def init_app(app):
+    if not app.config['SLOW_QUERY_LOG_ENABLED']:
+        return
+
+    # Not the working directory, which is often the source tree
+    path = app.config['SLOW_QUERY_LOG_PATH'] or os.path.join(app.instance_path, 'slow_queries.log')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    app.extensions['query_log'] = QueryLog(
+        path,
+        threshold=app.config['SLOW_QUERY_THRESHOLD'],
+        max_bytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+        backup_count=app.config['SLOW_QUERY_LOG_BACKUPS'],
+    )
+
+    # Top statements by total time, for admins
+    app.add_url_rule('/admin/slow-queries', 'slow_queries', slow_queries_view, methods=['GET'])
@@ -0,0 +1,299 @@
+"""Read/write splitting across the primary and ``MYSQL_REPLICAS``.
+
+GET and HEAD requests check their connection out of a read replica, picked
+round-robin among the healthy ones; every other request (add-child,
+express-interest, verify, donation info, register, ...) and everything
+outside a request (CLI commands, background threads) uses the primary.
+
+Read-your-writes: a successful write sets a short-lived cookie, and for
+``READ_YOUR_WRITES_SECONDS`` the same client's reads go to the primary too,
+so it never misses its own change on a replica that has not caught up.
+Other clients may see data up to ``REPLICA_MAX_LAG`` seconds old.
+
+Cached bodies are keyed by the data_versions the request read on its own
+connection (see app.cache), so a lagging replica's copy is never served to a
+request that has seen newer versions, nor under a newer ETag.
+
+Each process checks the replication lag of every replica every
+``REPLICA_LAG_CHECK_INTERVAL`` seconds, on a connection of its own rather
+than one the requests need. A replica further behind than
+``REPLICA_MAX_LAG``, not replicating, or unreachable is taken out of the
+rotation until a later check finds it caught up; with the checks turned off,
+a replica evicted for a failed connection is retried after
+``REPLICA_REJOIN_SECONDS``. With no healthy replica left, reads go to the
+primary.
+"""
+import itertools
+import logging
+import threading
+import time
+
+from mysql.connector import errors  # type: ignore
+from flask import current_app, has_request_context, request  # type: ignore
+
+from app.db import ConnectionPool
+
+
+logger = logging.getLogger(__name__)
+
+# Methods that never change data and may be served by a replica
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+# MySQL 8.0.22 renamed the statement and its column; older servers only know the second pair
+REPLICA_STATUS_QUERY = ('SHOW REPLICA STATUS', 'Seconds_Behind_Source')
+SLAVE_STATUS_QUERY = ('SHOW SLAVE STATUS', 'Seconds_Behind_Master')
+
+
+def replica_address(replica):
+    """(host, port) of a MYSQL_REPLICAS entry: 'host', 'host:port' or {'host': ..., 'port': ...}."""
+    if isinstance(replica, dict):
+        return replica['host'], int(replica.get('port', 3306))
+    host, _, port = replica.partition(':')
+    return host, int(port or 3306)
+
+
+def _status_lag(conn, query, column):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(query)
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    # No row on a server that is not a replica; NULL while its replication threads are stopped
+    return row.get(column) if row else None
+
+
+class Replica:
+    """One read replica: its connection pool and what the last lag check found."""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.healthy = True
+        self.lag = None
+        self.evicted_at = None
+        # The lag checks' own connection, so they never wait on (or take from) the request pool
+        self.probe = None
+
+
+class ReplicaSet:
+    """Hands out replica connections for reads and keeps lagging replicas out of the rotation."""
+
+    def __init__(self, app, replicas, max_lag=5, check_interval=5, rejoin_seconds=30, pin_seconds=5,
+                 pin_cookie='read_primary_until'):
+        self.app = app
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.rejoin_seconds = rejoin_seconds
+        self.pin_seconds = pin_seconds
+        self.pin_cookie = pin_cookie
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats = {
+            'replica_reads': 0,
+            'primary_reads': 0,
+            'pinned_reads': 0,
+            'evictions': 0,
+            'fallbacks': 0,
+        }
+
+    def start(self):
+        # Started lazily so that a process forked after create_app() runs its own thread
+        with self._lock:
+            if self.check_interval and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='replica-lag-check', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def reopen(self, make_pool):
+        """Give every replica a fresh pool, e.g. in a worker right after the fork."""
+        for replica in self.replicas:
+            replica.pool = make_pool(replica.name)
+            replica.probe = None
+
+    def choose(self):
+        """The next healthy replica in turn, or None if there is none."""
+        # Nothing else would bring back a replica evicted for a failed connection
+        if not self.check_interval:
+            self._rejoin_due()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    def acquire(self, primary):
+        """(pool, connection) for the current request: a replica for reads, otherwise the primary."""
+        replica = self.replica_for(request.method, request.cookies) if has_request_context() else None
+        if replica is not None:
+            # Read from the primary rather than fail the request; a busy replica stays in rotation
+            try:
+                conn = replica.pool.acquire()
+            except errors.PoolError:
+                self.count('fallbacks')
+            except replica.pool.error_class as err:
+                self.evict(replica, f"connection failed: {err}")
+                self.count('fallbacks')
+            else:
+                self.count('replica_reads')
+                return replica.pool, conn
+
+        self.count('primary_reads')
+        return primary, primary.acquire()
+
+    def replica_for(self, method, cookies):
+        """The replica a request should read from, or None if it belongs on the primary."""
+        if method not in READ_METHODS:
+            return None
+        if self.is_pinned(cookies):
+            self.count('pinned_reads')
+            return None
+        return self.choose()
+
+    def is_pinned(self, cookies):
+        """Whether the client sending ``cookies`` wrote within the read-your-writes window."""
+        try:
+            until = float(cookies.get(self.pin_cookie, ''))
+        except ValueError:
+            return False
+        # Ignore expiry times further out than any window we would have set (rounded up to the second)
+        now = time.time()
+        return now < until <= now + self.pin_seconds + 1
+
+    def pin(self, response):
+        """Send this client's reads to the primary for the next ``pin_seconds``."""
+        until = int(time.time() + self.pin_seconds) + 1
+        response.set_cookie(self.pin_cookie, str(until), max_age=self.pin_seconds + 1,
+                            httponly=True, samesite='Lax')
+        return response
+
+    def evict(self, replica, reason):
+        with self._lock:
+            if not replica.healthy:
+                return
+            replica.healthy = False
+            replica.evicted_at = time.monotonic()
+            self._stats['evictions'] += 1
+        logger.warning("Read replica %s taken out of rotation: %s", replica.name, reason)
+
+    def check(self):
+        """Measure every replica's lag once and update the rotation; returns how many are healthy."""
+        for replica in self.replicas:
+            try:
+                replica.lag = self._lag(replica)
+            except errors.PoolError:
+                # Busy is not broken: keep the replica as it is until the next check
+                continue
+            except Exception as err:
+                replica.lag = None
+                self.evict(replica, f"lag check failed: {err}")
+                continue
+
+            if replica.lag is None:
+                self.evict(replica, "not replicating")
+            elif replica.lag > self.max_lag:
+                self.evict(replica, f"{replica.lag}s behind (REPLICA_MAX_LAG is {self.max_lag}s)")
+            elif not replica.healthy:
+                replica.healthy = True
+                logger.info("Read replica %s back in rotation, %ss behind", replica.name, replica.lag)
+        return sum(replica.healthy for replica in self.replicas)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['replicas'] = len(self.replicas)
+        stats['healthy'] = sum(replica.healthy for replica in self.replicas)
+        lags = [replica.lag for replica in self.replicas if replica.lag is not None]
+        stats['max_lag_seconds'] = max(lags) if lags else 0
+        return stats
+
+    def count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _lag(self, replica):
+        """Seconds the replica is behind the primary, or None if it is not replicating."""
+        if replica.probe is None:
+            replica.probe = replica.pool.open_connection()
+        try:
+            try:
+                return _status_lag(replica.probe, *REPLICA_STATUS_QUERY)
+            except replica.pool.error_class:
+                return _status_lag(replica.probe, *SLAVE_STATUS_QUERY)
+        except Exception:
+            # Reconnect on the next check
+            replica.pool.close_connection(replica.probe)
+            replica.probe = None
+            raise
+
+    def _rejoin_due(self):
+        now = time.monotonic()
+        for replica in self.replicas:
+            if not replica.healthy and now - replica.evicted_at >= self.rejoin_seconds:
+                replica.healthy = True
+                logger.info("Read replica %s back in rotation after %ss", replica.name, self.rejoin_seconds)
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Replica lag check failed")
+
+
+def get_replicas(app=None):
+    """The app's ReplicaSet, or None when no replicas are configured."""
+    app = app or current_app
+    return app.extensions.get('replicas')
+
+
+def create_replica_pool(app, name):
+    """A new, empty pool for the replica ``name`` ('host:port'), with the primary's credentials and database."""
+    host, port = replica_address(name)
+    db_config = {
+        'user': app.config['MYSQL_USER'],
+        'password': app.config['MYSQL_PASSWORD'],
+        'host': host,
+        'port': port,
+        'database': app.config['MYSQL_DATABASE'],
+    }
+
+    return ConnectionPool(
+        db_config,
+        size=app.config['REPLICA_POOL_SIZE'],
+        timeout=app.config['REPLICA_POOL_TIMEOUT'],
+        recycle=app.config['MYSQL_POOL_RECYCLE'],
+        pre_ping=app.config['MYSQL_POOL_PRE_PING'],
+    )
+
+
+def init_app(app):
+    # SQLite has no replicas; with none configured every query uses the primary as before
+    if app.config['DB_BACKEND'] == 'sqlite' or not app.config['MYSQL_REPLICAS']:
+        return
+
+    names = ['%s:%s' % replica_address(replica) for replica in app.config['MYSQL_REPLICAS']]
+    replicas = app.extensions['replicas'] = ReplicaSet(
+        app,
+        [Replica(name, create_replica_pool(app, name)) for name in names],
+        max_lag=app.config['REPLICA_MAX_LAG'],
+        check_interval=app.config['REPLICA_LAG_CHECK_INTERVAL'],
+        rejoin_seconds=app.config['REPLICA_REJOIN_SECONDS'],
+        pin_seconds=app.config['READ_YOUR_WRITES_SECONDS'],
+        pin_cookie=app.config['READ_YOUR_WRITES_COOKIE'],
+    )
+
+    @app.before_request
+    def _start_lag_checks():
+        replicas.start()
+
+    @app.after_request
+    def _pin_writer(response):
+        # Only successful writes, so a rejected request does not cost the client its replica reads
+        if request.method not in READ_METHODS and response.status_code < 400 and replicas.pin_seconds:
+            replicas.pin(response)
+        return response
@@ -0,0 +1,1098 @@
+"""Every query the blueprints run, behind one interface per database.
+
+``MySQLRepository`` sends statements through server-side prepared cursors
+kept per connection, so a hot query is parsed and planned once per pooled
+connection rather than on every request. ``SQLiteRepository`` offers the same
+methods on a local file for benchmarks and laptop runs (``DB_BACKEND = 'sqlite'``).
+"""
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import current_app, g  # type: ignore
+
+from app.children import AGE_BUCKETS, facet_counts, facet_deltas, hobby_names, merge_hobbies
+from app.db import get_db, on_discard
+from app.metrics import timed
+
+
+# What the homepage shows of a child, straight from the public catalogue
+PUBLIC_CHILD_COLUMNS = "child_id AS id, name, age, image_url, image_key, about, orphanage_id, orphanage_name, hobbies"
+
+# Public detail of one child of an approved orphanage
+PUBLIC_CHILD_QUERY = f"SELECT {PUBLIC_CHILD_COLUMNS} FROM public_children WHERE child_id = %s"
+
+# Copies children of approved orphanages into the catalogue; callers narrow it with "AND ..."
+INSERT_CATALOGUE_QUERY = """
+    INSERT INTO public_children (child_id, orphanage_id, orphanage_name, governorate, name, age, image_url,
+                                 image_key, about, hobbies)
+    SELECT c.id, c.orphanage_id, o.name, ov.governorate, c.name, c.age, c.image_url, c.image_key, c.about,
+           (SELECT JSON_ARRAYAGG(h.name) FROM child_hobbies ch JOIN hobbies h ON h.id = ch.hobby_id
+            WHERE ch.child_id = c.id)
+    FROM children c
+    JOIN users o ON c.orphanage_id = o.id
+    JOIN orphanage_verification ov ON c.orphanage_id = ov.orphanage_id
+    WHERE ov.status = 'approved'
+"""
+
+INSERT_CATALOGUE_ORPHANAGE_QUERY = INSERT_CATALOGUE_QUERY + "    AND c.orphanage_id = %s\n"
+
+DELETE_CATALOGUE_ORPHANAGE_QUERY = "DELETE FROM public_children WHERE orphanage_id = %s"
+
+CLEAR_CATALOGUE_QUERY = "DELETE FROM public_children"
+
+# What the facet counters are computed from; callers add the WHERE clause
+CATALOGUE_FACET_ROWS_QUERY = """
+    SELECT p.child_id, p.governorate, p.age, ch.hobby_id
+    FROM public_children p
+    LEFT JOIN child_hobbies ch ON ch.child_id = p.child_id
+"""
+
+ORPHANAGE_FACET_ROWS_QUERY = CATALOGUE_FACET_ROWS_QUERY + "    WHERE p.orphanage_id = %s\n"
+
+# Adds a (possibly negative) change to one counter
+UPSERT_FACET_QUERY = """
+    INSERT INTO catalogue_facets (facet, value, children) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE children = children + VALUES(children)
+"""
+
+# Counters with their hobby names; the table holds a row per facet value, not per child
+FACETS_QUERY = """
+    SELECT f.facet, f.value, f.children, h.name AS hobby_name
+    FROM catalogue_facets f
+    LEFT JOIN hobbies h ON f.facet = 'hobby' AND h.id = f.value
+    WHERE f.children > 0
+"""
+
+CLEAR_FACETS_QUERY = "DELETE FROM catalogue_facets"
+
+AGE_BUCKET_SQL = ("CASE " + " ".join(f"WHEN age <= {oldest} THEN '{label}'" for label, oldest in AGE_BUCKETS[:-1])
+                  + f" ELSE '{AGE_BUCKETS[-1][0]}' END")
+
+# Counters recomputed from the catalogue, one statement per facet
+RECOUNT_FACETS_QUERIES = [
+    """
+    INSERT INTO catalogue_facets (facet, value, children)
+    SELECT 'governorate', governorate, COUNT(*) FROM public_children
+    WHERE governorate IS NOT NULL GROUP BY governorate
+    """,
+    f"""
+    INSERT INTO catalogue_facets (facet, value, children)
+    SELECT 'age', bucket, COUNT(*) FROM (SELECT {AGE_BUCKET_SQL} AS bucket FROM public_children) AS ages
+    GROUP BY bucket
+    """,
+    """
+    INSERT INTO catalogue_facets (facet, value, children)
+    SELECT 'hobby', ch.hobby_id, COUNT(*) FROM public_children p
+    JOIN child_hobbies ch ON ch.child_id = p.child_id
+    GROUP BY ch.hobby_id
+    """,
+]
+
+# Full record of one child for its orphanage, hobby names included
+CHILD_QUERY = """
+    SELECT c.*, JSON_ARRAYAGG(h.name) AS hobbies
+    FROM children c
+    LEFT JOIN child_hobbies ch ON ch.child_id = c.id
+    LEFT JOIN hobbies h ON h.id = ch.hobby_id
+    WHERE c.id = %s
+    GROUP BY c.id
+"""
+
+ORPHANAGE_CHILDREN_QUERY = "SELECT * FROM children WHERE orphanage_id = %s"
+
+# What ?fields= may ask for on an orphanage's child endpoints, and the columns behind each field.
+# 'hobbies' comes from child_hobbies, and image_url needs the key of an uploaded photo
+CHILD_FIELDS = {
+    'id': 'c.id',
+    'orphanage_id': 'c.orphanage_id',
+    'name': 'c.name',
+    'age': 'c.age',
+    'image_url': 'c.image_url, c.image_key',
+    'about': 'c.about',
+    'hobbies': None,
+}
+
+HOBBIES_QUERY = "SELECT * FROM hobbies"
+
+HOBBY_IDS_QUERY = "SELECT id FROM hobbies"
+
+INSERT_HOBBY_QUERY = "INSERT INTO hobbies (name) VALUES (%s)"
+
+INSERT_CHILD_QUERY = """
+    INSERT INTO children (orphanage_id, name, age, image_url, image_key, about)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+SET_CHILD_IMAGE_QUERY = "UPDATE children SET image_key = %s WHERE id = %s AND orphanage_id = %s"
+
+INSERT_CHILD_HOBBY_QUERY = "INSERT INTO child_hobbies (child_id, hobby_id) VALUES (%s, %s)"
+
+# Guest interest in adopting or sponsoring a child of an orphanage
+INSERT_INTEREST_QUERY = """
+    INSERT INTO adoption_sponsorship_requests (child_id, orphanage_id, guest_name, guest_email, interest_type, message)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+# The same from the buffered /express-interest; a submission replayed after a crash is skipped
+INSERT_INTEREST_ONCE_QUERY = """
+    INSERT INTO adoption_sponsorship_requests (child_id, orphanage_id, guest_name, guest_email, interest_type, message,
+                                               submission_uid)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE id = id
+"""
+
+SUBMISSIONS_QUERY = """
+    SELECT r.id, r.child_id, c.name AS child_name, r.guest_name, r.guest_email, r.interest_type, r.message, r.created_at
+    FROM adoption_sponsorship_requests r
+    LEFT JOIN children c ON r.child_id = c.id
+    WHERE r.orphanage_id = %s
+"""
+
+# Submissions created at or after a time, oldest first; the range walks idx_requests_orphanage
+SUBMISSIONS_SINCE_QUERY = SUBMISSIONS_QUERY + """    AND r.created_at >= %s
+    ORDER BY r.created_at, r.id
+    LIMIT %s
+"""
+
+SUBMISSIONS_FIRST_PAGE_QUERY = SUBMISSIONS_QUERY + """    ORDER BY r.created_at, r.id
+    LIMIT %s
+"""
+
+LATEST_SUBMISSION_QUERY = """
+    SELECT id, created_at FROM adoption_sponsorship_requests
+    WHERE orphanage_id = %s
+    ORDER BY created_at DESC, id DESC
+    LIMIT 1
+"""
+
+USER_BY_EMAIL_QUERY = "SELECT * FROM users WHERE email = %s"
+
+ADMIN_BY_EMAIL_QUERY = "SELECT * FROM users WHERE email = %s AND role = 'admin'"
+
+INSERT_USER_QUERY = "INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, %s)"
+
+UPDATE_PASSWORD_QUERY = "UPDATE users SET password = %s WHERE id = %s"
+
+INSERT_VERIFICATION_QUERY = """
+    INSERT INTO orphanage_verification (orphanage_id, governorate, address, registration_certificate_number,
+                                        operating_license_number, license_expiration_date, manager_national_id,
+                                        tax_id, bank_account_details)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+ORPHANAGE_ACCOUNT_QUERY = """
+    SELECT address, registration_certificate_number, operating_license_number,
+           license_expiration_date, manager_national_id, tax_id, bank_account_details,
+           status, rejection_reason, governorate
+    FROM orphanage_verification
+    WHERE orphanage_id = %s
+"""
+
+ORPHANAGE_STATUS_QUERY = """
+    SELECT status, rejection_reason
+    FROM orphanage_verification
+    WHERE orphanage_id = %s
+"""
+
+UPDATE_ORPHANAGE_STATUS_QUERY = """
+    UPDATE orphanage_verification
+    SET status = %s, rejection_reason = %s
+    WHERE orphanage_id = %s
+"""
+
+# Orphanages with their verification details, joined with users for name and email
+ORPHANAGE_REQUESTS_QUERY = """
+    SELECT o.orphanage_id, u.name, u.email, o.address,
+           o.registration_certificate_number,
+           o.operating_license_number, o.license_expiration_date,
+           o.manager_national_id, o.tax_id, o.bank_account_details,
+           o.status, o.rejection_reason
+    FROM orphanage_verification o
+    JOIN users u ON o.orphanage_id = u.id
+"""
+
+ORPHANAGE_REQUEST_QUERY = ORPHANAGE_REQUESTS_QUERY + "    WHERE o.orphanage_id = %s\n"
+
+VERIFICATION_STATUSES = ('pending', 'approved', 'rejected')
+
+# What ?fields= may ask for on the admin's orphanage endpoints; name and email need the users join
+ORPHANAGE_REQUEST_FIELDS = {
+    'orphanage_id': 'o.orphanage_id',
+    'name': 'u.name',
+    'email': 'u.email',
+    'governorate': 'o.governorate',
+    'address': 'o.address',
+    'registration_certificate_number': 'o.registration_certificate_number',
+    'operating_license_number': 'o.operating_license_number',
+    'license_expiration_date': 'o.license_expiration_date',
+    'manager_national_id': 'o.manager_national_id',
+    'tax_id': 'o.tax_id',
+    'bank_account_details': 'o.bank_account_details',
+    'status': 'o.status',
+    'rejection_reason': 'o.rejection_reason',
+}
+
+# What the review queue lists unless ?fields= says otherwise; no bank or ID numbers
+REVIEW_QUEUE_FIELDS = ['name', 'email', 'governorate', 'address', 'license_expiration_date', 'status',
+                       'rejection_reason']
+
+INSERT_DONATION_QUERY = """
+    INSERT INTO donations (orphanage_id, donation_method, donation_details)
+    VALUES (%s, %s, %s)
+"""
+
+DONATION_QUERY = """
+    SELECT donation_method, donation_details
+    FROM donations
+    WHERE orphanage_id = %s
+"""
+
+BUMP_VERSIONS_QUERY = """
+    INSERT INTO data_versions (scope, version) VALUES (%s, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP(6)
+"""
+
+
+# Time spent in the database, reported per endpoint on /metrics
+query_timer = timed('query')
+
+
+def build_children_page_query(after=None, limit=20, orphanage_id=None, governorate=None,
+                              min_age=None, max_age=None):
+    """Build the keyset-paginated query over the public catalogue.
+
+    Every row there belongs to an approved orphanage, so this is one scan of
+    the primary key (or of the orphanage / governorate index) without joins.
+    One extra row is requested so the caller can tell whether a next page exists.
+    """
+    conditions = []
+    params = []
+
+    if after is not None:
+        conditions.append("child_id > %s")
+        params.append(after)
+    if orphanage_id is not None:
+        conditions.append("orphanage_id = %s")
+        params.append(orphanage_id)
+    if governorate:
+        conditions.append("governorate = %s")
+        params.append(governorate)
+    if min_age is not None:
+        conditions.append("age >= %s")
+        params.append(min_age)
+    if max_age is not None:
+        conditions.append("age <= %s")
+        params.append(max_age)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    query = f"""
+        SELECT {PUBLIC_CHILD_COLUMNS}
+        FROM public_children
+        {where}
+        ORDER BY child_id
+        LIMIT %s
+    """
+    params.append(limit + 1)
+    return query, tuple(params)
+
+
+def build_hobbies_query(child_ids):
+    """Query returning (child_id, name) for every hobby of ``child_ids``."""
+    placeholders = ', '.join(['%s'] * len(child_ids))
+    query = f"""
+        SELECT ch.child_id, h.name FROM child_hobbies ch
+        JOIN hobbies h ON h.id = ch.hobby_id
+        WHERE ch.child_id IN ({placeholders})
+    """
+    return query, tuple(child_ids)
+
+
+def build_children_search_query(text=None, hobby_ids=(), governorate=None, min_age=None, max_age=None,
+                                offset=0, limit=20, dialect='mysql'):
+    """Build the ranked search over the public catalogue.
+
+    ``text`` holds plain words; rows matching any of them in name or about
+    are ranked by full-text relevance (a FULLTEXT index on MySQL, FTS5 on
+    SQLite), otherwise rows come in id order. ``hobby_ids`` matches children
+    with any of those hobbies. One extra row is requested so the caller can
+    tell whether a next page exists.
+    """
+    joins = ''
+    conditions = []
+    params = []
+    order = "p.child_id"
+    order_params = []
+
+    if text:
+        if dialect == 'sqlite':
+            joins = "JOIN public_children_fts ON public_children_fts.rowid = p.child_id"
+            conditions.append("public_children_fts MATCH %s")
+            params.append(' OR '.join(f'"{word}"' for word in text.split()))
+            order = "bm25(public_children_fts), p.child_id"
+        else:
+            conditions.append("MATCH (p.name, p.about) AGAINST (%s IN NATURAL LANGUAGE MODE)")
+            params.append(text)
+            order = "MATCH (p.name, p.about) AGAINST (%s IN NATURAL LANGUAGE MODE) DESC, p.child_id"
+            order_params.append(text)
+    if hobby_ids:
+        placeholders = ', '.join(['%s'] * len(hobby_ids))
+        conditions.append(f"p.child_id IN (SELECT ch.child_id FROM child_hobbies ch WHERE ch.hobby_id IN ({placeholders}))")
+        params.extend(hobby_ids)
+    if governorate:
+        conditions.append("p.governorate = %s")
+        params.append(governorate)
+    if min_age is not None:
+        conditions.append("p.age >= %s")
+        params.append(min_age)
+    if max_age is not None:
+        conditions.append("p.age <= %s")
+        params.append(max_age)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    query = f"""
+        SELECT p.child_id AS id, p.name, p.age, p.image_url, p.image_key, p.about, p.orphanage_id, p.orphanage_name,
+               p.hobbies
+        FROM public_children p
+        {joins}
+        {where}
+        ORDER BY {order}
+        LIMIT %s OFFSET %s
+    """
+    params.extend(order_params)
+    params.extend([limit + 1, offset])
+    return query, tuple(params)
+
+
+def build_catalogue_children_queries(child_ids):
+    """(delete, insert, facet rows) statements re-copying ``child_ids`` into the public catalogue."""
+    placeholders = ', '.join(['%s'] * len(child_ids))
+    delete = f"DELETE FROM public_children WHERE child_id IN ({placeholders})"
+    insert = INSERT_CATALOGUE_QUERY + f"    AND c.id IN ({placeholders})\n"
+    facet_rows = CATALOGUE_FACET_ROWS_QUERY + f"    WHERE p.child_id IN ({placeholders})\n"
+    return delete, insert, facet_rows, tuple(child_ids)
+
+
+def select_list(allowed, fields, always=()):
+    """Columns behind ``fields`` and ``always`` (names from the ``allowed`` map) for a SELECT.
+
+    Columns come in the map's order whatever order the fields were asked
+    in, so each set of fields is one statement text.
+    """
+    wanted = set(fields) | set(always)
+    return ', '.join(columns for name, columns in allowed.items() if name in wanted and columns)
+
+
+def build_child_query(child_id, fields):
+    """CHILD_QUERY narrowed to ``fields``; hobbies are only joined in when asked for."""
+    columns = select_list(CHILD_FIELDS, fields, always=['id'])
+    if 'hobbies' not in fields:
+        return f"SELECT {columns} FROM children c WHERE c.id = %s", (child_id,)
+    query = f"""
+        SELECT {columns}, JSON_ARRAYAGG(h.name) AS hobbies
+        FROM children c
+        LEFT JOIN child_hobbies ch ON ch.child_id = c.id
+        LEFT JOIN hobbies h ON h.id = ch.hobby_id
+        WHERE c.id = %s
+        GROUP BY c.id
+    """
+    return query, (child_id,)
+
+
+def build_orphanage_children_query(orphanage_id, fields):
+    """ORPHANAGE_CHILDREN_QUERY narrowed to ``fields``; hobbies are attached separately."""
+    columns = select_list(CHILD_FIELDS, fields, always=['id'])
+    return f"SELECT {columns} FROM children c WHERE c.orphanage_id = %s", (orphanage_id,)
+
+
+def _orphanage_requests_from(fields):
+    # users is only joined when its columns are asked for
+    if {'name', 'email'} & set(fields):
+        return "FROM orphanage_verification o JOIN users u ON o.orphanage_id = u.id"
+    return "FROM orphanage_verification o"
+
+
+def build_orphanage_request_query(orphanage_id, fields):
+    """ORPHANAGE_REQUEST_QUERY narrowed to ``fields``."""
+    columns = select_list(ORPHANAGE_REQUEST_FIELDS, fields, always=['orphanage_id'])
+    return f"SELECT {columns} {_orphanage_requests_from(fields)} WHERE o.orphanage_id = %s", (orphanage_id,)
+
+
+def build_orphanage_requests_query(fields):
+    """ORPHANAGE_REQUESTS_QUERY narrowed to ``fields``."""
+    columns = select_list(ORPHANAGE_REQUEST_FIELDS, fields, always=['orphanage_id'])
+    return f"SELECT {columns} {_orphanage_requests_from(fields)}", ()
+
+
+def build_orphanage_requests_page_query(status=None, after=None, limit=50, fields=None):
+    """One page of the admin review queue in orphanage_id order, plus a look-ahead row.
+
+    Unless ``fields`` says otherwise only what an admin needs to triage is
+    listed (REVIEW_QUEUE_FIELDS); bank and ID numbers stay on the detail endpoint.
+    """
+    fields = REVIEW_QUEUE_FIELDS if fields is None else fields
+    conditions = []
+    params = []
+    if status is not None:
+        conditions.append("o.status = %s")
+        params.append(status)
+    if after is not None:
+        conditions.append("o.orphanage_id > %s")
+        params.append(after)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    query = f"""
+        SELECT {select_list(ORPHANAGE_REQUEST_FIELDS, fields, always=['orphanage_id'])}
+        {_orphanage_requests_from(fields)}
+        {where}
+        ORDER BY o.orphanage_id
+        LIMIT %s
+    """
+    params.append(limit + 1)
+    return query, tuple(params)
+
+
+def build_orphanage_statuses_query(orphanage_ids):
+    """Current status of ``orphanage_ids``, locking their rows until the transaction ends."""
+    placeholders = ', '.join(['%s'] * len(orphanage_ids))
+    query = f"""
+        SELECT orphanage_id, status, rejection_reason
+        FROM orphanage_verification
+        WHERE orphanage_id IN ({placeholders})
+        FOR UPDATE
+    """
+    return query, tuple(orphanage_ids)
+
+
+def build_orphanage_status_update(decisions):
+    """A single UPDATE applying many (orphanage_id, status, rejection_reason) decisions, one CASE per column."""
+    cases = ' '.join(['WHEN %s THEN %s'] * len(decisions))
+    placeholders = ', '.join(['%s'] * len(decisions))
+    query = f"""
+        UPDATE orphanage_verification
+        SET status = CASE orphanage_id {cases} END,
+            rejection_reason = CASE orphanage_id {cases} END
+        WHERE orphanage_id IN ({placeholders})
+    """
+    params = [value for orphanage_id, status, _ in decisions for value in (orphanage_id, status)]
+    params += [value for orphanage_id, _, reason in decisions for value in (orphanage_id, reason)]
+    params += [orphanage_id for orphanage_id, _, _ in decisions]
+    return query, tuple(params)
+
+
+def build_catalogue_orphanages_queries(orphanage_ids):
+    """(delete, insert, facet rows) statements re-copying the children of ``orphanage_ids``."""
+    placeholders = ', '.join(['%s'] * len(orphanage_ids))
+    delete = f"DELETE FROM public_children WHERE orphanage_id IN ({placeholders})"
+    insert = INSERT_CATALOGUE_QUERY + f"    AND c.orphanage_id IN ({placeholders})\n"
+    facet_rows = CATALOGUE_FACET_ROWS_QUERY + f"    WHERE p.orphanage_id IN ({placeholders})\n"
+    return delete, insert, facet_rows, tuple(orphanage_ids)
+
+
+def build_versions_query(scopes):
+    placeholders = ', '.join(['%s'] * len(scopes))
+    query = f"""
+        SELECT scope, version, UNIX_TIMESTAMP(updated_at) AS updated_at
+        FROM data_versions
+        WHERE scope IN ({placeholders})
+    """
+    return query, tuple(scopes)
+
+
+def versions_from_rows(scopes, rows):
+    """Turn (scope, version, unix_time) rows into ({scope: version}, last_modified)."""
+    versions = {scope: 0 for scope in scopes}
+    last_modified = None
+    for scope, version, updated_at in rows:
+        versions[scope] = version
+        updated_at = datetime.fromtimestamp(int(updated_at), timezone.utc)
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+    return versions, last_modified
+
+
+# Lookups of the busiest routes that read the same in every dialect
+_HOT_QUERIES = [
+    ('children page', *build_children_page_query(after=0)),
+    ('children page by governorate', *build_children_page_query(after=0, governorate='Baghdad')),
+    ('children page by orphanage', *build_children_page_query(after=0, orphanage_id=1)),
+    ('public child', PUBLIC_CHILD_QUERY, (1,)),
+    ('child', CHILD_QUERY, (1,)),
+    ('orphanage children', ORPHANAGE_CHILDREN_QUERY, (1,)),
+    ('child fields', *build_child_query(1, ['name', 'hobbies'])),
+    ('orphanage children fields', *build_orphanage_children_query(1, ['name', 'age'])),
+    ('hobbies of children', *build_hobbies_query([1, 2, 3])),
+    ('submissions', SUBMISSIONS_QUERY, (1,)),
+    ('submissions since', SUBMISSIONS_SINCE_QUERY, (1, '2024-01-01 00:00:00', 101)),
+    ('latest submission', LATEST_SUBMISSION_QUERY, (1,)),
+    ('user by email', USER_BY_EMAIL_QUERY, ('someone@example.com',)),
+    ('admin by email', ADMIN_BY_EMAIL_QUERY, ('someone@example.com',)),
+    ('orphanage account', ORPHANAGE_ACCOUNT_QUERY, (1,)),
+    ('orphanage status', ORPHANAGE_STATUS_QUERY, (1,)),
+    ('orphanage request', ORPHANAGE_REQUEST_QUERY, (1,)),
+    ('orphanage request fields', *build_orphanage_request_query(1, ['status'])),
+    ('review queue page', *build_orphanage_requests_page_query('pending', 1, 50)),
+    ('orphanage statuses', *build_orphanage_statuses_query([1, 2, 3])),
+    ('batch status update', *build_orphanage_status_update([(1, 'approved', None), (2, 'rejected', 'No license')])),
+    ('update orphanage status', UPDATE_ORPHANAGE_STATUS_QUERY, ('approved', None, 1)),
+    ('donations', DONATION_QUERY, (1,)),
+    ('data versions', *build_versions_query(['children', 'orphanage:1:children'])),
+]
+
+
+def hot_queries(dialect):
+    """The statements behind the busiest routes, with sample parameters, for ``flask db check``.
+
+    None of them may read a whole table. Listing everything (the hobby
+    catalogue, the admin's list of requests) is left out on purpose.
+    """
+    return _HOT_QUERIES + [
+        ('search by text', *build_children_search_query(text='curious football', dialect=dialect)),
+        ('search by hobby', *build_children_search_query(hobby_ids=[1, 2], dialect=dialect)),
+        ('search by age', *build_children_search_query(min_age=3, max_age=5, dialect=dialect)),
+        ('search by governorate and text', *build_children_search_query(text='music', governorate='Cairo',
+                                                                        dialect=dialect)),
+    ]
+
+
+class Repository:
+    """The queries of every blueprint, run on one checked-out connection.
+
+    Subclasses run the statements (``_run_fetchall``, ``_run_execute``,
+    ``_run_insert_rows`` and ``explain``); everything else is shared. Writes
+    are not committed until ``commit()`` is called.
+    """
+
+    def __init__(self, conn, query_log=None):
+        self.conn = conn
+        self.query_log = query_log
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def _fetchone(self, query, params=()):
+        rows = self._fetchall(query, params)
+        return rows[0] if rows else None
+
+    # Users
+    def get_user_by_email(self, email):
+        return self._fetchone(USER_BY_EMAIL_QUERY, (email,))
+
+    def get_admin_by_email(self, email):
+        return self._fetchone(ADMIN_BY_EMAIL_QUERY, (email,))
+
+    def add_user(self, name, email, password_hash, role):
+        return self._execute(INSERT_USER_QUERY, (name, email, password_hash, role))[1]
+
+    def update_password(self, user_id, password_hash):
+        self._execute(UPDATE_PASSWORD_QUERY, (password_hash, user_id))
+
+    # Orphanages
+    def add_verification(self, orphanage_id, governorate, address, registration_certificate_number,
+                         operating_license_number, license_expiration_date, manager_national_id,
+                         tax_id, bank_account_details):
+        self._execute(INSERT_VERIFICATION_QUERY, (
+            orphanage_id, governorate, address, registration_certificate_number, operating_license_number,
+            license_expiration_date, manager_national_id, tax_id, bank_account_details))
+
+    def get_orphanage_account(self, orphanage_id):
+        return self._fetchone(ORPHANAGE_ACCOUNT_QUERY, (orphanage_id,))
+
+    def get_orphanage_status(self, orphanage_id):
+        return self._fetchone(ORPHANAGE_STATUS_QUERY, (orphanage_id,))
+
+    def set_orphanage_status(self, orphanage_id, status, rejection_reason):
+        """Returns the number of rows actually changed.
+
+        The orphanage's children enter or leave the public catalogue in the same transaction.
+        """
+        changed = self._execute(UPDATE_ORPHANAGE_STATUS_QUERY, (status, rejection_reason, orphanage_id))[0]
+        if changed:
+            self.refresh_catalogue_orphanage(orphanage_id)
+        return changed
+
+    def set_orphanage_statuses(self, decisions, batch_size=1000):
+        """Apply many (orphanage_id, status, rejection_reason) decisions in the current transaction.
+
+        Decisions that change nothing are skipped and the rest are written
+        with one multi-row UPDATE per ``batch_size``. Returns {orphanage_id:
+        'updated' | 'unchanged' | 'not_found'}. Orphanages entering or
+        leaving 'approved' have their children moved in or out of the catalogue.
+        """
+        results = {}
+        moved = []
+        for start in range(0, len(decisions), batch_size):
+            batch = decisions[start:start + batch_size]
+            current = {row['orphanage_id']: row
+                       for row in self._fetchall(*build_orphanage_statuses_query([d[0] for d in batch]))}
+
+            updates = []
+            for orphanage_id, status, rejection_reason in batch:
+                row = current.get(orphanage_id)
+                if row is None:
+                    results[orphanage_id] = 'not_found'
+                elif (row['status'], row['rejection_reason']) == (status, rejection_reason):
+                    results[orphanage_id] = 'unchanged'
+                else:
+                    results[orphanage_id] = 'updated'
+                    updates.append((orphanage_id, status, rejection_reason))
+                    if row['status'] != status and 'approved' in (row['status'], status):
+                        moved.append(orphanage_id)
+
+            if updates:
+                self._execute(*build_orphanage_status_update(updates))
+
+        for start in range(0, len(moved), batch_size):
+            self.refresh_catalogue_orphanages(moved[start:start + batch_size])
+        return results
+
+    def list_orphanage_requests(self, fields=None):
+        """Every request, or only ``fields`` of each (names from ORPHANAGE_REQUEST_FIELDS)."""
+        if fields is None:
+            return self._fetchall(ORPHANAGE_REQUESTS_QUERY)
+        return self._fetchall(*build_orphanage_requests_query(fields))
+
+    def list_orphanage_requests_page(self, status=None, after=None, limit=50, fields=None):
+        """One page of the review queue plus the look-ahead row."""
+        return self._fetchall(*build_orphanage_requests_page_query(status, after, limit, fields))
+
+    def get_orphanage_request(self, orphanage_id, fields=None):
+        if fields is None:
+            return self._fetchone(ORPHANAGE_REQUEST_QUERY, (orphanage_id,))
+        return self._fetchone(*build_orphanage_request_query(orphanage_id, fields))
+
+    # Donations
+    def add_donation(self, orphanage_id, donation_method, donation_details):
+        self._execute(INSERT_DONATION_QUERY, (orphanage_id, donation_method, donation_details))
+
+    def get_donation(self, orphanage_id):
+        return self._fetchone(DONATION_QUERY, (orphanage_id,))
+
+    # Children
+    def list_public_children(self, **filters):
+        """One page of approved children with their hobbies, plus the look-ahead row (see ``split_page``)."""
+        return [self._with_hobby_names(child) for child in self._fetchall(*build_children_page_query(**filters))]
+
+    def search_children(self, **filters):
+        """One page of ranked search results plus the look-ahead row."""
+        return [self._with_hobby_names(child)
+                for child in self._fetchall(*build_children_search_query(dialect=self.dialect, **filters))]
+
+    def get_public_child(self, child_id):
+        return self._with_hobby_names(self._fetchone(PUBLIC_CHILD_QUERY, (child_id,)))
+
+    def get_child(self, child_id, fields=None):
+        """A child with their hobbies, or only ``fields`` of them (names from CHILD_FIELDS) plus the id."""
+        if fields is None:
+            return self._with_hobby_names(self._fetchone(CHILD_QUERY, (child_id,)))
+        child = self._fetchone(*build_child_query(child_id, fields))
+        return self._with_hobby_names(child) if 'hobbies' in fields else child
+
+    def list_orphanage_children(self, orphanage_id, fields=None):
+        if fields is None:
+            return self.attach_hobbies(self._fetchall(ORPHANAGE_CHILDREN_QUERY, (orphanage_id,)))
+        children = self._fetchall(*build_orphanage_children_query(orphanage_id, fields))
+        return self.attach_hobbies(children) if 'hobbies' in fields else children
+
+    def attach_hobbies(self, children):
+        """Add a 'hobbies' list to every child row with a single batched query."""
+        if not children:
+            return children
+        return merge_hobbies(children, self._fetchall(*build_hobbies_query([child['id'] for child in children])))
+
+    def add_hobbies(self, names):
+        return self._insert_rows(INSERT_HOBBY_QUERY, [(name,) for name in names], ids=True)
+
+    def list_hobbies(self):
+        return self._fetchall(HOBBIES_QUERY)
+
+    def hobby_ids(self):
+        return {row['id'] for row in self._fetchall(HOBBY_IDS_QUERY)}
+
+    def add_child(self, orphanage_id, name, age, image_url, about, hobby_ids=(), image_key=None):
+        child_id = self._execute(INSERT_CHILD_QUERY, (orphanage_id, name, age, image_url, image_key, about))[1]
+        if hobby_ids:
+            self._insert_rows(INSERT_CHILD_HOBBY_QUERY, [(child_id, hobby_id) for hobby_id in hobby_ids])
+        self.refresh_catalogue_children([child_id])
+        return child_id
+
+    def add_children(self, orphanage_id, children):
+        """Insert validated children and their hobby links; returns their IDs in order."""
+        child_ids = self._insert_rows(INSERT_CHILD_QUERY, [
+            (orphanage_id, child['name'], child['age'], child['image_url'], child['image_key'], child['about'])
+            for child in children], ids=True)
+
+        hobby_links = [(child_id, hobby_id)
+                       for child_id, child in zip(child_ids, children) for hobby_id in child['hobbies']]
+        if hobby_links:
+            self._insert_rows(INSERT_CHILD_HOBBY_QUERY, hobby_links)
+        self.refresh_catalogue_children(child_ids)
+        return child_ids
+
+    def set_child_image(self, orphanage_id, child_id, image_key):
+        """Attach an uploaded photo to one of ``orphanage_id``'s children; returns False if it is not theirs."""
+        if not self._execute(SET_CHILD_IMAGE_QUERY, (image_key, child_id, orphanage_id))[0]:
+            return False
+        self.refresh_catalogue_children([child_id])
+        return True
+
+    # Public catalogue (public_children): children of approved orphanages, denormalised for the homepage
+    def refresh_catalogue_children(self, child_ids):
+        """Re-copy ``child_ids`` into the catalogue; call after adding or changing children or their hobbies."""
+        if not child_ids:
+            return
+        delete, insert, facet_rows, params = build_catalogue_children_queries(child_ids)
+        before = facet_counts(self._fetchall(facet_rows, params))
+        self._execute(delete, params)
+        self._execute(insert, params)
+        self._adjust_facets(before, facet_counts(self._fetchall(facet_rows, params)))
+
+    def refresh_catalogue_orphanage(self, orphanage_id):
+        """Re-copy an orphanage's children; only approved orphanages end up with any."""
+        before = facet_counts(self._fetchall(ORPHANAGE_FACET_ROWS_QUERY, (orphanage_id,)))
+        self._execute(DELETE_CATALOGUE_ORPHANAGE_QUERY, (orphanage_id,))
+        self._execute(INSERT_CATALOGUE_ORPHANAGE_QUERY, (orphanage_id,))
+        self._adjust_facets(before, facet_counts(self._fetchall(ORPHANAGE_FACET_ROWS_QUERY, (orphanage_id,))))
+
+    def refresh_catalogue_orphanages(self, orphanage_ids):
+        """``refresh_catalogue_orphanage`` for many orphanages with one statement of each kind."""
+        if not orphanage_ids:
+            return
+        delete, insert, facet_rows, params = build_catalogue_orphanages_queries(orphanage_ids)
+        before = facet_counts(self._fetchall(facet_rows, params))
+        self._execute(delete, params)
+        self._execute(insert, params)
+        self._adjust_facets(before, facet_counts(self._fetchall(facet_rows, params)))
+
+    def rebuild_catalogue(self):
+        """Recompute the whole catalogue and its facet counters from the source tables; returns its row count."""
+        self._execute(CLEAR_CATALOGUE_QUERY)
+        rows = self._execute(INSERT_CATALOGUE_QUERY)[0]
+        self.reconcile_facets()
+        return rows
+
+    # Facet counters (catalogue_facets) behind /children/facets
+    def get_facets(self):
+        return self._fetchall(FACETS_QUERY)
+
+    def reconcile_facets(self):
+        """Recount every facet from the catalogue; returns how many counters had drifted."""
+        stored = self._facet_table()
+        self._execute(CLEAR_FACETS_QUERY)
+        for query in RECOUNT_FACETS_QUERIES:
+            self._execute(query)
+        recounted = self._facet_table()
+        return sum(1 for key in set(stored) | set(recounted) if stored.get(key, 0) != recounted.get(key, 0))
+
+    def _facet_table(self):
+        return {(row['facet'], str(row['value'])): row['children'] for row in self._fetchall(FACETS_QUERY)}
+
+    def _adjust_facets(self, before, after):
+        # Sorted, so concurrent writers lock the counter rows in the same order
+        changes = facet_deltas(before, after)
+        if changes:
+            self._insert_rows(UPSERT_FACET_QUERY, changes)
+
+    # Guest submissions
+    def add_interest(self, child_id, orphanage_id, guest_name, guest_email, interest_type, message):
+        self._execute(INSERT_INTEREST_QUERY, (child_id, orphanage_id, guest_name, guest_email, interest_type, message))
+
+    def add_interests(self, rows):
+        """Insert many (child_id, orphanage_id, guest_name, guest_email, interest_type, message) rows."""
+        self._insert_rows(INSERT_INTEREST_QUERY, rows)
+
+    def add_interests_once(self, rows):
+        """Insert ``add_interests`` rows with a trailing submission_uid, skipping IDs already stored."""
+        self._insert_rows(INSERT_INTEREST_ONCE_QUERY, rows)
+
+    def list_submissions(self, orphanage_id):
+        return self._fetchall(SUBMISSIONS_QUERY, (orphanage_id,))
+
+    def list_submissions_since(self, orphanage_id, created_at=None, limit=100):
+        """Up to ``limit`` submissions created at or after ``created_at`` (None for all), oldest first."""
+        if created_at is None:
+            return self._fetchall(SUBMISSIONS_FIRST_PAGE_QUERY, (orphanage_id, limit))
+        return self._fetchall(SUBMISSIONS_SINCE_QUERY, (orphanage_id, created_at, limit))
+
+    def get_latest_submission(self, orphanage_id):
+        return self._fetchone(LATEST_SUBMISSION_QUERY, (orphanage_id,))
+
+    # Version counters behind ETag / Last-Modified
+    def bump_versions(self, *scopes):
+        """Record a change to ``scopes``; call inside the write's transaction, before commit."""
+        for scope in scopes:
+            self._execute(BUMP_VERSIONS_QUERY, (scope,))
+
+    def get_versions(self, scopes):
+        """Return ({scope: version}, last_modified) for ``scopes`` in one small query."""
+        rows = self._fetchall(*build_versions_query(scopes))
+        return versions_from_rows(scopes, [(row['scope'], row['version'], row['updated_at']) for row in rows])
+
+    def _with_hobby_names(self, child):
+        if child:
+            child['hobbies'] = hobby_names(child['hobbies'])
+        return child
+
+    # Every statement goes through these three, which time it and report it to the query log
+    def _fetchall(self, query, params=()):
+        """Rows of ``query`` as dicts, always read to the end."""
+        start = time.perf_counter()
+        with query_timer:
+            rows = self._run_fetchall(query, params)
+        self._log(query, params, start, len(rows))
+        return rows
+
+    def _execute(self, query, params=()):
+        """Run a statement without a result set; returns (rowcount, lastrowid)."""
+        start = time.perf_counter()
+        with query_timer:
+            rowcount, lastrowid = self._run_execute(query, params)
+        self._log(query, params, start, rowcount)
+        return rowcount, lastrowid
+
+    def _insert_rows(self, query, rows, ids=False):
+        """Run a single-row INSERT for many rows; with ``ids`` returns the new IDs in order."""
+        start = time.perf_counter()
+        with query_timer:
+            new_ids = self._run_insert_rows(query, rows, ids)
+        self._log(query, rows, start, len(rows), many=True)
+        return new_ids
+
+    def _log(self, query, params, start, rowcount, many=False):
+        if self.query_log is not None:
+            self.query_log.record(query, params, time.perf_counter() - start, rowcount, many=many,
+                                  explain=self.explain)
+
+    # Backend interface
+    def explain(self, query, params=()):
+        """The database's plan for ``query`` as a list of dicts."""
+        raise NotImplementedError
+
+    def full_scans(self, plan):
+        """Tables an ``explain()`` plan reads in full instead of through an index."""
+        raise NotImplementedError
+
+    def _run_fetchall(self, query, params):
+        raise NotImplementedError
+
+    def _run_execute(self, query, params):
+        raise NotImplementedError
+
+    def _run_insert_rows(self, query, rows, ids):
+        raise NotImplementedError
+
+
+class PreparedStatementCache:
+    """Prepared cursors of one connection, keyed by SQL text, least recently used evicted first.
+
+    MySQL Connector only reuses a prepared statement when it is handed the
+    very same string object again, so the cache also keeps the first string
+    it saw for each statement. It holds no reference to the connection, so
+    that it can be dropped together with it.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._cursors = OrderedDict()
+
+    def get(self, conn, query):
+        entry = self._cursors.get(query)
+        if entry is not None:
+            self._cursors.move_to_end(query)
+            return entry
+
+        entry = (query, conn.cursor(prepared=True, dictionary=True))
+        self._cursors[query] = entry
+        while len(self._cursors) > self.max_size:
+            _, (_, cursor) = self._cursors.popitem(last=False)
+            # Closing the cursor deallocates its statement on the server
+            cursor.close()
+        return entry
+
+    def close(self):
+        for _, cursor in self._cursors.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._cursors.clear()
+
+
+# Prepared statement caches, one per pooled connection
+_statement_caches = weakref.WeakKeyDictionary()
+_statement_caches_lock = threading.Lock()
+
+
+@on_discard
+def _drop_statements(conn):
+    # The cursors refer to their connection, so the weak key alone would keep both alive
+    with _statement_caches_lock:
+        statements = _statement_caches.pop(conn, None)
+    if statements is not None:
+        statements.close()
+
+
+class MySQLRepository(Repository):
+    """Runs every statement on a prepared cursor cached for the connection.
+
+    Multi-row inserts go through a plain cursor instead: executemany on a
+    plain cursor sends the whole batch as one INSERT, while a prepared
+    cursor would execute it row by row. Only the first ID of such an INSERT
+    is reported, and the others follow from it only when the server hands
+    out consecutive auto-increment values (``innodb_autoinc_lock_mode`` 0
+    or 1); with the interleaved mode 2, MySQL 8's default, inserts whose IDs
+    are needed run row by row in the caller's transaction instead.
+    """
+
+    dialect = 'mysql'
+
+    # A scan the optimizer chose over a usable index is only reported from this many estimated rows
+    full_scan_min_rows = 1000
+
+    # The primary's auto_increment_increment if it assigns a statement's IDs consecutively, else None
+    _id_step = None
+    _id_step_known = False
+
+    def __init__(self, conn, statement_cache_size=128, query_log=None):
+        super().__init__(conn, query_log)
+        with _statement_caches_lock:
+            statements = _statement_caches.get(conn)
+            if statements is None:
+                statements = _statement_caches[conn] = PreparedStatementCache(statement_cache_size)
+        self._statements = statements
+
+    def explain(self, query, params=()):
+        cursor = self.conn.cursor(dictionary=True)
+        try:
+            cursor.execute('EXPLAIN ' + query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def full_scans(self, plan):
+        # type ALL without candidate keys is a missing index; with them the optimizer rejected the index,
+        # which is fine for a tiny table and a regression for a large one
+        return [row['table'] for row in plan if row.get('type') == 'ALL'
+                and (not row.get('possible_keys') or (row.get('rows') or 0) >= self.full_scan_min_rows)]
+
+    def _run_fetchall(self, query, params):
+        query, cursor = self._statements.get(self.conn, query)
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    def _run_execute(self, query, params):
+        query, cursor = self._statements.get(self.conn, query)
+        cursor.execute(query, params)
+        return cursor.rowcount, cursor.lastrowid
+
+    def _run_insert_rows(self, query, rows, ids):
+        step = self._consecutive_id_step() if ids else None
+        if ids and step is None:
+            return [self._run_execute(query, row)[1] for row in rows]
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(query, rows)
+            first_id = cursor.lastrowid
+        finally:
+            cursor.close()
+        return [first_id + offset * step for offset in range(len(rows))] if ids else []
+
+    def _consecutive_id_step(self):
+        cls = type(self)
+        if not cls._id_step_known:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute('SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment')
+                lock_mode, step = cursor.fetchone()
+            finally:
+                cursor.close()
+            cls._id_step = int(step) if int(lock_mode) in (0, 1) else None
+            cls._id_step_known = True
+        return cls._id_step
+
+
+# MySQL-only SQL and its SQLite equivalent; placeholders are translated first
+SQLITE_DIALECT = [
+    ('JSON_ARRAYAGG(', 'json_group_array('),
+    ('UNIX_TIMESTAMP(updated_at)', "CAST(strftime('%s', updated_at) AS INTEGER)"),
+    ('ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP(6)',
+     'ON CONFLICT (scope) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP'),
+    ('ON DUPLICATE KEY UPDATE children = children + VALUES(children)',
+     'ON CONFLICT (facet, value) DO UPDATE SET children = children + excluded.children'),
+    ('ON DUPLICATE KEY UPDATE id = id', 'ON CONFLICT (submission_uid) DO NOTHING'),
+    # A write transaction on SQLite already locks the whole database
+    ('\n        FOR UPDATE', ''),
+]
+
+
+class SQLiteRepository(Repository):
+    """The same queries on a local SQLite file, translated from MySQL's dialect.
+
+    sqlite3 keeps its own per-connection statement cache, so translated SQL
+    is memoised to keep hitting it.
+    """
+
+    dialect = 'sqlite'
+
+    _translated = {}
+
+    def _sql(self, query):
+        translated = self._translated.get(query)
+        if translated is None:
+            translated = query.replace('%s', '?')
+            for mysql_sql, sqlite_sql in SQLITE_DIALECT:
+                translated = translated.replace(mysql_sql, sqlite_sql)
+            self._translated[query] = translated
+        return translated
+
+    def explain(self, query, params=()):
+        cursor = self.conn.execute('EXPLAIN QUERY PLAN ' + self._sql(query), params)
+        try:
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def full_scans(self, plan):
+        # 'SCAN c' reads the table; 'SCAN c USING (COVERING) INDEX ...' walks an index and
+        # 'SCAN t VIRTUAL TABLE INDEX ...' is a lookup in a full-text index
+        return [row['detail'].split()[1] for row in plan
+                if row['detail'].startswith('SCAN ') and 'USING' not in row['detail']
+                and 'VIRTUAL TABLE' not in row['detail'] and not row['detail'].startswith('SCAN CONSTANT')]
+
+    def _run_fetchall(self, query, params):
+        cursor = self.conn.execute(self._sql(query), params)
+        try:
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def _run_execute(self, query, params):
+        cursor = self.conn.execute(self._sql(query), params)
+        try:
+            return cursor.rowcount, cursor.lastrowid
+        finally:
+            cursor.close()
+
+    def _run_insert_rows(self, query, rows, ids):
+        # Row by row, as SQLite does not report IDs for executemany; it is all in-process anyway
+        new_ids = [self._run_execute(query, row)[1] for row in rows]
+        return new_ids if ids else []
+
+
+def get_repo():
+    """Return this request's repository, bound to its pooled connection."""
+    if 'repo' not in g:
+        query_log = current_app.extensions.get('query_log')
+        if current_app.config['DB_BACKEND'] == 'sqlite':
+            g.repo = SQLiteRepository(get_db(), query_log=query_log)
+        else:
+            g.repo = MySQLRepository(get_db(), current_app.config['MYSQL_STATEMENT_CACHE_SIZE'], query_log=query_log)
+    return g.repo
@@ -0,0 +1,117 @@
+"""Versioned schema migrations.
+
+Each version is a pair of SQL files in ``app/migrations``, one per database
+(``0002_hot_query_indexes.mysql.sql`` / ``.sqlite.sql``), applied in order
+and recorded in ``schema_migrations``. Run them with ``flask --app app db
+upgrade``; SQLite databases are upgraded automatically when first opened.
+"""
+import os
+import re
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+
+_FILENAME = re.compile(r'^(\d+)_(\w+)\.(mysql|sqlite)\.sql$')
+
+# MySQL errors meaning the object is already there, e.g. an index created by hand
+_ALREADY_EXISTS = {1060, 1061}  # ER_DUP_FIELDNAME, ER_DUP_KEYNAME
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(20) NOT NULL PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+_PLACEHOLDER = {'mysql': '%s', 'sqlite': '?'}
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def statements(self):
+        with open(self.path, encoding='utf-8') as source:
+            return split_statements(source.read())
+
+
+def split_statements(sql):
+    """Statements of a migration file: ';'-terminated, '--' comment lines dropped.
+
+    A CREATE TRIGGER runs up to its END, past the ';' of the statements in its body.
+    """
+    lines = [line for line in sql.splitlines() if not line.lstrip().startswith('--')]
+    statements = []
+    current = ''
+    for piece in '\n'.join(lines).split(';'):
+        current += piece
+        statement = current.strip()
+        if statement.upper().startswith('CREATE TRIGGER') and not statement.upper().endswith('END'):
+            current += ';'
+            continue
+        if statement:
+            statements.append(statement)
+        current = ''
+    return statements
+
+
+def available(dialect):
+    """Every migration for ``dialect``, oldest first."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _FILENAME.match(filename)
+        if match and match.group(3) == dialect:
+            migrations.append(Migration(match.group(1), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations, key=lambda migration: int(migration.version))
+
+
+def applied(conn):
+    """Versions already recorded in schema_migrations."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(CREATE_MIGRATIONS_TABLE)
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def pending(conn, dialect, target=None):
+    done = applied(conn)
+    return [migration for migration in available(dialect)
+            if migration.version not in done and (target is None or int(migration.version) <= int(target))]
+
+
+def upgrade(conn, dialect, target=None, echo=None):
+    """Apply every pending migration up to ``target``; returns the ones applied.
+
+    Each migration is committed on its own, so a failure leaves the earlier
+    ones recorded. MySQL commits DDL implicitly, so a half-applied MySQL
+    migration has to be finished by hand (or rerun once its cause is fixed).
+    """
+    done = []
+    for migration in pending(conn, dialect, target):
+        if echo:
+            echo(f"Applying {migration.version}_{migration.name}")
+        cursor = conn.cursor()
+        try:
+            for statement in migration.statements():
+                try:
+                    cursor.execute(statement)
+                except Exception as err:
+                    if getattr(err, 'errno', None) not in _ALREADY_EXISTS:
+                        raise
+            cursor.execute(
+                f"INSERT INTO schema_migrations (version, name) VALUES ({_PLACEHOLDER[dialect]}, {_PLACEHOLDER[dialect]})",
+                (migration.version, migration.name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        done.append(migration)
+    return done
@@ -0,0 +1,148 @@
+"""Production serving: preforked gunicorn workers around one preloaded app.
+
+``python serve.py`` builds the app with ``create_app()`` once in the master
+and forks ``SERVER_WORKERS`` workers from it (2 x CPUs + 1 by default), so
+imports and app setup are paid once and shared copy-on-write. Each worker
+replaces the inherited connection pools (the primary's and any read
+replicas') with its own right after the fork, since a socket must never be
+shared between processes.
+
+Signals go to the master:
+
+- HUP starts fresh workers, then lets the old ones finish their in-flight
+  requests (up to ``SERVER_GRACEFUL_TIMEOUT``) before they exit. The app is
+  preloaded, so new workers run the code the master loaded.
+- USR2 followed by QUIT on the old master upgrades to new code without
+  dropping connections.
+
+Workers are recycled after ``SERVER_MAX_REQUESTS`` requests (plus jitter)
+to cap memory growth. Startup times and each worker's resident memory are
+logged, the latter every ``SERVER_RSS_LOG_INTERVAL`` seconds.
+
+Every worker is its own process:
+
+- The 'memory' cache is per worker, and ``invalidate`` reaches only the
+  worker that wrote; use ``CACHE_BACKEND = 'redis'`` with more than one
+  worker (a warning is logged otherwise).
+- /metrics reports the worker that answered, labelled ``worker="<pid>"``.
+- The slow-query log is appended to by all workers and no longer rotated by
+  size; rotate it with logrotate.
+
+Needs the gunicorn package (Unix only).
+"""
+import os
+import resource
+import sys
+import threading
+import time
+
+from app import create_app, db, replicas
+from app.query_log import get_query_log
+
+
+def default_workers():
+    """2 x CPUs + 1, counting only the CPUs this process may run on."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        cpus = os.cpu_count() or 1
+    return cpus * 2 + 1
+
+
+def rss_bytes():
+    """Resident memory of this process, or its peak where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _megabytes(size):
+    return size / (1024 * 1024)
+
+
+def _report_rss(worker, interval):
+    while worker.alive:
+        time.sleep(interval)
+        worker.log.info("Worker %s: RSS %.1f MB after %s requests", worker.pid, _megabytes(rss_bytes()), worker.nr)
+
+
+def gunicorn_options(app, started, loaded):
+    """gunicorn settings from the app's SERVER_* config, with the hooks that log startup and memory."""
+    config = app.config
+
+    def when_ready(server):
+        server.log.info("App loaded in %.2fs, master ready in %.2fs with %s workers (RSS %.1f MB)",
+                        loaded - started, time.monotonic() - started, server.num_workers, _megabytes(rss_bytes()))
+        if server.num_workers > 1 and config['CACHE_BACKEND'] == 'memory':
+            server.log.warning("CACHE_BACKEND is 'memory' with %s workers: each worker caches on its own and "
+                               "invalidations do not reach the others. Set CACHE_BACKEND = 'redis'.",
+                               server.num_workers)
+
+    def post_fork(server, worker):
+        # Connections must not be shared across processes: every worker opens its own
+        app.extensions['db_pool'] = db.create_pool(app)
+        if 'replicas' in app.extensions:
+            app.extensions['replicas'].reopen(lambda name: replicas.create_replica_pool(app, name))
+        # Tell the workers' metrics apart, and stop them all rotating the same slow-query log
+        app.extensions['metrics'].labels['worker'] = str(os.getpid())
+        query_log = get_query_log(app)
+        if query_log is not None:
+            query_log.share_file()
+        worker.forked_at = time.monotonic()
+
+    def post_worker_init(worker):
+        worker.log.info("Worker %s booted in %.3fs (RSS %.1f MB)",
+                        worker.pid, time.monotonic() - worker.forked_at, _megabytes(rss_bytes()))
+        interval = config['SERVER_RSS_LOG_INTERVAL']
+        if interval:
+            threading.Thread(target=_report_rss, args=(worker, interval), name='rss-report', daemon=True).start()
+
+    def worker_exit(server, worker):
+        server.log.info("Worker %s exiting after %s requests (RSS %.1f MB)",
+                        worker.pid, worker.nr, _megabytes(rss_bytes()))
+
+    return {
+        'bind': config['SERVER_BIND'],
+        'workers': config['SERVER_WORKERS'] or default_workers(),
+        # Threads let a worker keep serving while others sit in /submissions/stream
+        'worker_class': 'gthread',
+        'threads': config['SERVER_THREADS'],
+        'preload_app': True,
+        'max_requests': config['SERVER_MAX_REQUESTS'],
+        'max_requests_jitter': config['SERVER_MAX_REQUESTS_JITTER'],
+        'graceful_timeout': config['SERVER_GRACEFUL_TIMEOUT'],
+        'timeout': config['SERVER_TIMEOUT'],
+        'keepalive': config['SERVER_KEEPALIVE'],
+        'when_ready': when_ready,
+        'post_fork': post_fork,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+    }
+
+
+def serve(config=None, **options):
+    """Build the app once and serve it from preforked workers; ``options`` override gunicorn settings."""
+    try:
+        from gunicorn.app.base import BaseApplication  # type: ignore
+    except ImportError:
+        raise RuntimeError("Serving with workers requires the 'gunicorn' package to be installed")
+
+    started = time.monotonic()
+    app = create_app(config)
+    loaded = time.monotonic()
+
+    settings = gunicorn_options(app, started, loaded)
+    settings.update(options)
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for name, value in settings.items():
+                self.cfg.set(name, value)
+
+        def load(self):
+            return app
+
+    Server().run()
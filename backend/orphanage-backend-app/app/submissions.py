@@ -0,0 +1,216 @@
+"""Incremental submissions feed for orphanage dashboards.
+
+``/submissions?since=<cursor>`` returns only the submissions the holder
+of the cursor has not had yet, and ``/submissions/stream`` pushes them as
+server-sent events. A stream wakes as soon as ``express_interest`` commits
+in the same process and otherwise re-checks every ``SSE_POLL_INTERVAL``
+seconds, which also picks up submissions taken by other processes.
+
+Submissions are read in (created_at, id) order, but one can commit after
+another with a higher key was already handed out. So every read goes back
+``SUBMISSIONS_OVERLAP_SECONDS`` behind the cursor, and the cursor carries
+the ids it already handed out in that window; a submission that takes
+longer than that to commit can still be missed.
+"""
+import base64
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app  # type: ignore
+
+from app.repository import get_repo
+
+
+# 'created_at|id', then optionally '|id@seconds.id@seconds...' for the ids handed out that long before it
+_CURSOR = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\|(\d+)(?:\|(\d+@\d+(?:\.\d+@\d+)*))?$')
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+INTEREST_TYPES = ('adoption', 'sponsorship')
+
+
+def validate_interest(data):
+    """Check an /express-interest body before it is queued; returns (row, errors).
+
+    The row is (child_id, orphanage_id, guest_name, guest_email, interest_type, message).
+    """
+    if not isinstance(data, dict):
+        return None, ["Expected a JSON object"]
+
+    errors = []
+    for name in ('orphanage_id', 'child_id'):
+        value = data.get(name)
+        if (value is not None or name == 'orphanage_id') and (not isinstance(value, int) or isinstance(value, bool)):
+            errors.append(f"'{name}' must be an integer")
+    for name in ('guest_name', 'guest_email'):
+        if not isinstance(data.get(name), str) or not data[name].strip():
+            errors.append(f"'{name}' is required")
+    if data.get('interest_type') not in INTEREST_TYPES:
+        errors.append("'interest_type' must be 'adoption' or 'sponsorship'")
+    message = data.get('message', '')
+    if not isinstance(message, str):
+        errors.append("'message' must be a string")
+
+    if errors:
+        return None, errors
+    return (data.get('child_id'), data['orphanage_id'], data['guest_name'].strip(), data['guest_email'].strip(),
+            data['interest_type'], message), []
+
+
+def _timestamp(created_at):
+    if hasattr(created_at, 'strftime'):
+        return created_at.strftime(_TIME_FORMAT)
+    return str(created_at)[:19]
+
+
+def _seconds_before(timestamp, seconds):
+    return (datetime.strptime(timestamp, _TIME_FORMAT) - timedelta(seconds=seconds)).strftime(_TIME_FORMAT)
+
+
+def advance(cursor, row, overlap):
+    """The cursor after also handing out ``row``, a submission with id and created_at.
+
+    A cursor is (created_at, id, seen): the highest key handed out so far, and
+    {id: created_at} of what was handed out within ``overlap`` seconds of it.
+    """
+    key = (_timestamp(row['created_at']), row['id'])
+    position = key if cursor is None else max(cursor[:2], key)
+    seen = dict(cursor[2]) if cursor is not None else {}
+    seen[row['id']] = key[0]
+    window_start = _seconds_before(position[0], overlap)
+    seen = {id_: created_at for id_, created_at in seen.items() if created_at >= window_start}
+    return position[0], position[1], seen
+
+
+def read_submissions(repo, orphanage_id, cursor, limit, overlap):
+    """Up to ``limit`` submissions the holder of ``cursor`` has not had yet, oldest first; returns (rows, has_more).
+
+    Reads back ``overlap`` seconds behind the cursor, for submissions that
+    committed after ones with a higher key were handed out.
+    """
+    if cursor is None:
+        rows = repo.list_submissions_since(orphanage_id, None, limit + 1)
+    else:
+        created_at, _, seen = cursor
+        # Every id in 'seen' is inside the window, so this still leaves one look-ahead row
+        rows = repo.list_submissions_since(orphanage_id, _seconds_before(created_at, overlap), limit + len(seen) + 1)
+        rows = [row for row in rows if row['id'] not in seen]
+    return rows[:limit], len(rows) > limit
+
+
+def latest_cursor(repo, orphanage_id, overlap, limit):
+    """A cursor past every submission taken so far, or None if there are none."""
+    latest = repo.get_latest_submission(orphanage_id)
+    if latest is None:
+        return None
+    # Count the window before it as handed out too, so nothing already there is sent again
+    latest_key = (_timestamp(latest['created_at']), latest['id'])
+    cursor = None
+    for row in repo.list_submissions_since(orphanage_id, _seconds_before(latest_key[0], overlap), limit):
+        if (_timestamp(row['created_at']), row['id']) <= latest_key:
+            cursor = advance(cursor, row, overlap)
+    return cursor or advance(None, latest, overlap)
+
+
+def encode_cursor(cursor):
+    """Opaque string for a cursor from ``advance``; '' for None (from the beginning)."""
+    if cursor is None:
+        return ''
+    created_at, submission_id, seen = cursor
+    position = datetime.strptime(created_at, _TIME_FORMAT)
+    raw = f"{created_at}|{submission_id}"
+    if seen:
+        raw += '|' + '.'.join(f"{id_}@{int((position - datetime.strptime(seen_at, _TIME_FORMAT)).total_seconds())}"
+                              for id_, seen_at in sorted(seen.items()))
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the cursor behind an ``encode_cursor`` string; '' means from the beginning."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("'since' is not a valid cursor")
+    match = _CURSOR.match(raw)
+    if not match:
+        raise ValueError("'since' is not a valid cursor")
+    created_at = match.group(1)
+    seen = {}
+    if match.group(3):
+        for item in match.group(3).split('.'):
+            id_, seconds = item.split('@')
+            seen[int(id_)] = _seconds_before(created_at, int(seconds))
+    return created_at, int(match.group(2)), seen
+
+
+class SubmissionNotifier:
+    """Per-orphanage change counters that streams can wait on."""
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._versions = {}
+
+    def publish(self, orphanage_id):
+        with self._changed:
+            self._versions[orphanage_id] = self._versions.get(orphanage_id, 0) + 1
+            self._changed.notify_all()
+
+    def version(self, orphanage_id):
+        with self._changed:
+            return self._versions.get(orphanage_id, 0)
+
+    def wait(self, orphanage_id, seen, timeout):
+        """Block until ``orphanage_id`` changes past version ``seen`` or ``timeout`` passes; returns its version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._versions.get(orphanage_id, 0) != seen, timeout)
+            return self._versions.get(orphanage_id, 0)
+
+
+def get_notifier(app=None):
+    app = app or current_app
+    return app.extensions['submission_notifier']
+
+
+def event_stream(app, orphanage_id, since):
+    """Server-sent events for ``orphanage_id``'s submissions after ``since`` (a cursor or None for 'from now').
+
+    Every query runs in its own app context, so the stream only holds a
+    pooled connection while it is actually reading.
+    """
+    notifier = get_notifier(app)
+    page_size = app.config['SUBMISSIONS_PAGE_SIZE']
+    overlap = app.config['SUBMISSIONS_OVERLAP_SECONDS']
+    deadline = time.monotonic() + app.config['SSE_MAX_SECONDS']
+    seen = notifier.version(orphanage_id)
+
+    with app.app_context():
+        if since is None:
+            since = latest_cursor(get_repo(), orphanage_id, overlap, app.config['SUBMISSIONS_MAX_PAGE_SIZE'])
+
+    # Browsers reconnect after this many milliseconds, sending the last event id back
+    yield f"retry: {int(app.config['SSE_RETRY_MS'])}\n\n"
+
+    while time.monotonic() < deadline:
+        with app.app_context():
+            rows, has_more = read_submissions(get_repo(), orphanage_id, since, page_size, overlap)
+            events = []
+            for row in rows:
+                since = advance(since, row, overlap)
+                events.append(f"id: {encode_cursor(since)}\nevent: submission\ndata: {app.json.dumps(row)}\n\n")
+        if events:
+            yield ''.join(events)
+        if has_more:
+            continue
+
+        version = notifier.wait(orphanage_id, seen, app.config['SSE_POLL_INTERVAL'])
+        if version == seen and not events:
+            # Keeps proxies from closing an idle connection
+            yield ": keepalive\n\n"
+        seen = version
+
+
+def init_app(app):
+    app.extensions['submission_notifier'] = SubmissionNotifier()
@@ -0,0 +1,4 @@
+from app.asgi import create_asgi_app
+
+# Async serving mode, e.g. `uvicorn asgi:app --workers 4`; run.py keeps the sync server
+app = create_asgi_app()
@@ -0,0 +1,4 @@
+"""Load tests: seed a synthetic dataset, drive mixed traffic, record per-endpoint baselines.
+
+See ``python -m benchmarks --help``.
+"""
@@ -0,0 +1,116 @@
+"""Command line for the benchmark suite.
+
+    python -m benchmarks seed --sqlite bench.sqlite3 --orphanages 200
+    python -m benchmarks run --sqlite bench.sqlite3 --duration 30 --output baseline.json
+    python -m benchmarks run --url http://localhost:8000 --concurrency 32 --output after.json
+    python -m benchmarks compare baseline.json after.json
+
+Without --sqlite the app's configured database (Config) is used.
+"""
+import argparse
+import sys
+
+from app import create_app
+from benchmarks import dataset, report, traffic
+
+
+def _app(args, pool_size=None):
+    config = {}
+    if args.sqlite:
+        config.update(DB_BACKEND='sqlite', SQLITE_PATH=args.sqlite)
+    if pool_size:
+        config['MYSQL_POOL_SIZE'] = pool_size
+    return create_app(config)
+
+
+def seed_command(args):
+    scale = dataset.Scale(orphanages=args.orphanages, children_per_orphanage=args.children_per_orphanage,
+                          hobbies=args.hobbies, max_hobbies_per_child=args.max_hobbies_per_child,
+                          submissions_per_orphanage=args.submissions_per_orphanage,
+                          approved_ratio=args.approved_ratio, seed=args.seed)
+    created = dataset.seed(_app(args), scale)
+    print(', '.join(f"{count} {table}" for table, count in created.items()))
+
+
+def run_command(args):
+    if args.url:
+        def make_client():
+            return traffic.HttpClient(args.url)
+    else:
+        app = _app(args, pool_size=max(args.concurrency, 10))
+
+        def make_client():
+            return traffic.InProcessClient(app)
+
+    setup_client = make_client()
+    world = traffic.World.discover(setup_client, dashboards=args.dashboards)
+    world.log_in_dashboards(setup_client)
+
+    recorders, seconds = traffic.drive(make_client, world, concurrency=args.concurrency,
+                                       duration=args.duration, warmup=args.warmup, seed=args.seed)
+
+    result = report.build_report(recorders, seconds, {
+        'target': args.url or 'in-process',
+        'database': args.sqlite or 'config',
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'warmup': args.warmup,
+        'seed': args.seed,
+        'children_sampled': len(world.child_ids),
+        'orphanages': len(world.orphanage_ids),
+    })
+    report.write_report(result, args.output)
+    print(report.format_table(result))
+    print(f"Baseline written to {args.output}")
+
+
+def compare_command(args):
+    rows, regressions = report.compare(report.load_report(args.baseline), report.load_report(args.current),
+                                       tolerance=args.tolerance)
+    print(report.format_comparison(rows, regressions))
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help="Generate a synthetic dataset")
+    seed.add_argument('--sqlite', metavar='PATH', help="Seed a SQLite file instead of the configured MySQL")
+    seed.add_argument('--orphanages', type=int, default=100)
+    seed.add_argument('--children-per-orphanage', type=int, default=40)
+    seed.add_argument('--hobbies', type=int, default=16)
+    seed.add_argument('--max-hobbies-per-child', type=int, default=3)
+    seed.add_argument('--submissions-per-orphanage', type=int, default=25)
+    seed.add_argument('--approved-ratio', type=float, default=0.8)
+    seed.add_argument('--seed', type=int, default=42)
+    seed.set_defaults(handler=seed_command)
+
+    run = commands.add_parser('run', help="Drive mixed traffic and write a baseline file")
+    target = run.add_mutually_exclusive_group()
+    target.add_argument('--sqlite', metavar='PATH', help="Run create_app() in-process on a seeded SQLite file")
+    target.add_argument('--url', help="Send requests to a running server instead")
+    run.add_argument('--concurrency', type=int, default=8)
+    run.add_argument('--duration', type=float, default=30, help="Measured seconds")
+    run.add_argument('--warmup', type=float, default=5, help="Unmeasured seconds before that")
+    run.add_argument('--dashboards', type=int, default=20, help="Orphanage sessions polling their dashboards")
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--output', default='baseline.json')
+    run.set_defaults(handler=run_command, sqlite=None)
+
+    compare = commands.add_parser('compare', help="Compare two baseline files")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--tolerance', type=float, default=0.10, help="Allowed relative change (0.10 = 10%%)")
+    compare.set_defaults(handler=compare_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
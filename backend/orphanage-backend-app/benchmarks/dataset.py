@@ -0,0 +1,114 @@
+"""Synthetic dataset for the benchmarks, written through the app's repository."""
+import random
+
+from app.passwords import get_hasher
+from app.repository import get_repo
+
+
+# Every seeded account (orphanages and the admin) logs in with this password
+PASSWORD = 'benchmark'
+
+ADMIN_EMAIL = 'admin@benchmark.local'
+
+GOVERNORATES = ['Cairo', 'Giza', 'Alexandria', 'Dakahlia', 'Sharqia', 'Qalyubia', 'Gharbia', 'Monufia',
+                'Beheira', 'Faiyum', 'Minya', 'Asyut', 'Sohag', 'Qena', 'Luxor', 'Aswan']
+
+HOBBIES = ['Football', 'Drawing', 'Reading', 'Swimming', 'Chess', 'Music', 'Dancing', 'Coding', 'Cooking',
+           'Basketball', 'Singing', 'Writing', 'Gardening', 'Photography', 'Theatre', 'Volleyball']
+
+FIRST_NAMES = ['Omar', 'Mariam', 'Youssef', 'Salma', 'Ahmed', 'Nour', 'Ali', 'Farida', 'Hassan', 'Laila',
+               'Karim', 'Hana', 'Mostafa', 'Jana', 'Ziad', 'Malak', 'Adam', 'Habiba', 'Seif', 'Rana']
+
+WORDS = ['loves', 'enjoys', 'playing', 'with', 'friends', 'school', 'bright', 'curious', 'kind', 'quiet',
+         'cheerful', 'helpful', 'drawing', 'stories', 'music', 'football', 'science', 'animals', 'garden']
+
+
+class Scale:
+    """How much data to generate; the defaults give a few thousand children."""
+
+    def __init__(self, orphanages=100, children_per_orphanage=40, hobbies=16, max_hobbies_per_child=3,
+                 submissions_per_orphanage=25, approved_ratio=0.8, seed=42):
+        self.orphanages = orphanages
+        self.children_per_orphanage = children_per_orphanage
+        self.hobbies = hobbies
+        self.max_hobbies_per_child = max_hobbies_per_child
+        self.submissions_per_orphanage = submissions_per_orphanage
+        self.approved_ratio = approved_ratio
+        self.seed = seed
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def _about(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))).capitalize() + '.'
+
+
+def seed(app, scale, batch_size=1000):
+    """Fill the app's database with ``scale`` worth of rows and return a summary of what was created.
+
+    Run against an empty database; e-mail addresses are fixed, so seeding
+    twice fails on the unique index.
+    """
+    rng = random.Random(scale.seed)
+
+    with app.app_context():
+        repo = get_repo()
+        password_hash = get_hasher().hash(PASSWORD)
+
+        repo.add_user('Benchmark Admin', ADMIN_EMAIL, password_hash, 'admin')
+
+        # Past the built-in names, hobbies repeat with a number ('Chess 2')
+        hobby_ids = repo.add_hobbies([HOBBIES[i % len(HOBBIES)] + (f" {i // len(HOBBIES)}" if i >= len(HOBBIES) else '')
+                                      for i in range(scale.hobbies)])
+        repo.commit()
+
+        orphanage_ids = []
+        children = 0
+        submissions = 0
+        for number in range(scale.orphanages):
+            orphanage_id = repo.add_user(f"Orphanage {number}", orphanage_email(number), password_hash, 'orphanage')
+            orphanage_ids.append(orphanage_id)
+
+            repo.add_verification(orphanage_id, rng.choice(GOVERNORATES), f"{number} Benchmark Street",
+                                  f"REG-{number}", f"LIC-{number}", '2030-12-31', f"NID-{number}",
+                                  f"TAX-{number}", f"IBAN-{number:010d}")
+            status = 'approved' if rng.random() < scale.approved_ratio else rng.choice(['pending', 'rejected'])
+            if status != 'pending':
+                repo.set_orphanage_status(orphanage_id, status, 'Incomplete documents' if status == 'rejected' else None)
+
+            rows = [{
+                'name': rng.choice(FIRST_NAMES),
+                'age': rng.randint(0, 17),
+                'image_url': f"https://images.example.org/children/{number}/{i}.jpg",
+                'image_key': None,
+                'about': _about(rng),
+                'hobbies': rng.sample(hobby_ids, rng.randint(0, min(scale.max_hobbies_per_child, len(hobby_ids)))),
+            } for i in range(scale.children_per_orphanage)]
+            child_ids = []
+            for start in range(0, len(rows), batch_size):
+                child_ids.extend(repo.add_children(orphanage_id, rows[start:start + batch_size]))
+            children += len(child_ids)
+
+            interests = [(rng.choice(child_ids) if child_ids and rng.random() < 0.7 else None, orphanage_id,
+                          f"Guest {i}", f"guest{i}@example.org", rng.choice(['adoption', 'sponsorship']),
+                          _about(rng)) for i in range(scale.submissions_per_orphanage)]
+            if interests:
+                repo.add_interests(interests)
+            submissions += len(interests)
+
+            repo.commit()
+
+        repo.bump_versions('children', 'orphanages', 'hobbies')
+        repo.commit()
+
+    return {
+        'orphanages': len(orphanage_ids),
+        'children': children,
+        'hobbies': len(hobby_ids),
+        'submissions': submissions,
+    }
+
+
+def orphanage_email(number):
+    return f"orphanage{number}@benchmark.local"
@@ -0,0 +1,107 @@
+"""Baseline files: per-endpoint throughput and latency percentiles, and comparisons between them."""
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies, errors, seconds):
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'rps': round(len(values) / seconds, 2) if seconds else 0.0,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def build_report(recorders, seconds, meta):
+    latencies = {}
+    errors = {}
+    for recorder in recorders:
+        for label, values in recorder.latencies.items():
+            latencies.setdefault(label, []).extend(values)
+        for label, count in recorder.errors.items():
+            errors[label] = errors.get(label, 0) + count
+
+    every = [value for values in latencies.values() for value in values]
+    return {
+        'meta': {**meta, **_environment(), 'measured_seconds': round(seconds, 3)},
+        'endpoints': {label: summarize(values, errors.get(label, 0), seconds)
+                      for label, values in sorted(latencies.items())},
+        'total': summarize(every, sum(errors.values()), seconds),
+    }
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+
+def write_report(report, path):
+    with open(path, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+        output.write('\n')
+
+
+def load_report(path):
+    with open(path) as source:
+        return json.load(source)
+
+
+def compare(baseline, current, tolerance=0.10):
+    """Rows of (endpoint, metric, before, after, change) and the ones that regressed beyond ``tolerance``.
+
+    Latency percentiles regress when they grow, throughput when it shrinks.
+    """
+    rows = []
+    regressions = []
+    for label in sorted(set(baseline['endpoints']) & set(current['endpoints'])):
+        before, after = baseline['endpoints'][label], current['endpoints'][label]
+        for metric, higher_is_worse in (('rps', False), ('p50_ms', True), ('p95_ms', True), ('p99_ms', True)):
+            old, new = before[metric], after[metric]
+            change = (new - old) / old if old else 0.0
+            row = (label, metric, old, new, change)
+            rows.append(row)
+            if (change > tolerance) if higher_is_worse else (change < -tolerance):
+                regressions.append(row)
+    return rows, regressions
+
+
+def format_table(report):
+    lines = [f"{'endpoint':<32} {'reqs':>7} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for label, stats in list(report['endpoints'].items()) + [('TOTAL', report['total'])]:
+        lines.append(f"{label:<32} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>9.1f} "
+                     f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+    return '\n'.join(lines)
+
+
+def format_comparison(rows, regressions):
+    flagged = set(regressions)
+    lines = [f"{'endpoint':<32} {'metric':<7} {'before':>10} {'after':>10} {'change':>8}"]
+    for row in rows:
+        label, metric, old, new, change = row
+        lines.append(f"{label:<32} {metric:<7} {old:>10.2f} {new:>10.2f} {change:>+8.1%}"
+                     + ('  REGRESSION' if row in flagged else ''))
+    return '\n'.join(lines)
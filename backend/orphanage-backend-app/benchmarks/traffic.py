@@ -0,0 +1,269 @@
+"""Mixed traffic against the API, either in-process or over HTTP."""
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.dataset import ADMIN_EMAIL, GOVERNORATES, HOBBIES, PASSWORD, WORDS, orphanage_email
+
+
+class InProcessClient:
+    """Calls the Flask app directly through its test client (no sockets)."""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, headers=None, body=None):
+        response = self._client.open(path, method=method, headers=headers or {}, json=body)
+        return response.status_code, response.get_data()
+
+
+class HttpClient:
+    """Keep-alive HTTP/1.1 connection to a running server; one per thread."""
+
+    def __init__(self, base_url, timeout=30):
+        url = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self._connection = connection_class(url.netloc, timeout=timeout)
+
+    def request(self, method, path, headers=None, body=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        try:
+            self._connection.request(method, path, body=data, headers=headers)
+            response = self._connection.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            # Drop the broken connection; the next request reconnects
+            self._connection.close()
+            raise
+
+
+class World:
+    """IDs and tokens the traffic needs, discovered through the API itself."""
+
+    def __init__(self, child_ids, orphanages, admin_token, dashboard_count):
+        self.child_ids = child_ids
+        self.orphanage_ids = [orphanage['orphanage_id'] for orphanage in orphanages]
+        self.approved_ids = [orphanage['orphanage_id'] for orphanage in orphanages
+                             if orphanage['status'] == 'approved']
+        self.admin_token = admin_token
+        self.dashboard_count = dashboard_count
+        self.dashboards = []
+
+    @classmethod
+    def discover(cls, client, dashboards=20, max_child_pages=20):
+        status, body = client.request('POST', '/admin/login', body={'email': ADMIN_EMAIL, 'password': PASSWORD})
+        if status != 200:
+            raise RuntimeError(f"Admin login failed ({status}); seed the database first")
+        admin_token = json.loads(body)['token']
+
+        status, body = client.request('GET', '/orphanages-requests', headers={'Authorization': admin_token})
+        orphanages = json.loads(body)
+
+        # Walk the first pages of the public listing for child IDs to look up
+        child_ids = []
+        after = None
+        for _ in range(max_child_pages):
+            query = {'limit': 100, **({'after': after} if after else {})}
+            status, body = client.request('GET', '/children?' + urlencode(query))
+            page = json.loads(body)
+            child_ids.extend(child['id'] for child in page['children'])
+            after = page['next_cursor']
+            if after is None:
+                break
+
+        return cls(child_ids, orphanages, admin_token, min(dashboards, len(orphanages)))
+
+    def log_in_dashboards(self, client):
+        """Log in the orphanage accounts whose dashboards the traffic polls."""
+        for number in range(self.dashboard_count):
+            status, body = client.request('POST', '/login',
+                                          body={'email': orphanage_email(number), 'password': PASSWORD})
+            if status == 200:
+                self.dashboards.append(json.loads(body)['token'])
+
+
+class Recorder:
+    """Latencies and error counts per endpoint for one worker thread."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def call(self, client, label, method, path, headers=None, body=None):
+        start = time.perf_counter()
+        try:
+            status, data = client.request(method, path, headers=headers, body=body)
+        except Exception:
+            status, data = 599, b''
+        elapsed = time.perf_counter() - start
+
+        self.latencies.setdefault(label, []).append(elapsed)
+        if status >= 400:
+            self.errors[label] = self.errors.get(label, 0) + 1
+        return status, data
+
+
+class Traffic:
+    """The request mix: weighted scenarios, each one or more requests."""
+
+    def __init__(self, world, rng, burst_size=10):
+        self.world = world
+        self.rng = rng
+        self.burst_size = burst_size
+        # Each polling dashboard's /submissions?since= cursor
+        self.submission_cursors = {}
+        self.scenarios = [
+            (45, self.browse_children),
+            (15, self.child_detail),
+            (8, self.search_children),
+            (5, self.hobbies),
+            (10, self.dashboard_children),
+            (10, self.dashboard_submissions),
+            (4, self.admin_review),
+            (10, self.interest_burst),
+            (1, self.login),
+        ]
+        self._weights = [weight for weight, _ in self.scenarios]
+
+    def run_one(self, client, recorder):
+        scenario = self.rng.choices(self.scenarios, weights=self._weights)[0][1]
+        scenario(client, recorder)
+
+    def browse_children(self, client, recorder):
+        query = {'limit': 20}
+        roll = self.rng.random()
+        if roll < 0.2:
+            query['governorate'] = self.rng.choice(GOVERNORATES)
+        elif roll < 0.4:
+            query['min_age'] = self.rng.randint(0, 10)
+            query['max_age'] = query['min_age'] + self.rng.randint(2, 7)
+
+        # Most visitors look at the first page, some keep scrolling
+        for _ in range(self.rng.choice([1, 1, 1, 2, 3, 5])):
+            status, data = recorder.call(client, 'GET /children', 'GET', '/children?' + urlencode(query))
+            if status != 200:
+                return
+            next_cursor = json.loads(data)['next_cursor']
+            if next_cursor is None:
+                return
+            query['after'] = next_cursor
+
+    def search_children(self, client, recorder):
+        query = {'limit': 20, 'q': ' '.join(self.rng.sample(WORDS, self.rng.randint(1, 2)))}
+        roll = self.rng.random()
+        if roll < 0.3:
+            # Hobby IDs of a freshly seeded database start at 1
+            query['hobbies'] = ','.join(str(self.rng.randint(1, len(HOBBIES))) for _ in range(self.rng.randint(1, 2)))
+        elif roll < 0.5:
+            query['governorate'] = self.rng.choice(GOVERNORATES)
+        recorder.call(client, 'GET /children/search', 'GET', '/children/search?' + urlencode(query))
+
+    def child_detail(self, client, recorder):
+        if self.world.child_ids:
+            child_id = self.rng.choice(self.world.child_ids)
+            recorder.call(client, 'GET /children/<id>', 'GET', f'/children/{child_id}')
+
+    def hobbies(self, client, recorder):
+        recorder.call(client, 'GET /hobbies', 'GET', '/hobbies')
+
+    def dashboard_children(self, client, recorder):
+        if self.world.dashboards:
+            headers = {'Authorization': self.rng.choice(self.world.dashboards)}
+            recorder.call(client, 'GET /get-children', 'GET', '/get-children', headers=headers)
+
+    def dashboard_submissions(self, client, recorder):
+        if not self.world.dashboards:
+            return
+        token = self.rng.choice(self.world.dashboards)
+        headers = {'Authorization': token}
+
+        # Some dashboards still load the whole history, the rest poll for what is new
+        if self.rng.random() < 0.3:
+            recorder.call(client, 'GET /submissions', 'GET', '/submissions', headers=headers)
+            return
+
+        while True:
+            query = urlencode({'since': self.submission_cursors.get(token, '')})
+            status, data = recorder.call(client, 'GET /submissions?since', 'GET', '/submissions?' + query,
+                                         headers=headers)
+            if status != 200:
+                return
+            page = json.loads(data)
+            self.submission_cursors[token] = page['next_cursor']
+            if not page['has_more']:
+                return
+
+    def admin_review(self, client, recorder):
+        headers = {'Authorization': self.world.admin_token}
+        # Admins work through the pending queue a page at a time
+        recorder.call(client, 'GET /orphanages-requests?status', 'GET', '/orphanages-requests?status=pending&limit=50',
+                      headers=headers)
+        if not self.world.orphanage_ids:
+            return
+
+        orphanage_id = self.rng.choice(self.world.orphanage_ids)
+        recorder.call(client, 'GET /orphanages-requests/<id>', 'GET', f'/orphanages-requests/{orphanage_id}',
+                      headers=headers)
+
+        # Occasionally decide on it; approved orphanages stay approved so the catalogue keeps its size
+        if self.rng.random() < 0.3:
+            status = 'approved' if orphanage_id in self.world.approved_ids or self.rng.random() < 0.5 else 'rejected'
+            recorder.call(client, 'POST /orphanage/verify', 'POST', '/orphanage/verify', headers=headers, body={
+                'orphanage_id': orphanage_id, 'status': status,
+                'rejection_reason': 'Benchmark review' if status == 'rejected' else None,
+            })
+
+    def interest_burst(self, client, recorder):
+        if not self.world.approved_ids:
+            return
+        orphanage_id = self.rng.choice(self.world.approved_ids)
+        for number in range(self.rng.randint(1, self.burst_size)):
+            recorder.call(client, 'POST /express-interest', 'POST', '/express-interest', body={
+                'orphanage_id': orphanage_id,
+                'child_id': self.rng.choice(self.world.child_ids) if self.world.child_ids else None,
+                'guest_name': f"Visitor {number}",
+                'guest_email': f"visitor{number}@example.org",
+                'interest_type': self.rng.choice(['adoption', 'sponsorship']),
+                'message': 'We would like to know more.',
+            })
+
+    def login(self, client, recorder):
+        number = self.rng.randrange(max(len(self.world.orphanage_ids), 1))
+        recorder.call(client, 'POST /login', 'POST', '/login',
+                      body={'email': orphanage_email(number), 'password': PASSWORD})
+
+
+def drive(make_client, world, concurrency=8, duration=30, warmup=5, seed=1):
+    """Run the traffic mix from ``concurrency`` threads; returns (recorders, measured seconds).
+
+    Requests issued during the first ``warmup`` seconds are not recorded.
+    """
+    start = time.monotonic()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+    recorders = [Recorder() for _ in range(concurrency)]
+
+    def worker(number):
+        client = make_client()
+        traffic = Traffic(world, random.Random(seed + number))
+        warm = Recorder()
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            traffic.run_one(client, recorders[number] if now >= measure_from else warm)
+
+    threads = [threading.Thread(target=worker, args=(number,), daemon=True) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return recorders, time.monotonic() - max(measure_from, start)
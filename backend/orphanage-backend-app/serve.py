@@ -0,0 +1,15 @@
+import argparse
+
+from app.server import serve
+
+# Production server: gunicorn workers forked from one preloaded app; run.py keeps the debug server
+# and asgi.py the async mode. Reload gracefully with `kill -HUP <master pid>`.
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the API from preforked workers.")
+    parser.add_argument('--bind', help="Address to listen on, e.g. 0.0.0.0:8000 (default: SERVER_BIND).")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: SERVER_WORKERS or 2 x CPUs + 1).")
+    parser.add_argument('--sqlite', metavar='PATH', help="Use a local SQLite database instead of MySQL.")
+    args = parser.parse_args()
+
+    config = {'DB_BACKEND': 'sqlite', 'SQLITE_PATH': args.sqlite} if args.sqlite else None
+    serve(config, **{name: value for name, value in (('bind', args.bind), ('workers', args.workers)) if value})
@@ -0,0 +1,77 @@
+"""An app on a fresh SQLite database per test, and accounts to sign in with."""
+import sqlite3
+
+import pytest
+
+from app import create_app
+from app.passwords import get_hasher
+from app.repository import get_repo
+
+
+PASSWORD = 'correct horse battery'
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'DB_BACKEND': 'sqlite',
+        'SQLITE_PATH': str(tmp_path / 'orphanage.sqlite3'),
+        'SECRET_KEY': 'test-secret-key-long-enough-for-hs256',
+        'MEDIA_ROOT': str(tmp_path / 'media'),
+        'SLOW_QUERY_LOG_PATH': str(tmp_path / 'slow_queries.log'),
+        'INTEREST_QUEUE_PATH': str(tmp_path / 'interest_queue.sqlite3'),
+        'FACETS_RECONCILE_INTERVAL': 0,
+        # Cheap hashes; the work factor is not what these tests are about
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    })
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+    """A connection of its own to the test database, for arranging rows and checking what was written."""
+    conn = sqlite3.connect(app.config['SQLITE_PATH'], isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def add_account(app):
+    def add_account(email, role='orphanage', status=None):
+        """A new user; orphanages get a verification request in ``status`` if given. Returns its id."""
+        with app.app_context():
+            repo = get_repo()
+            user_id = repo.add_user(email.split('@')[0], email, get_hasher().hash(PASSWORD), role)
+            if status:
+                repo.add_verification(user_id, 'Cairo', '1 Test Street', 'REG-1', 'LIC-1', '2030-12-31', 'NID-1',
+                                      'TAX-1', 'IBAN-1')
+                if status != 'pending':
+                    repo.set_orphanage_status(user_id, status, 'Incomplete' if status == 'rejected' else None)
+            repo.commit()
+        return user_id
+    return add_account
+
+
+@pytest.fixture
+def login(client):
+    def login(email, path='/login'):
+        """Authorization headers for ``email``."""
+        response = client.post(path, json={'email': email, 'password': PASSWORD})
+        assert response.status_code == 200, response.get_json()
+        return {'Authorization': response.get_json()['token']}
+    return login
+
+
+@pytest.fixture
+def hobby_ids(app):
+    with app.app_context():
+        repo = get_repo()
+        ids = repo.add_hobbies(['Drawing', 'Football'])
+        repo.commit()
+    return ids
@@ -0,0 +1,118 @@
+"""Batch verification of orphanages and the /children/facets counters it keeps up to date."""
+import pytest
+
+from app.facets import FacetReconciler
+
+
+@pytest.fixture
+def admin_headers(add_account, login):
+    add_account('admin@example.org', role='admin')
+    return login('admin@example.org', path='/admin/login')
+
+
+@pytest.fixture
+def pending(add_account, client, login, hobby_ids):
+    """Two pending orphanages with two children each; returns their ids."""
+    ids = []
+    for number, age in ((1, 4), (2, 11)):
+        orphanage_id = add_account(f'home{number}@example.org', status='pending')
+        headers = login(f'home{number}@example.org')
+        client.post('/children/bulk', json=[{'name': f'Child {number}a', 'age': age, 'hobbies': [hobby_ids[0]]},
+                                            {'name': f'Child {number}b', 'age': age, 'hobbies': hobby_ids}],
+                    headers=headers)
+        ids.append(orphanage_id)
+    return ids
+
+
+def statuses(db):
+    return {row['orphanage_id']: (row['status'], row['rejection_reason'])
+            for row in db.execute('SELECT orphanage_id, status, rejection_reason FROM orphanage_verification')}
+
+
+def facet_counts(client):
+    facets = client.get('/children/facets').get_json()
+    return {(facet, item.get('value', item.get('id'))): item['count'] for facet, items in facets.items()
+            for item in items}
+
+
+def test_batch_applies_every_decision(client, db, admin_headers, pending):
+    first, second = pending
+
+    response = client.post('/orphanage/verify/batch', headers=admin_headers, json={'decisions': [
+        {'orphanage_id': first, 'status': 'approved'},
+        {'orphanage_id': second, 'status': 'rejected', 'rejection_reason': 'Expired license'},
+        {'orphanage_id': 999, 'status': 'approved'},
+    ]})
+
+    assert response.status_code == 200
+    assert response.get_json()['results'] == [
+        {'orphanage_id': first, 'result': 'updated'},
+        {'orphanage_id': second, 'result': 'updated'},
+        {'orphanage_id': 999, 'result': 'not_found'},
+    ]
+    assert statuses(db) == {first: ('approved', None), second: ('rejected', 'Expired license')}
+    # Only the approved orphanage's children are public
+    assert [child['name'] for child in client.get('/children').get_json()['children']] == ['Child 1a', 'Child 1b']
+
+
+def test_repeated_decision_is_unchanged(client, admin_headers, pending):
+    decisions = {'decisions': [{'orphanage_id': pending[0], 'status': 'approved'}]}
+    client.post('/orphanage/verify/batch', headers=admin_headers, json=decisions)
+
+    response = client.post('/orphanage/verify/batch', headers=admin_headers, json=decisions)
+
+    assert response.get_json()['results'] == [{'orphanage_id': pending[0], 'result': 'unchanged'}]
+
+
+def test_invalid_batch_changes_nothing(client, db, admin_headers, pending):
+    first, second = pending
+
+    response = client.post('/orphanage/verify/batch', headers=admin_headers, json={'decisions': [
+        {'orphanage_id': first, 'status': 'approved'},
+        {'orphanage_id': second, 'status': 'rejected'},
+        {'orphanage_id': first, 'status': 'rejected', 'rejection_reason': 'Changed my mind'},
+    ]})
+
+    assert response.status_code == 400
+    assert [result['index'] for result in response.get_json()['results']] == [1, 2]
+    assert statuses(db) == {first: ('pending', None), second: ('pending', None)}
+
+
+def test_batch_verify_needs_an_admin(client, login, pending):
+    response = client.post('/orphanage/verify/batch', headers=login('home1@example.org'),
+                           json={'decisions': [{'orphanage_id': pending[0], 'status': 'approved'}]})
+
+    assert response.status_code == 403
+
+
+def test_facets_follow_approvals(client, admin_headers, pending, hobby_ids):
+    _, second = pending
+    assert facet_counts(client) == {}
+
+    client.post('/orphanage/verify/batch', headers=admin_headers,
+                json={'decisions': [{'orphanage_id': orphanage_id, 'status': 'approved'} for orphanage_id in pending]})
+
+    assert facet_counts(client) == {
+        ('governorate', 'Cairo'): 4, ('age', '3-5'): 2, ('age', '10-12'): 2,
+        ('hobby', hobby_ids[0]): 4, ('hobby', hobby_ids[1]): 2,
+    }
+
+    client.post('/orphanage/verify', headers=admin_headers,
+                json={'orphanage_id': second, 'status': 'rejected', 'rejection_reason': 'Expired license'})
+
+    assert facet_counts(client) == {
+        ('governorate', 'Cairo'): 2, ('age', '3-5'): 2, ('hobby', hobby_ids[0]): 2, ('hobby', hobby_ids[1]): 1,
+    }
+
+
+def test_reconcile_corrects_drifted_counters(app, client, db, admin_headers, pending):
+    client.post('/orphanage/verify', headers=admin_headers, json={'orphanage_id': pending[0], 'status': 'approved'})
+    expected = facet_counts(client)
+    # Edited behind the application's back
+    db.execute("UPDATE catalogue_facets SET children = 40 WHERE facet = 'governorate'")
+    db.execute("INSERT INTO catalogue_facets (facet, value, children) VALUES ('age', '18+', 3)")
+
+    drifted = FacetReconciler(app, interval=0).reconcile()
+
+    assert drifted == 2
+    assert facet_counts(client) == expected
@@ -0,0 +1,72 @@
+"""Registration, login and the verified-token cache."""
+import time
+
+import jwt
+
+from app import auth_middleware
+from app.auth_middleware import TokenCache
+
+
+def test_register_then_login(client):
+    body = {'name': 'Home', 'email': 'home@example.org', 'password': 'correct horse battery'}
+
+    registered = client.post('/register', json=body)
+    logged_in = client.post('/login', json=body)
+    wrong = client.post('/login', json={**body, 'password': 'wrong'})
+
+    assert registered.status_code == 201
+    assert logged_in.status_code == 200
+    assert wrong.status_code == 401
+
+
+def test_duplicate_email_is_a_conflict(client):
+    body = {'name': 'Home', 'email': 'home@example.org', 'password': 'correct horse battery'}
+    client.post('/register', json=body)
+
+    response = client.post('/register', json=body)
+
+    assert response.status_code == 409
+    assert response.get_json() == {"error": "An account with this email already exists"}
+
+
+def test_token_cache_drops_entries_at_the_tokens_expiry(monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(auth_middleware.time, 'time', lambda: now)
+    cache = TokenCache(max_age=300)
+    cache.set('token', {'orphanage_id': 1, 'exp': now + 60})
+
+    assert cache.get('token') == {'orphanage_id': 1, 'exp': now + 60}
+    now += 60
+    assert cache.get('token') is None
+
+
+def test_token_cache_keeps_entries_at_most_max_age(monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(auth_middleware.time, 'time', lambda: now)
+    cache = TokenCache(max_age=300)
+    cache.set('token', {'orphanage_id': 1, 'exp': now + 3600})
+
+    now += 299
+    assert cache.get('token') is not None
+    now += 1
+    assert cache.get('token') is None
+
+
+def test_token_cache_is_bounded():
+    cache = TokenCache(max_entries=2)
+    for token in ('a', 'b', 'c'):
+        cache.set(token, {'orphanage_id': token})
+
+    assert cache.get('a') is None
+    assert cache.get('c') == {'orphanage_id': 'c'}
+
+
+def test_expired_token_is_refused(app, client, add_account):
+    orphanage_id = add_account('home@example.org', status='approved')
+    token = jwt.encode({'orphanage_id': orphanage_id, 'exp': int(time.time()) - 1}, app.config['SECRET_KEY'],
+                       algorithm='HS256')
+
+    response = client.get('/orphanage-status', headers={'Authorization': token})
+
+    assert response.status_code == 401
+    assert response.get_json() == {"error": "Token has expired!"}
@@ -0,0 +1,82 @@
+"""/children/bulk: every row is validated first, and the whole upload is one transaction."""
+import io
+
+import pytest
+
+from app.repository import SQLiteRepository
+
+
+@pytest.fixture
+def orphanage(add_account, login):
+    orphanage_id = add_account('home@example.org', status='approved')
+    return orphanage_id, login('home@example.org')
+
+
+def children_of(db, orphanage_id):
+    return [row['name'] for row in db.execute('SELECT name FROM children WHERE orphanage_id = ? ORDER BY id',
+                                              (orphanage_id,))]
+
+
+def test_rows_are_added_with_their_hobbies(app, client, db, orphanage, hobby_ids):
+    orphanage_id, headers = orphanage
+    app.config['BULK_INSERT_BATCH_SIZE'] = 2
+    rows = [{'name': f'Child {n}', 'age': n, 'hobbies': [hobby_ids[n % 2]]} for n in range(5)]
+
+    response = client.post('/children/bulk', json=rows, headers=headers)
+
+    assert response.status_code == 201
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['created'] * 5
+    assert children_of(db, orphanage_id) == [f'Child {n}' for n in range(5)]
+    links = {(row['child_id'], row['hobby_id']) for row in db.execute('SELECT * FROM child_hobbies')}
+    assert links == {(result['id'], hobby_ids[n % 2]) for n, result in enumerate(results)}
+
+
+def test_csv_upload(client, db, orphanage, hobby_ids):
+    orphanage_id, headers = orphanage
+    csv = f"name,age,hobbies\nSara,7,{hobby_ids[0]};{hobby_ids[1]}\nOmar,9,\n"
+
+    response = client.post('/children/bulk', data={'file': (io.BytesIO(csv.encode()), 'children.csv')},
+                           headers=headers)
+
+    assert response.status_code == 201
+    assert children_of(db, orphanage_id) == ['Sara', 'Omar']
+
+
+def test_one_invalid_row_adds_nothing(client, db, orphanage, hobby_ids):
+    orphanage_id, headers = orphanage
+    rows = [{'name': 'Sara', 'age': 7}, {'name': '', 'age': 'old'}, {'name': 'Omar', 'age': 9, 'hobbies': [999]}]
+
+    response = client.post('/children/bulk', json=rows, headers=headers)
+
+    assert response.status_code == 400
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['valid', 'invalid', 'invalid']
+    assert results[2]['errors'] == ['Unknown hobby IDs: [999]']
+    assert children_of(db, orphanage_id) == []
+
+
+def test_failure_after_some_batches_rolls_back_all_of_them(app, client, db, orphanage, monkeypatch):
+    orphanage_id, headers = orphanage
+    app.config['BULK_INSERT_BATCH_SIZE'] = 2
+
+    def fail(self, *scopes):
+        raise RuntimeError('database went away')
+    # Runs after every batch has been inserted, just before the commit
+    monkeypatch.setattr(SQLiteRepository, 'bump_versions', fail)
+
+    response = client.post('/children/bulk', json=[{'name': f'Child {n}', 'age': n} for n in range(5)],
+                           headers=headers)
+
+    assert response.status_code == 500
+    assert children_of(db, orphanage_id) == []
+    assert db.execute('SELECT COUNT(*) FROM public_children').fetchone()[0] == 0
+
+
+def test_too_many_rows(app, client, orphanage):
+    _, headers = orphanage
+    app.config['BULK_MAX_ROWS'] = 2
+
+    response = client.post('/children/bulk', json=[{'name': 'A', 'age': 1}] * 3, headers=headers)
+
+    assert response.status_code == 413
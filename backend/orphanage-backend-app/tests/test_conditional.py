@@ -0,0 +1,87 @@
+"""ETag / Last-Modified revalidation of the read endpoints, and ?fields= projections."""
+import pytest
+
+
+@pytest.fixture
+def orphanage(add_account, login):
+    orphanage_id = add_account('home@example.org', status='approved')
+    return orphanage_id, login('home@example.org')
+
+
+@pytest.fixture
+def child_id(client, db, orphanage, hobby_ids):
+    _, headers = orphanage
+    response = client.post('/add-child', json={'name': 'Sara', 'age': 7, 'about': 'Likes drawing',
+                                               'hobbies': [hobby_ids[0]]}, headers=headers)
+    assert response.status_code == 201
+    return db.execute('SELECT id FROM children').fetchone()[0]
+
+
+def test_unchanged_listing_is_not_modified(client, child_id):
+    first = client.get('/children')
+    again = client.get('/children', headers={'If-None-Match': first.headers['ETag']})
+
+    assert first.status_code == 200
+    assert first.headers['ETag'].startswith('W/')
+    assert 'no-cache' in first.headers['Cache-Control']
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+
+
+def test_if_modified_since(client, child_id):
+    first = client.get('/children')
+    again = client.get('/children', headers={'If-Modified-Since': first.headers['Last-Modified']})
+
+    assert again.status_code == 304
+
+
+def test_compressed_and_not_modified_share_the_validator(app, client, child_id):
+    app.config['COMPRESS_MIN_SIZE'] = 0
+    first = client.get('/children', headers={'Accept-Encoding': 'gzip'})
+    again = client.get('/children', headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in first.headers['Vary']
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+
+
+def test_a_write_changes_the_etag(client, orphanage, child_id):
+    _, headers = orphanage
+    first = client.get('/children')
+
+    client.post('/add-child', json={'name': 'Omar', 'age': 9}, headers=headers)
+    after = client.get('/children', headers={'If-None-Match': first.headers['ETag']})
+
+    assert after.status_code == 200
+    assert after.headers['ETag'] != first.headers['ETag']
+    assert [child['name'] for child in after.get_json()['children']] == ['Sara', 'Omar']
+
+
+def test_etag_depends_on_the_query_string(client, child_id):
+    first = client.get('/children')
+    other = client.get('/children?limit=1', headers={'If-None-Match': first.headers['ETag']})
+
+    assert other.status_code == 200
+
+
+def test_fields_limits_the_child(client, child_id):
+    response = client.get(f'/child/{child_id}?fields=name,hobbies')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'id': child_id, 'name': 'Sara', 'hobbies': ['Drawing']}
+
+
+def test_fields_limits_the_orphanage_children(client, orphanage, child_id):
+    _, headers = orphanage
+
+    response = client.get('/get-children?fields=age', headers=headers)
+
+    assert response.get_json() == [{'id': child_id, 'age': 7}]
+
+
+def test_unknown_field_is_rejected(client, child_id):
+    response = client.get(f'/child/{child_id}?fields=name,password')
+
+    assert response.status_code == 400
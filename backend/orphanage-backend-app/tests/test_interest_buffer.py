@@ -0,0 +1,86 @@
+"""The buffered /express-interest queue: replay after a crash, and dead letters for rejected rows."""
+import pytest
+
+from app.interest_buffer import make_writer
+from app.repository import get_repo
+
+
+@pytest.fixture
+def orphanage_id(add_account):
+    return add_account('home@example.org', status='approved')
+
+
+def submission(orphanage_id, guest='Guest'):
+    return [None, orphanage_id, guest, 'guest@example.org', 'adoption', 'Hello']
+
+
+def stored(db):
+    return [(row['guest_name'], row['submission_uid'])
+            for row in db.execute('SELECT guest_name, submission_uid FROM adoption_sponsorship_requests ORDER BY id')]
+
+
+def test_entries_left_by_a_previous_process_are_replayed(app, db, orphanage_id):
+    # Queued, then the process died before its writer got to them
+    make_writer(app).queue.append('uid-1', submission(orphanage_id, 'First'))
+    make_writer(app).queue.append('uid-2', submission(orphanage_id, 'Second'))
+
+    writer = make_writer(app)
+    flushed = writer.drain()
+
+    assert flushed == 2
+    assert stored(db) == [('First', 'uid-1'), ('Second', 'uid-2')]
+    assert writer.stats()['depth'] == 0
+
+
+def test_entry_committed_before_a_crash_is_not_inserted_twice(app, db, orphanage_id):
+    writer = make_writer(app)
+    writer.queue.append('uid-1', submission(orphanage_id))
+    # Its batch was committed, but the process died before taking it off the queue
+    with app.app_context():
+        repo = get_repo()
+        repo.add_interests_once([(*submission(orphanage_id), 'uid-1')])
+        repo.commit()
+
+    make_writer(app).drain()
+
+    assert stored(db) == [('Guest', 'uid-1')]
+
+
+def test_rejected_row_is_dead_lettered_and_the_rest_written(app, db, orphanage_id):
+    writer = make_writer(app)
+    writer.queue.append('uid-1', submission(orphanage_id, 'Before'))
+    writer.queue.append('uid-2', submission(orphanage_id + 100, 'Unknown orphanage'))
+    writer.queue.append('uid-3', submission(orphanage_id, 'After'))
+
+    writer.drain()
+
+    assert stored(db) == [('Before', 'uid-1'), ('After', 'uid-3')]
+    stats = writer.stats()
+    assert (stats['depth'], stats['dead_letters'], stats['dead_letters_added']) == (0, 1, 1)
+
+
+def test_buffered_submission_is_acknowledged_and_flushed(app, client, db, orphanage_id):
+    app.config['INTEREST_BUFFER_ENABLED'] = True
+    app.extensions['interest_writer'] = writer = make_writer(app)
+    # Flushed below rather than by the background thread
+    writer.start = lambda: None
+
+    response = client.post('/express-interest', json={'orphanage_id': orphanage_id, 'guest_name': 'Guest',
+                                                      'guest_email': 'guest@example.org',
+                                                      'interest_type': 'sponsorship'})
+    queued = stored(db)
+    writer.drain()
+
+    assert response.status_code == 202
+    assert queued == []
+    assert stored(db) == [('Guest', response.get_json()['submission_id'])]
+
+
+def test_invalid_buffered_submission_is_refused(app, client):
+    app.config['INTEREST_BUFFER_ENABLED'] = True
+    app.extensions['interest_writer'] = make_writer(app)
+
+    response = client.post('/express-interest', json={'orphanage_id': 'one', 'interest_type': 'fostering'})
+
+    assert response.status_code == 400
+    assert len(response.get_json()['errors']) == 4
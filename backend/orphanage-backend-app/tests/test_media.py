@@ -0,0 +1,74 @@
+"""Photo uploads and their renditions."""
+import io
+import time
+
+import pytest
+from PIL import Image  # type: ignore
+
+from app.media import get_media
+
+
+@pytest.fixture
+def headers(add_account, login):
+    add_account('home@example.org', status='approved')
+    return login('home@example.org')
+
+
+def jpeg(width, height):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), 'orange').save(output, 'JPEG')
+    return output.getvalue()
+
+
+def wait_for_renders(pipeline):
+    deadline = time.monotonic() + 10
+    while pipeline.stats()['pending_renders'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def upload(client, headers, data):
+    response = client.post('/images', data={'file': (io.BytesIO(data), 'photo.jpg')}, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+
+def test_upload_is_resized_into_every_rendition(app, client, headers):
+    uploaded = upload(client, headers, jpeg(2000, 1000))
+    wait_for_renders(get_media(app))
+
+    thumb = client.get(uploaded['urls']['thumb'])
+
+    assert thumb.status_code == 200
+    assert 'immutable' in thumb.headers['Cache-Control']
+    assert Image.open(io.BytesIO(thumb.data)).size == (240, 120)
+    assert get_media(app).stats()['renditions_rendered'] == 3
+
+
+def test_same_photo_is_stored_once(app, client, headers):
+    first = upload(client, headers, jpeg(50, 50))
+    second = upload(client, headers, jpeg(50, 50))
+
+    assert first['image_key'] == second['image_key']
+    assert get_media(app).stats()['duplicate_uploads'] == 1
+
+
+def test_failed_rendition_serves_the_original_without_rendering_again(app, client, headers):
+    pipeline = get_media(app)
+    # Passes the signature check, but Pillow cannot decode it
+    uploaded = upload(client, headers, b'\xff\xd8\xff' + b'\x00' * 64)
+    wait_for_renders(pipeline)
+
+    responses = [client.get(uploaded['urls']['thumb']) for _ in range(3)]
+    wait_for_renders(pipeline)
+
+    assert [response.status_code for response in responses] == [200] * 3
+    assert responses[0].data == b'\xff\xd8\xff' + b'\x00' * 64
+    assert 'immutable' not in responses[0].headers['Cache-Control']
+    stats = pipeline.stats()
+    assert (stats['render_failures'], stats['failed_renditions']) == (1, 3)
+
+
+def test_unknown_image(client):
+    response = client.get('/media/' + 'a' * 64 + '/original')
+
+    assert response.status_code == 404
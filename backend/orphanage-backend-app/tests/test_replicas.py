@@ -0,0 +1,129 @@
+"""Read replica rotation: read-your-writes pinning, lag checks, eviction and rejoining."""
+import time
+
+import pytest
+from flask import Flask, Response  # type: ignore
+from mysql.connector import errors  # type: ignore
+
+from app import replicas as replicas_module
+from app.replicas import Replica, ReplicaSet
+
+
+class StubCursor:
+    def __init__(self, lag):
+        self.lag = lag
+
+    def execute(self, query):
+        pass
+
+    def fetchone(self):
+        return {'Seconds_Behind_Source': self.lag}
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self, dictionary=False):
+        if self.pool.lag is errors.InterfaceError:
+            raise errors.InterfaceError("Lost connection")
+        return StubCursor(self.pool.lag)
+
+
+class StubPool:
+    """What the lag checks need of a replica's pool; ``lag`` is what the replica reports."""
+
+    error_class = errors.Error
+
+    def __init__(self, lag=0):
+        self.lag = lag
+        self.opened = 0
+
+    def open_connection(self):
+        if self.lag is errors.PoolError:
+            raise errors.PoolError("Pool exhausted")
+        self.opened += 1
+        return StubConnection(self)
+
+    def close_connection(self, conn):
+        pass
+
+
+@pytest.fixture
+def replica_set():
+    return ReplicaSet(Flask(__name__), [Replica('r1:3306', StubPool()), Replica('r2:3306', StubPool())],
+                      max_lag=5, check_interval=5, rejoin_seconds=30, pin_seconds=5)
+
+
+def names(replicas):
+    return [replica.name if replica else None for replica in replicas]
+
+
+def test_reads_rotate_and_writes_go_to_the_primary(replica_set):
+    reads = [replica_set.replica_for('GET', {}) for _ in range(4)]
+
+    assert names(reads) == ['r1:3306', 'r2:3306', 'r1:3306', 'r2:3306']
+    assert replica_set.replica_for('POST', {}) is None
+
+
+def test_writer_is_pinned_to_the_primary(replica_set):
+    response = replica_set.pin(Response())
+    cookie = response.headers['Set-Cookie']
+    until = cookie.split(';')[0].split('=')[1]
+
+    assert 'HttpOnly' in cookie
+    assert replica_set.replica_for('GET', {'read_primary_until': until}) is None
+    assert replica_set.stats()['pinned_reads'] == 1
+
+
+@pytest.mark.parametrize('until', ['', 'soon', str(time.time() - 1), str(time.time() + 3600)])
+def test_stale_or_forged_pins_are_ignored(replica_set, until):
+    assert not replica_set.is_pinned({'read_primary_until': until})
+
+
+def test_lagging_replica_leaves_the_rotation_until_it_catches_up(replica_set):
+    lagging = replica_set.replicas[1]
+    lagging.pool.lag = 60
+
+    assert replica_set.check() == 1
+    assert names(replica_set.replica_for('GET', {}) for _ in range(2)) == ['r1:3306', 'r1:3306']
+
+    lagging.pool.lag = 1
+    assert replica_set.check() == 2
+
+
+def test_not_replicating_or_unreachable_replicas_are_evicted(replica_set):
+    replica_set.replicas[0].pool.lag = None
+    replica_set.replicas[1].pool.lag = errors.InterfaceError
+
+    assert replica_set.check() == 0
+    assert replica_set.choose() is None
+    assert replica_set.stats()['evictions'] == 2
+
+
+def test_busy_pool_is_not_a_failed_check(replica_set):
+    replica_set.replicas[0].pool.lag = errors.PoolError
+
+    assert replica_set.check() == 2
+
+
+def test_lag_checks_reuse_their_connection(replica_set):
+    replica_set.check()
+    replica_set.check()
+
+    assert [replica.pool.opened for replica in replica_set.replicas] == [1, 1]
+
+
+def test_without_lag_checks_an_evicted_replica_rejoins(replica_set, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(replicas_module.time, 'monotonic', lambda: now)
+    replica_set.check_interval = 0
+    replica_set.evict(replica_set.replicas[0], "connection failed")
+
+    now += 29
+    assert names([replica_set.choose(), replica_set.choose()]) == ['r2:3306', 'r2:3306']
+    now += 1
+    assert {replica_set.choose().name for _ in range(2)} == {'r1:3306', 'r2:3306'}
@@ -0,0 +1,95 @@
+"""MySQLRepository's multi-row inserts and full-scan check, on a stand-in connection that records what it is sent."""
+import pytest
+
+from app.repository import INSERT_CHILD_HOBBY_QUERY, INSERT_CHILD_QUERY, MySQLRepository
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        if query.startswith('SELECT @@'):
+            self.row = (self.conn.lock_mode, 1)
+            return
+        self.conn.statements.append((query, params))
+        if query == INSERT_CHILD_QUERY:
+            # Another session's insert takes every other value, as innodb_autoinc_lock_mode=2 allows
+            self.lastrowid = self.conn.next_id
+            self.conn.next_id += 2
+        self.rowcount = 1
+
+    def executemany(self, query, rows):
+        self.conn.statements.append((query, list(rows)))
+        self.lastrowid = self.conn.next_id
+        self.conn.next_id += len(rows)
+        self.rowcount = len(rows)
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, lock_mode):
+        self.lock_mode = lock_mode
+        self.next_id = 10
+        self.statements = []
+
+    def cursor(self, **options):
+        return FakeCursor(self)
+
+
+@pytest.fixture(autouse=True)
+def forget_lock_mode():
+    MySQLRepository._id_step_known = False
+    yield
+    MySQLRepository._id_step_known = False
+
+
+CHILDREN = [
+    {'name': 'Sara', 'age': 7, 'image_url': '', 'image_key': None, 'about': '', 'hobbies': [1]},
+    {'name': 'Omar', 'age': 9, 'image_url': '', 'image_key': None, 'about': '', 'hobbies': [2, 3]},
+]
+
+
+def test_children_inserted_one_by_one_when_ids_may_interleave():
+    conn = FakeConnection(lock_mode=2)
+
+    child_ids = MySQLRepository(conn).add_children(5, CHILDREN)
+
+    assert child_ids == [10, 12]
+    assert [params for query, params in conn.statements if query == INSERT_CHILD_QUERY] == [
+        (5, 'Sara', 7, '', None, ''), (5, 'Omar', 9, '', None, '')]
+    # The hobby links are still one batch, on the IDs the inserts reported
+    assert [params for query, params in conn.statements if query == INSERT_CHILD_HOBBY_QUERY] == [
+        [(10, 1), (12, 2), (12, 3)]]
+
+
+def test_children_batched_when_ids_are_consecutive():
+    conn = FakeConnection(lock_mode=1)
+
+    child_ids = MySQLRepository(conn).add_children(5, CHILDREN)
+
+    assert child_ids == [10, 11]
+    assert [params for query, params in conn.statements if query == INSERT_CHILD_QUERY] == [[
+        (5, 'Sara', 7, '', None, ''), (5, 'Omar', 9, '', None, '')]]
+
+
+def test_full_scans_report_a_rejected_index_on_a_large_table():
+    repo = MySQLRepository(FakeConnection(lock_mode=1))
+    plan = [
+        {'table': 'users', 'type': 'ALL', 'possible_keys': None, 'rows': 3},
+        {'table': 'data_versions', 'type': 'ALL', 'possible_keys': 'PRIMARY', 'rows': 12},
+        {'table': 'children', 'type': 'ALL', 'possible_keys': 'idx_children_orphanage', 'rows': 250000},
+        {'table': 'child_hobbies', 'type': 'ref', 'possible_keys': 'PRIMARY', 'rows': 4},
+    ]
+
+    assert repo.full_scans(plan) == ['users', 'children']
@@ -0,0 +1,88 @@
+"""/submissions?since= cursors, including submissions that commit after later ones were handed out."""
+import pytest
+
+from app.submissions import advance, decode_cursor, encode_cursor
+
+
+INSERT_SUBMISSION = """
+    INSERT INTO adoption_sponsorship_requests (id, orphanage_id, guest_name, guest_email, interest_type, created_at)
+    VALUES (?, ?, ?, 'guest@example.org', 'adoption', ?)
+"""
+
+
+@pytest.fixture
+def orphanage(add_account, login):
+    orphanage_id = add_account('home@example.org', status='approved')
+    return orphanage_id, login('home@example.org')
+
+
+def poll(client, headers, since, limit=100):
+    response = client.get('/submissions', query_string={'since': since, 'limit': limit}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    page = response.get_json()
+    return [submission['id'] for submission in page['submissions']], page['next_cursor'], page['has_more']
+
+
+def test_cursor_round_trip():
+    cursor = advance(None, {'id': 4, 'created_at': '2024-05-01 10:00:03'}, 10)
+    cursor = advance(cursor, {'id': 7, 'created_at': '2024-05-01 10:00:05'}, 10)
+
+    assert cursor == ('2024-05-01 10:00:05', 7, {4: '2024-05-01 10:00:03', 7: '2024-05-01 10:00:05'})
+    assert decode_cursor(encode_cursor(cursor)) == cursor
+    assert decode_cursor('') is None
+
+
+def test_cursor_forgets_ids_outside_the_overlap():
+    cursor = advance(None, {'id': 1, 'created_at': '2024-05-01 10:00:00'}, 10)
+    cursor = advance(cursor, {'id': 2, 'created_at': '2024-05-01 10:01:00'}, 10)
+
+    assert cursor[2] == {2: '2024-05-01 10:01:00'}
+
+
+def test_invalid_cursor_is_rejected(client, orphanage):
+    _, headers = orphanage
+
+    response = client.get('/submissions?since=bm90IGEgY3Vyc29y', headers=headers)
+
+    assert response.status_code == 400
+
+
+def test_pages_follow_on(client, db, orphanage):
+    orphanage_id, headers = orphanage
+    for id_ in range(1, 6):
+        db.execute(INSERT_SUBMISSION, (id_, orphanage_id, f'Guest {id_}', f'2024-05-01 10:00:0{id_}'))
+
+    first, cursor, has_more = poll(client, headers, '', limit=3)
+    second, cursor, has_more_after = poll(client, headers, cursor, limit=3)
+    third, _, _ = poll(client, headers, cursor)
+
+    assert (first, has_more) == ([1, 2, 3], True)
+    assert (second, has_more_after) == ([4, 5], False)
+    assert third == []
+
+
+def test_late_commit_inside_the_overlap_is_delivered_once(client, db, orphanage):
+    orphanage_id, headers = orphanage
+    db.execute(INSERT_SUBMISSION, (1, orphanage_id, 'Early', '2024-05-01 10:00:00'))
+    db.execute(INSERT_SUBMISSION, (3, orphanage_id, 'Later', '2024-05-01 10:00:05'))
+
+    seen, cursor, _ = poll(client, headers, '')
+    # Took its id and timestamp before 3, but committed after the dashboard read
+    db.execute(INSERT_SUBMISSION, (2, orphanage_id, 'Slow', '2024-05-01 10:00:03'))
+    late, cursor, _ = poll(client, headers, cursor)
+    again, _, _ = poll(client, headers, cursor)
+
+    assert seen == [1, 3]
+    assert late == [2]
+    assert again == []
+
+
+def test_other_orphanages_submissions_are_not_listed(client, db, add_account, orphanage):
+    orphanage_id, headers = orphanage
+    other_id = add_account('other@example.org', status='approved')
+    db.execute(INSERT_SUBMISSION, (1, other_id, 'Elsewhere', '2024-05-01 10:00:00'))
+    db.execute(INSERT_SUBMISSION, (2, orphanage_id, 'Here', '2024-05-01 10:00:01'))
+
+    ids, _, _ = poll(client, headers, '')
+
+    assert ids == [2]